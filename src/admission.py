@@ -0,0 +1,180 @@
+"""
+admission.py — Mô phỏng điểm chuẩn theo chỉ tiêu cho các tổ hợp xét tuyển.
+
+Từ `BlockCube`, mỗi (phạm vi, tổ hợp) được tiền xử lý thành mảng "số thí
+sinh có tổng điểm ≥ mức" trên lưới tổng điểm rời rạc. Khi đó:
+    chỉ tiêu → điểm chuẩn : tìm kiếm nhị phân trên ~600 mức
+    điểm chuẩn → số đỗ   : một phép tra mảng
+cả hai đều vector hoá cho lô truy vấn, không sắp xếp lại 1,1 triệu tổng điểm.
+
+Phạm vi (scope) viết giống src.percentile:
+    None                    → toàn quốc
+    ("tinh", "Hà Nội")      → tỉnh cũ
+    ("tinh_moi", "Đà Nẵng") → tỉnh mới (sau sáp nhập)
+"""
+
+import numpy as np
+import pandas as pd
+from typing import NamedTuple
+
+from src.config import SCORE_SCALE, PROVINCE_NAMES, NEW_PROVINCE_NAMES
+from src.blocks import BlockCube
+from src.cube import group_province_counts
+
+# Sai số cho điểm chuẩn nằm sát mức lưới
+_EPS = 1e-6
+
+
+class CutoffResult(NamedTuple):
+    """Kết quả tra điểm chuẩn (mỗi trường là số hoặc mảng cùng shape truy vấn)."""
+    cutoff:   np.ndarray   # điểm chuẩn: lấy mọi thí sinh có tổng điểm ≥ cutoff
+    admitted: np.ndarray   # số thí sinh đỗ ở điểm chuẩn này (tính cả đồng điểm)
+    tied:     np.ndarray   # số thí sinh có tổng điểm đúng bằng điểm chuẩn
+    above:    np.ndarray   # số thí sinh có tổng điểm > điểm chuẩn (chắc chắn đỗ)
+
+
+class AdmissionSimulator:
+    """
+    Bảng "số thí sinh ≥ mức" [phạm vi, tổ hợp, mức] dựng từ BlockCube.
+
+    Attributes:
+        codes:  list mã tổ hợp.
+        scopes: list phạm vi theo thứ tự trục 0 (None = toàn quốc).
+        ge:     int64 [len(scopes), len(codes), n_levels + 1]; ô cuối = 0.
+    """
+
+    def __init__(self, cube: BlockCube):
+        per_prov   = cube.counts[:-1]                    # 63 tỉnh (bỏ ô không rõ)
+        _, per_new = group_province_counts(per_prov, "tinh_moi")
+
+        self.codes  = list(cube.codes)
+        self.scopes = (
+            [None]
+            + [("tinh", p) for p in PROVINCE_NAMES]
+            + [("tinh_moi", p) for p in NEW_PROVINCE_NAMES]
+        )
+        counts = np.concatenate([cube.counts.sum(axis=0)[None], per_prov, per_new])
+        ge     = np.cumsum(counts[..., ::-1], axis=-1)[..., ::-1]
+        self.ge = np.concatenate([ge, np.zeros(ge.shape[:-1] + (1,), np.int64)], axis=-1)
+        self._scope_index = {scope: i for i, scope in enumerate(self.scopes)}
+        self._block_index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, blocks=None) -> "AdmissionSimulator":
+        """Dựng bộ mô phỏng trực tiếp từ DataFrame điểm."""
+        return cls(BlockCube.from_frame(df, blocks))
+
+    @classmethod
+    def from_parquet(cls, parquet_file: str, blocks=None) -> "AdmissionSimulator":
+        """Dựng bộ mô phỏng từ file Parquet của ETL (đọc theo lô)."""
+        return cls(BlockCube.from_parquet(parquet_file, blocks))
+
+    # ── Chỉ số ───────────────────────────────────────────────────────────────
+    def _scope_idx(self, scopes) -> np.ndarray:
+        if scopes is None or isinstance(scopes, tuple):
+            scopes = [scopes]
+        try:
+            return np.array([self._scope_index[s] for s in scopes], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Phạm vi không hợp lệ: {e.args[0]!r}") from None
+
+    def _block_idx(self, blocks) -> np.ndarray:
+        if isinstance(blocks, str):
+            blocks = [blocks]
+        try:
+            return np.array([self._block_index[b] for b in blocks], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Tổ hợp không có trong bộ mô phỏng: {e.args[0]!r}") from None
+
+    # ── Truy vấn theo lô ─────────────────────────────────────────────────────
+    def cutoff_batch(self, blocks, quotas, scopes=None) -> CutoffResult:
+        """
+        Điểm chuẩn cho nhiều (tổ hợp, chỉ tiêu, phạm vi) cùng lúc.
+
+        Điểm chuẩn là tổng điểm cao nhất mà số thí sinh đạt ≥ nó vẫn đủ chỉ
+        tiêu; thí sinh đồng điểm ở điểm chuẩn đều được tính đỗ nên `admitted`
+        có thể vượt chỉ tiêu (`tied` cho biết bao nhiêu). Nếu chỉ tiêu lớn
+        hơn số thí sinh, mọi thí sinh đều đỗ và điểm chuẩn là tổng điểm thấp
+        nhất; phạm vi không có thí sinh cho điểm chuẩn NaN.
+
+        Args:
+            blocks: Mã tổ hợp hoặc mảng mã (broadcast với `quotas`).
+            quotas: Chỉ tiêu (số nguyên ≥ 1) hoặc mảng chỉ tiêu.
+            scopes: Một phạm vi hoặc list phạm vi (broadcast với `quotas`).
+
+        Returns:
+            CutoffResult gồm các mảng cùng shape.
+        """
+        quotas = np.asarray(quotas, dtype=np.int64)
+        if (quotas < 1).any():
+            raise ValueError("Chỉ tiêu phải ≥ 1")
+        si, bi, quotas = np.broadcast_arrays(self._scope_idx(scopes), self._block_idx(blocks), quotas)
+
+        total  = self.ge[si, bi, 0]
+        target = np.minimum(quotas, np.maximum(total, 1))
+
+        # Mức cao nhất có ge ≥ target (ge giảm dần theo mức) — tìm kiếm nhị
+        # phân, tra thẳng ô (phạm vi, tổ hợp, mức) như count_batch
+        lo = np.zeros(quotas.shape, np.int64)
+        hi = np.full(quotas.shape, self.ge.shape[-1] - 2, np.int64)
+        while (lo < hi).any():
+            mid    = (lo + hi + 1) // 2
+            enough = self.ge[si, bi, mid] >= target
+            lo     = np.where(enough, mid, lo)
+            hi     = np.where(enough, hi, mid - 1)
+
+        admitted = self.ge[si, bi, lo]
+        above    = self.ge[si, bi, lo + 1]
+        empty    = total == 0
+        return CutoffResult(
+            cutoff=np.where(empty, np.nan, lo / SCORE_SCALE),
+            admitted=admitted,
+            tied=admitted - above,
+            above=above,
+        )
+
+    def count_batch(self, blocks, cutoffs, scopes=None) -> np.ndarray:
+        """
+        Số thí sinh có tổng điểm ≥ điểm chuẩn, cho nhiều truy vấn cùng lúc.
+
+        Args:
+            blocks:  Mã tổ hợp hoặc mảng mã.
+            cutoffs: Điểm chuẩn (số hoặc mảng).
+            scopes:  Một phạm vi hoặc list phạm vi.
+
+        Returns:
+            Mảng int64.
+        """
+        cutoffs = np.asarray(cutoffs, dtype="float64")
+        si, bi, cutoffs = np.broadcast_arrays(self._scope_idx(scopes), self._block_idx(blocks), cutoffs)
+
+        n_levels = self.ge.shape[-1] - 1
+        level    = np.clip(np.ceil(cutoffs * SCORE_SCALE - _EPS), 0, n_levels).astype(np.int64)
+        return self.ge[si, bi, level]
+
+    # ── Truy vấn đơn ─────────────────────────────────────────────────────────
+    def cutoff(self, block: str, quota: int, scope=None) -> CutoffResult:
+        """Điểm chuẩn của một tổ hợp cho một chỉ tiêu (xem `cutoff_batch`)."""
+        res = self.cutoff_batch(block, quota, scope)
+        return CutoffResult(float(res.cutoff[0]), *(int(v[0]) for v in res[1:]))
+
+    def count(self, block: str, cutoff: float, scope=None) -> int:
+        """Số thí sinh đạt điểm chuẩn `cutoff` của một tổ hợp."""
+        return int(self.count_batch(block, cutoff, scope)[0])
+
+    def cutoff_table(self, quotas, scope=None) -> pd.DataFrame:
+        """
+        Bảng điểm chuẩn cho nhiều tổ hợp trong một phạm vi.
+
+        Args:
+            quotas: Chỉ tiêu chung (int) hoặc dict mã tổ hợp → chỉ tiêu.
+            scope:  Phạm vi (None = toàn quốc).
+
+        Returns:
+            DataFrame index = mã tổ hợp; cột quota, cutoff, admitted, tied, above.
+        """
+        if not isinstance(quotas, dict):
+            quotas = dict.fromkeys(self.codes, quotas)
+        codes = list(quotas)
+        res   = self.cutoff_batch(codes, list(quotas.values()), scope)
+        return pd.DataFrame({"quota": list(quotas.values()), **res._asdict()}, index=codes)
@@ -0,0 +1,512 @@
+"""
+aggregate.py — Thống kê đủ (sufficient statistics) theo nhóm × môn, dựng
+trong một lần quét dữ liệu.
+
+Mọi điểm nằm trên lưới SCORE_STEP nên histogram [nhóm, môn, mức điểm] chứa
+đủ thông tin cho n, Σx, Σx², các moment bậc cao, trung vị/phân vị, và cả
+mẫu điểm gốc (đã sắp xếp) của từng nhóm. Histogram được dựng bằng một lần
+`np.bincount` trên mã nhóm nguyên; mean/std/skew/kurtosis đều suy ra từ đó.
+
+`GroupIndex` là chỉ mục dòng theo nhóm (argsort ổn định trên mã nhóm): dòng
+của một nhóm lấy ra trong O(kích thước nhóm) thay vì tạo mặt nạ boolean dài
+len(df) cho mỗi lần truy vấn.
+
+Ví dụ:
+    gs = group_stats(df, "tinh")          # dựng một lần, các lần sau lấy từ cache
+    gs.table(["toan"])                    # mean_toan, std_toan theo tỉnh
+    kmeans_subject_2d(gs, "toan", "Toán")
+
+    # Nhiều histogram (cột nhóm / tập môn / complete khác nhau) trong một lần quét
+    group_stats_many(df, [("tinh", None, False), ("tinh", ["toan", "li", "hoa"], True)])
+
+    gs = GroupStats.from_cube(ScoreCube.load("combined_data.cube.npz"), "tinh")   # không cần df
+
+    gi = group_index(df)                  # tinh, tinh_moi, ma_mon_ngoai_ngu
+    df.iloc[gi.rows("tinh", "Hà Nội")]
+    compare_two_groups(df, "toan", "Toán", "Hà Nội", "Nghệ An", index=gi)
+"""
+
+import weakref
+import numpy as np
+import pandas as pd
+
+from src.config import SCORE_COLS, SCORE_SCALE, N_SCORE_LEVELS
+from src.cube import CUBE_LANGS, ScoreCube, group_province_counts, quantile_from_counts, SCORE_VALUES
+from src.encoding import score_levels
+from src.shared import GROUP_COLS
+
+# Số dòng xử lý mỗi lô khi dựng histogram
+_BATCH_ROWS = 200_000
+
+# Nhãn nhóm khi không phân nhóm (group_col=None)
+ALL_GROUP = "Toàn quốc"
+
+# Cache: (id(df), group_col, subjects | None, complete) → (weakref(df), GroupStats)
+#        (id(df), "index", columns)                   → (weakref(df), GroupIndex)
+_CACHE = {}
+
+
+def _group_codes(df: pd.DataFrame, group_col: str):
+    """Mã nhóm nguyên (-1 = thiếu) và nhãn nhóm theo thứ tự groupby(sort=True)."""
+    if group_col is None:
+        return np.zeros(len(df), dtype=np.int64), [ALL_GROUP]
+    col = df[group_col]
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy().astype(np.int64), list(col.cat.categories)
+    codes, uniques = pd.factorize(col, sort=True)
+    return codes.astype(np.int64), list(uniques)
+
+
+def _cached(df: pd.DataFrame, key: tuple, build):
+    """Lấy `build()` từ cache theo object `df` (tự xoá khi df bị thu hồi)."""
+    hit = _CACHE.get(key)
+    if hit is None or hit[0]() is not df:
+        _CACHE[key] = (weakref.ref(df), build())
+        weakref.finalize(df, _CACHE.pop, key, None)
+        hit = _CACHE[key]
+    return hit[1]
+
+
+def _count_many(df: pd.DataFrame, columns: list, parts: list, batch_rows: int = _BATCH_ROWS) -> list:
+    """
+    Nhiều histogram [nhóm, môn, mức] trong cùng một lần quét: mức điểm của
+    `columns` được giải mã một lần mỗi lô rồi dùng chung cho mọi phần.
+
+    Args:
+        df:         DataFrame điểm.
+        columns:    Hợp các cột điểm cần đọc.
+        parts:      list (codes, số nhóm, subjects, complete) — `codes` là mã
+                    nhóm từng dòng, `subjects` là tập con của `columns`.
+        batch_rows: Số dòng mỗi lô.
+
+    Returns:
+        list mảng int64 [số nhóm, len(subjects), N_SCORE_LEVELS] theo thứ tự `parts`.
+    """
+    L      = N_SCORE_LEVELS
+    scale  = df.attrs.get("score_scale", {})
+    pos    = {c: i for i, c in enumerate(columns)}
+    counts = [np.zeros(G * len(subjects) * L, np.int64) for _, G, subjects, _ in parts]
+    for start in range(0, len(df), batch_rows):
+        part   = df.iloc[start:start + batch_rows]
+        levels = np.column_stack([score_levels(part[c], scale.get(c)) for c in columns])
+        for out, (codes, G, subjects, complete) in zip(counts, parts):
+            S     = len(subjects)
+            g     = codes[start:start + batch_rows]
+            lv    = levels[:, [pos[c] for c in subjects]]
+            valid = (lv >= 0) & (g >= 0)[:, None]
+            if complete:
+                valid &= valid.all(axis=1, keepdims=True)
+            flat = (g[:, None] * S + np.arange(S)[None, :]) * L + lv
+            out += np.bincount(flat[valid], minlength=G * S * L)
+    return [c.reshape(G, len(subjects), L) for c, (_, G, subjects, _) in zip(counts, parts)]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Chỉ mục dòng theo nhóm
+# ──────────────────────────────────────────────────────────────────────────────
+class GroupIndex:
+    """
+    Chỉ mục dòng theo nhóm cho một hoặc nhiều cột phân nhóm.
+
+    Với mỗi cột: mã nhóm nguyên của từng dòng, hoán vị `order` (argsort ổn
+    định theo mã, dòng thiếu nhóm xếp đầu) và `offsets` — dòng của nhóm thứ g
+    là `order[offsets[g]:offsets[g + 1]]`, giữ nguyên thứ tự dòng gốc.
+
+    Attributes:
+        n_rows:  Số dòng của DataFrame được lập chỉ mục.
+        columns: list cột phân nhóm có chỉ mục.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list = None):
+        if columns is None:
+            columns = [c for c in GROUP_COLS if c in df.columns]
+        self.n_rows  = len(df)
+        self.columns = list(columns)
+        self._codes, self._groups, self._order, self._offsets = {}, {}, {}, {}
+        for col in self.columns:
+            codes, groups = _group_codes(df, col)
+            sizes = np.bincount(codes + 1, minlength=len(groups) + 1)    # ô 0 = thiếu nhóm
+            self._codes[col]   = codes
+            self._groups[col]  = groups
+            self._order[col]   = np.argsort(codes, kind="stable")
+            self._offsets[col] = np.cumsum(sizes)
+        self._group_pos = {col: {g: i for i, g in enumerate(self._groups[col])} for col in self.columns}
+
+    def _col(self, col: str) -> str:
+        if col not in self._codes:
+            raise KeyError(f"GroupIndex không có cột '{col}' (có: {self.columns})")
+        return col
+
+    def groups(self, col: str) -> list:
+        """Nhãn nhóm của cột `col` (theo thứ tự mã)."""
+        return self._groups[self._col(col)]
+
+    def codes(self, col: str) -> np.ndarray:
+        """Mã nhóm int64 của từng dòng (-1 = thiếu)."""
+        return self._codes[self._col(col)]
+
+    def sizes(self, col: str) -> pd.Series:
+        """Số dòng của mỗi nhóm."""
+        return pd.Series(np.diff(self._offsets[self._col(col)]), index=self._groups[col], name=col)
+
+    def order(self, col: str) -> np.ndarray:
+        """Hoán vị dòng sắp theo nhóm: `df.iloc[order]` đặt mỗi nhóm thành một khối liền."""
+        return self._order[self._col(col)]
+
+    def slice(self, col: str, group) -> slice:
+        """Vị trí của nhóm `group` trong `order(col)` (một lát cắt liền)."""
+        pos = self._group_pos[self._col(col)].get(group)
+        if pos is None:
+            raise KeyError(f"Không có nhóm '{group}' trong cột '{col}'")
+        off = self._offsets[col]
+        return slice(int(off[pos]), int(off[pos + 1]))
+
+    def rows(self, col: str, group) -> np.ndarray:
+        """Vị trí dòng (tăng dần, dùng với `df.iloc`) của nhóm `group`."""
+        return self._order[self._col(col)][self.slice(col, group)]
+
+    def take(self, df: pd.DataFrame, col: str, group, columns: list = None) -> pd.DataFrame:
+        """Các dòng (và cột `columns`) của nhóm `group` trong `df`."""
+        if len(df) != self.n_rows:
+            raise ValueError("GroupIndex được dựng cho DataFrame có số dòng khác")
+        rows = self.rows(col, group)
+        return df.iloc[rows] if columns is None else df.iloc[rows, [df.columns.get_loc(c) for c in columns]]
+
+
+def group_index(df: pd.DataFrame, columns: list = None) -> GroupIndex:
+    """
+    `GroupIndex(df, columns)` có cache theo DataFrame (cùng object → dùng lại).
+
+    Args:
+        df:      DataFrame điểm.
+        columns: Cột phân nhóm (mặc định: GROUP_COLS có trong df).
+    """
+    key = (id(df), "index", tuple(columns) if columns else None)
+    return _cached(df, key, lambda: GroupIndex(df, columns))
+
+
+class GroupStats:
+    """
+    Histogram điểm theo (nhóm, môn) và các thống kê suy ra từ nó.
+
+    Attributes:
+        group_col: Cột phân nhóm (None = một nhóm duy nhất).
+        groups:    list nhãn nhóm (gồm cả nhóm không có thí sinh).
+        subjects:  list cột điểm.
+        complete:  True nếu chỉ tính thí sinh có đủ điểm mọi môn trong `subjects`.
+        counts:    int64 [len(groups), len(subjects), N_SCORE_LEVELS]
+    """
+
+    def __init__(self, groups: list, subjects: list, counts: np.ndarray,
+                 group_col: str = None, complete: bool = False):
+        self.group_col = group_col
+        self.groups    = list(groups)
+        self.subjects  = list(subjects)
+        self.complete  = complete
+        self.counts    = counts.astype(np.int64)
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        group_col: str = None,
+        subjects: list = None,
+        complete: bool = False,
+        batch_rows: int = _BATCH_ROWS,
+        index: GroupIndex = None,
+    ) -> "GroupStats":
+        """
+        Dựng histogram trong một lần quét (theo lô) bằng `np.bincount`.
+
+        Args:
+            df:        DataFrame điểm (float hoặc dạng nén của src.encoding).
+            group_col: Cột phân nhóm (None = toàn bộ dữ liệu là một nhóm).
+            subjects:  Cột điểm (mặc định: mọi cột điểm có trong df).
+            complete:  Chỉ giữ thí sinh có đủ điểm mọi môn trong `subjects`.
+            index:     GroupIndex của df (dùng lại mã nhóm, không factorize lại).
+        """
+        if subjects is None:
+            subjects = [s for s in SCORE_COLS if s in df.columns]
+        if index is not None and group_col in index.columns:
+            codes, groups = index.codes(group_col), index.groups(group_col)
+        else:
+            codes, groups = _group_codes(df, group_col)
+        return cls._from_codes(df, codes, groups, group_col, subjects, complete, batch_rows)
+
+    @classmethod
+    def from_index(
+        cls,
+        df: pd.DataFrame,
+        index: GroupIndex,
+        group_col: str,
+        groups: list,
+        subjects: list = None,
+        complete: bool = False,
+    ) -> "GroupStats":
+        """
+        Dựng histogram chỉ cho các nhóm `groups`, đọc đúng các dòng của chúng
+        qua `index` — O(tổng kích thước các nhóm) thay vì O(len(df)).
+
+        Args:
+            df:        DataFrame điểm đã dựng `index`.
+            index:     GroupIndex có cột `group_col`.
+            group_col: Cột phân nhóm.
+            groups:    Các nhóm cần dựng (theo thứ tự này).
+            subjects:  Cột điểm (mặc định: mọi cột điểm có trong df).
+            complete:  Chỉ giữ thí sinh có đủ điểm mọi môn trong `subjects`.
+        """
+        if subjects is None:
+            subjects = [s for s in SCORE_COLS if s in df.columns]
+        rows  = [index.rows(group_col, g) for g in groups]
+        codes = np.repeat(np.arange(len(groups), dtype=np.int64), [len(r) for r in rows])
+        part  = df.iloc[np.concatenate(rows), [df.columns.get_loc(c) for c in subjects]]
+        return cls._from_codes(part, codes, groups, group_col, subjects, complete, _BATCH_ROWS)
+
+    @classmethod
+    def from_cube(cls, cube: ScoreCube, group_col: str = None, subjects: list = None) -> "GroupStats":
+        """
+        Histogram lấy thẳng từ khối đếm ScoreCube (không cần DataFrame).
+        Khối đếm chỉ giữ phân phối từng môn nên không dựng được complete=True.
+
+        Args:
+            cube:      ScoreCube (vd: `ScoreCube.load("combined_data.cube.npz")`).
+            group_col: None (toàn bộ), 'ma_tinh', 'tinh', 'tinh_moi' hoặc
+                       'ma_mon_ngoai_ngu' (chỉ với môn 'ngoai_ngu').
+            subjects:  Cột điểm (mặc định: mọi môn SCORE_COLS).
+        """
+        subjects = list(subjects or SCORE_COLS)
+        idx      = [SCORE_COLS.index(s) for s in subjects]
+        if group_col is None:
+            groups, counts = [ALL_GROUP], cube.counts.sum(axis=0, keepdims=True)[:, idx]
+        elif group_col == "ma_mon_ngoai_ngu":
+            if subjects != ["ngoai_ngu"]:
+                raise ValueError("group_col='ma_mon_ngoai_ngu' chỉ dùng với subjects=['ngoai_ngu'].")
+            groups = CUBE_LANGS[:-1]
+            counts = cube.lang_counts[:, :-1].sum(axis=0)[:, None, :]
+        else:
+            groups, counts = group_province_counts(cube.counts[:-1][:, idx], group_col)
+        return cls(groups, subjects, counts, group_col)
+
+    @classmethod
+    def _from_codes(cls, df, codes, groups, group_col, subjects, complete, batch_rows) -> "GroupStats":
+        """Histogram từ mã nhóm từng dòng (`codes` cùng độ dài với df)."""
+        counts, = _count_many(df, subjects, [(codes, len(groups), subjects, complete)], batch_rows)
+        return cls(groups, subjects, counts, group_col, complete)
+
+    # ── Thống kê đủ ──────────────────────────────────────────────────────────
+    @property
+    def n(self) -> np.ndarray:
+        """Số thí sinh [nhóm, môn]."""
+        return self.counts.sum(axis=-1)
+
+    def power_sum(self, p: int) -> np.ndarray:
+        """Σxᵖ [nhóm, môn]."""
+        return self.counts @ (SCORE_VALUES ** p)
+
+    def mean(self) -> np.ndarray:
+        """Điểm trung bình [nhóm, môn] (NaN nếu nhóm rỗng)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.power_sum(1) / self.n
+
+    def central_sum(self, p: int) -> np.ndarray:
+        """Σ(x - mean)ᵖ [nhóm, môn], tính trên histogram (ổn định số học)."""
+        dev = SCORE_VALUES[None, None, :] - np.nan_to_num(self.mean())[..., None]
+        return (self.counts * dev ** p).sum(axis=-1)
+
+    def var(self, ddof: int = 1) -> np.ndarray:
+        """Phương sai [nhóm, môn] (ddof=1 như pandas)."""
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > ddof, self.central_sum(2) / (n - ddof), np.nan)
+
+    def std(self, ddof: int = 1) -> np.ndarray:
+        """Độ lệch chuẩn [nhóm, môn]."""
+        return np.sqrt(self.var(ddof))
+
+    def skew(self) -> np.ndarray:
+        """Độ lệch (skewness) hiệu chỉnh mẫu, giống `pd.Series.skew`."""
+        n      = self.n.astype("float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m2, m3 = self.central_sum(2) / n, self.central_sum(3) / n
+            g1 = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+        return np.where(n < 3, np.nan, np.where(m2 == 0, 0.0, g1))
+
+    def kurt(self) -> np.ndarray:
+        """Độ nhọn vượt chuẩn (excess kurtosis) hiệu chỉnh mẫu, giống `pd.Series.kurt`."""
+        n      = self.n.astype("float64")
+        M2, M4 = self.central_sum(2), self.central_sum(4)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            g2 = (n * (n + 1) * (n - 1) * M4 / ((n - 2) * (n - 3) * M2 ** 2)
+                  - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+        return np.where(n < 4, np.nan, np.where(M2 == 0, 0.0, g2))
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Phân vị [nhóm, môn], nội suy tuyến tính như pandas (NaN nếu nhóm rỗng)."""
+        n   = self.n
+        cum = np.cumsum(self.counts, axis=-1)
+        pos = (n - 1) * q
+        lo  = np.floor(pos)
+        hi  = np.minimum(lo + 1, n - 1)
+        x_lo = (cum <= lo[..., None]).sum(axis=-1) / SCORE_SCALE
+        x_hi = (cum <= hi[..., None]).sum(axis=-1) / SCORE_SCALE
+        return np.where(n > 0, x_lo + (pos - lo) * (x_hi - x_lo), np.nan)
+
+    def median(self) -> np.ndarray:
+        """Trung vị [nhóm, môn]."""
+        return self.quantile(0.5)
+
+    # ── Truy xuất ────────────────────────────────────────────────────────────
+    def _subject_idx(self, subject: str) -> int:
+        if subject not in self.subjects:
+            raise KeyError(f"GroupStats không có môn '{subject}' (có: {self.subjects})")
+        return self.subjects.index(subject)
+
+    def _group_idx(self, group) -> int:
+        if group not in self.groups:
+            raise KeyError(f"GroupStats không có nhóm '{group}' trong cột '{self.group_col}'")
+        return self.groups.index(group)
+
+    def group_counts(self, group, subject: str) -> np.ndarray:
+        """Vector đếm N_SCORE_LEVELS phần tử của một (nhóm, môn)."""
+        return self.counts[self._group_idx(group), self._subject_idx(subject)]
+
+    def sample(self, group, subject: str) -> np.ndarray:
+        """Mẫu điểm (float64, đã sắp xếp tăng dần) của một (nhóm, môn)."""
+        return np.repeat(SCORE_VALUES, self.group_counts(group, subject))
+
+    def table(self, subjects: list = None, stats: tuple = ("mean", "std")) -> pd.DataFrame:
+        """
+        Bảng thống kê theo nhóm: một dòng mỗi nhóm có thí sinh, cột
+        `{stat}_{môn}` (vd: mean_toan, std_toan) — giống
+        `groupby(group_col, observed=True).agg(...).reset_index()`.
+
+        Args:
+            subjects: Cột điểm (mặc định: mọi môn).
+            stats:    Tên thống kê trong ('n', 'mean', 'std', 'var', 'skew', 'kurt').
+        """
+        subjects = subjects or self.subjects
+        idx      = [self._subject_idx(s) for s in subjects]
+        values   = {
+            "n": self.n, "mean": self.mean(), "std": self.std(),
+            "var": self.var(), "skew": self.skew(), "kurt": self.kurt(),
+        }
+        keep = self.n[:, idx].sum(axis=1) > 0
+        out  = pd.DataFrame({self.group_col or "group": np.array(self.groups, dtype=object)[keep]})
+        for s, j in zip(subjects, idx):
+            for stat in stats:
+                out[f"{stat}_{s}"] = values[stat][keep, j]
+        return out
+
+    def describe(self) -> pd.DataFrame:
+        """
+        Bảng mô tả mọi môn (gộp mọi nhóm), như `df[subjects].describe().T`
+        kèm cột skewness, kurtosis.
+        """
+        pooled = GroupStats([ALL_GROUP], self.subjects, self.counts.sum(axis=0, keepdims=True))
+        q      = np.array([quantile_from_counts(c, [0.25, 0.5, 0.75]) for c in pooled.counts[0]])
+        nz     = pooled.counts[0] > 0
+        has    = nz.any(axis=1)
+        return pd.DataFrame({
+            "count":    pooled.n[0].astype("float64"),
+            "mean":     pooled.mean()[0],
+            "std":      pooled.std()[0],
+            "min":      np.where(has, nz.argmax(axis=1) / SCORE_SCALE, np.nan),
+            "25%":      q[:, 0],
+            "50%":      q[:, 1],
+            "75%":      q[:, 2],
+            "max":      np.where(has, (N_SCORE_LEVELS - 1 - nz[:, ::-1].argmax(axis=1)) / SCORE_SCALE, np.nan),
+            "skewness": pooled.skew()[0],
+            "kurtosis": pooled.kurt()[0],
+        }, index=self.subjects)
+
+
+def group_stats(
+    df: pd.DataFrame,
+    group_col: str = None,
+    subjects: list = None,
+    complete: bool = False,
+    index: GroupIndex = None,
+) -> GroupStats:
+    """
+    `GroupStats.from_frame` có cache theo DataFrame: gọi lại với cùng `df`
+    (cùng object) và cùng tham số trả về kết quả cũ mà không quét lại.
+    Với complete=False, histogram của mọi môn được dựng một lần và dùng
+    chung cho mọi tập môn con. Cache không theo dõi sửa đổi tại chỗ trên df.
+    `df` cũng có thể là ScoreCube (`GroupStats.from_cube`, không hỗ trợ
+    complete=True) — mọi hàm nhận `df` và gọi group_stats chạy được trên
+    khối đếm.
+
+    Args:
+        df:        DataFrame điểm, hoặc ScoreCube.
+        group_col: Cột phân nhóm (None = toàn bộ).
+        subjects:  Cột điểm cần có (mặc định: mọi cột điểm trong df).
+        complete:  Chỉ giữ thí sinh có đủ điểm mọi môn trong `subjects`.
+        index:     GroupIndex của df (tuỳ chọn, tránh factorize cột nhóm).
+    """
+    key = (id(df), group_col, tuple(subjects) if complete else None, complete)
+    if isinstance(df, ScoreCube):
+        if complete:
+            raise ValueError("ScoreCube chỉ giữ phân phối từng môn — không dựng được complete=True.")
+        # Khối đếm tách theo môn nên dựng đúng tập môn được hỏi (bắt buộc với
+        # group_col='ma_mon_ngoai_ngu', chỉ có môn 'ngoai_ngu')
+        key = (id(df), group_col, tuple(subjects) if subjects else None, False)
+        gs  = _cached(df, key, lambda: GroupStats.from_cube(df, group_col, subjects))
+    else:
+        gs = _cached(df, key, lambda: GroupStats.from_frame(
+            df, group_col, subjects if complete else None, complete, index=index,
+        ))
+    if subjects is not None:
+        missing = [s for s in subjects if s not in gs.subjects]
+        if missing:
+            raise KeyError(f"Không có cột điểm {missing} trong DataFrame")
+    return gs
+
+
+def group_stats_many(
+    df: pd.DataFrame,
+    requests: list,
+    index: GroupIndex = None,
+    batch_rows: int = _BATCH_ROWS,
+) -> list:
+    """
+    Dựng nhiều GroupStats (khác cột nhóm / tập môn / complete) trong MỘT lần
+    quét df — mỗi lô chỉ giải mã điểm một lần rồi bincount cho từng yêu cầu.
+    Kết quả được ghi vào cache của `group_stats`, nên các lần gọi
+    `group_stats(df, ...)` sau đó với cùng tham số không quét lại.
+
+    Args:
+        df:         DataFrame điểm.
+        requests:   list (group_col, subjects, complete) như tham số của `group_stats`.
+        index:      GroupIndex của df (tuỳ chọn, tránh factorize cột nhóm).
+        batch_rows: Số dòng mỗi lô.
+
+    Returns:
+        list GroupStats theo thứ tự `requests`.
+    """
+    all_subjects = [s for s in SCORE_COLS if s in df.columns]
+    missing      = {}
+    for group_col, subjects, complete in requests:
+        unknown = [s for s in subjects or () if s not in all_subjects]
+        if unknown:
+            raise KeyError(f"Không có cột điểm {unknown} trong DataFrame")
+        key = (id(df), group_col, tuple(subjects) if complete else None, complete)
+        hit = _CACHE.get(key)
+        if (hit is None or hit[0]() is not df) and key not in missing:
+            missing[key] = (group_col, list(subjects) if complete else all_subjects, complete)
+
+    if missing:
+        codes = {}
+        for group_col, _, _ in missing.values():
+            if group_col in codes:
+                continue
+            if index is not None and group_col in index.columns:
+                codes[group_col] = (index.codes(group_col), index.groups(group_col))
+            else:
+                codes[group_col] = _group_codes(df, group_col)
+        columns = [s for s in all_subjects if any(s in subj for _, subj, _ in missing.values())]
+        parts   = [(codes[g][0], len(codes[g][1]), subj, c) for g, subj, c in missing.values()]
+        counts  = _count_many(df, columns, parts, batch_rows)
+        for (key, (group_col, subjects, complete)), cnt in zip(missing.items(), counts):
+            gs = GroupStats(codes[group_col][1], subjects, cnt, group_col, complete)
+            _cached(df, key, lambda gs=gs: gs)
+    return [group_stats(df, g, subj, c, index=index) for g, subj, c in requests]
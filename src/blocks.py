@@ -0,0 +1,245 @@
+"""
+blocks.py — Tổng điểm tổ hợp xét tuyển (A00, A01, B00, C00, D01…).
+
+Điểm của mọi thí sinh được đưa về ma trận mức điểm [thí sinh × môn] (môn
+Ngoại ngữ tách theo mã N1–N7); tổng điểm của mọi tổ hợp là một phép nhân
+ma trận với ma trận trọng số [tổ hợp × môn], kèm mặt nạ thiếu môn — không
+có biểu thức pandas riêng cho từng tổ hợp.
+
+Tổng điểm vẫn nằm trên lưới SCORE_STEP nên phân phối của mỗi (tỉnh, tổ hợp)
+được lưu chính xác bằng một vector đếm trong `BlockCube`.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import (
+    SCORE_COLS,
+    SCORE_SCALE,
+    N_SCORE_LEVELS,
+    FOREIGN_LANG_LABELS,
+    ADMISSION_BLOCKS,
+)
+from src.cube import (
+    CUBE_PROVINCES,
+    _lang_index,
+    _province_index,
+    group_province_counts,
+    province_mask,
+    summarize_counts,
+)
+from src.encoding import score_levels
+
+# Cột của ma trận mức điểm: các môn + điểm Ngoại ngữ tách theo mã ngôn ngữ
+BLOCK_SUBJECTS = SCORE_COLS + list(FOREIGN_LANG_LABELS)
+
+# Số dòng xử lý mỗi lô (ma trận tạm ~ batch_rows × số tổ hợp)
+_BATCH_ROWS = 200_000
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Ma trận trọng số & ma trận mức điểm
+# ──────────────────────────────────────────────────────────────────────────────
+def block_weights(blocks=None):
+    """
+    Ma trận trọng số [tổ hợp × BLOCK_SUBJECTS].
+
+    Args:
+        blocks: None (mọi tổ hợp trong ADMISSION_BLOCKS), list mã tổ hợp, hoặc
+                dict mã → tuple môn / dict {môn: hệ số nguyên}
+                (vd: {"A00x2": {"toan": 2, "li": 1, "hoa": 1}}).
+
+    Returns:
+        (codes, weights) — weights int64 [len(codes), len(BLOCK_SUBJECTS)].
+    """
+    if blocks is None:
+        blocks = ADMISSION_BLOCKS
+    elif not isinstance(blocks, dict):
+        unknown = [b for b in blocks if b not in ADMISSION_BLOCKS]
+        if unknown:
+            raise ValueError(f"Không có tổ hợp {unknown} trong ADMISSION_BLOCKS")
+        blocks = {b: ADMISSION_BLOCKS[b] for b in blocks}
+
+    codes   = list(blocks)
+    weights = np.zeros((len(codes), len(BLOCK_SUBJECTS)), np.int64)
+    for i, code in enumerate(codes):
+        spec = blocks[code]
+        if not isinstance(spec, dict):
+            spec = {s: 1 for s in spec}
+        for subject, w in spec.items():
+            if subject not in BLOCK_SUBJECTS:
+                raise ValueError(f"Tổ hợp {code}: môn không hợp lệ '{subject}'")
+            if int(w) != w or w <= 0:
+                raise ValueError(f"Tổ hợp {code}: hệ số phải là số nguyên dương, nhận {w}")
+            weights[i, BLOCK_SUBJECTS.index(subject)] = int(w)
+    return codes, weights
+
+
+def _level_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Ma trận mức điểm int16 [len(df) × BLOCK_SUBJECTS], -1 = không có điểm."""
+    scale  = df.attrs.get("score_scale", {})
+    levels = np.full((len(df), len(BLOCK_SUBJECTS)), -1, dtype=np.int16)
+    for j, subject in enumerate(SCORE_COLS):
+        if subject in df.columns:
+            levels[:, j] = score_levels(df[subject], scale.get(subject))
+
+    if "ngoai_ngu" in df.columns:
+        lang = _lang_index(df)
+        lvl  = levels[:, SCORE_COLS.index("ngoai_ngu")]
+        for k in range(len(FOREIGN_LANG_LABELS)):
+            levels[:, len(SCORE_COLS) + k] = np.where(lang == k, lvl, -1)
+    return levels
+
+
+def _block_levels(levels: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Tổng mức điểm [n × tổ hợp] bằng nhân ma trận; -1 nếu thiếu môn bắt buộc."""
+    missing = levels < 0
+    x       = np.where(missing, 0, levels).astype(np.float32)
+    totals  = x @ weights.T.astype(np.float32)
+    n_miss  = missing.astype(np.float32) @ (weights.T > 0).astype(np.float32)
+    return np.where(n_miss == 0, totals, -1).astype(np.int32)
+
+
+def block_levels(df: pd.DataFrame, blocks=None):
+    """
+    Tổng điểm tổ hợp dạng mức nguyên (điểm = mức / SCORE_SCALE).
+
+    Args:
+        df:     DataFrame điểm (float hoặc dạng nén của src.encoding).
+        blocks: Xem `block_weights`.
+
+    Returns:
+        (codes, levels) — levels int32 [len(df), len(codes)], -1 = thiếu môn.
+    """
+    codes, weights = block_weights(blocks)
+    return codes, _block_levels(_level_matrix(df), weights)
+
+
+def block_totals(df: pd.DataFrame, blocks=None, batch_rows: int = _BATCH_ROWS) -> pd.DataFrame:
+    """
+    Tổng điểm mọi tổ hợp cho từng thí sinh.
+
+    Returns:
+        DataFrame float32 (cùng index với `df`), mỗi cột một tổ hợp; NaN nếu
+        thí sinh thiếu môn của tổ hợp.
+    """
+    codes, weights = block_weights(blocks)
+    out = np.empty((len(df), len(codes)), dtype=np.float32)
+    for start in range(0, len(df), batch_rows):
+        lv = _block_levels(_level_matrix(df.iloc[start:start + batch_rows]), weights)
+        out[start:start + len(lv)] = np.where(lv >= 0, lv / np.float32(SCORE_SCALE), np.nan)
+    return pd.DataFrame(out, index=df.index, columns=codes)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Khối đếm tổng điểm tổ hợp
+# ──────────────────────────────────────────────────────────────────────────────
+class BlockCube:
+    """
+    Khối đếm số thí sinh theo (tỉnh, tổ hợp, mức tổng điểm).
+
+    Attributes:
+        codes:   list mã tổ hợp.
+        weights: int64 [len(codes), len(BLOCK_SUBJECTS)]
+        counts:  int64 [len(CUBE_PROVINCES), len(codes), n_levels], với
+                 n_levels = (tổng hệ số lớn nhất) × 200 + 1 (601 cho tổ hợp 3 môn).
+    """
+
+    def __init__(self, blocks=None, counts: np.ndarray = None):
+        self.codes, self.weights = block_weights(blocks)
+        n_levels = int(self.weights.sum(axis=1).max()) * (N_SCORE_LEVELS - 1) + 1
+        shape    = (len(CUBE_PROVINCES), len(self.codes), n_levels)
+        self.counts = np.zeros(shape, np.int64) if counts is None else counts.astype(np.int64)
+
+    # ── Dựng ─────────────────────────────────────────────────────────────────
+    def add(self, df: pd.DataFrame) -> "BlockCube":
+        """Cộng dồn một DataFrame vào khối đếm (một lần `np.bincount`)."""
+        P, B, L = self.counts.shape
+        levels  = _block_levels(_level_matrix(df), self.weights)
+        flat    = (_province_index(df)[:, None] * B + np.arange(B)[None, :]) * L + levels
+        self.counts += np.bincount(flat[levels >= 0], minlength=P * B * L).reshape(P, B, L)
+        return self
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, blocks=None, batch_rows: int = _BATCH_ROWS) -> "BlockCube":
+        """Dựng khối đếm từ DataFrame, xử lý theo lô để giới hạn bộ nhớ tạm."""
+        cube = cls(blocks)
+        for start in range(0, len(df), batch_rows):
+            cube.add(df.iloc[start:start + batch_rows])
+        return cube
+
+    @classmethod
+    def from_parquet(cls, parquet_file: str, blocks=None, batch_rows: int = _BATCH_ROWS) -> "BlockCube":
+        """Dựng khối đếm bằng cách đọc file Parquet theo lô (chỉ các cột cần)."""
+        pf      = pq.ParquetFile(parquet_file)
+        names   = pf.schema_arrow.names
+        wanted  = ["sobaodanh", "ma_tinh", "ma_mon_ngoai_ngu"] + SCORE_COLS
+        columns = [c for c in wanted if c in names]
+        if "ma_tinh" in columns:
+            columns.remove("sobaodanh")
+
+        cube = cls(blocks)
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+            cube.add(batch.to_pandas())
+        return cube
+
+    # ── Truy vấn ─────────────────────────────────────────────────────────────
+    def _block_idx(self, block: str) -> int:
+        try:
+            return self.codes.index(block)
+        except ValueError:
+            raise ValueError(f"Tổ hợp '{block}' không có trong khối đếm") from None
+
+    def block_counts(self, block: str, provinces: list = None, province_col: str = "tinh") -> np.ndarray:
+        """Vector đếm theo mức tổng điểm của một tổ hợp (toàn quốc hoặc nhóm tỉnh)."""
+        mask = province_mask(provinces, province_col)
+        return self.counts[mask, self._block_idx(block)].sum(axis=0)
+
+    def describe(self, block: str, provinces: list = None, province_col: str = "tinh") -> dict:
+        """Thống kê mô tả tổng điểm (xem `summarize_counts`) của một tổ hợp."""
+        return summarize_counts(self.block_counts(block, provinces, province_col))
+
+    def group_counts(self, block: str, group_col: str = "tinh"):
+        """Vector đếm của từng nhóm tỉnh: (labels, counts [số nhóm, n_levels])."""
+        return group_province_counts(self.counts[:-1, self._block_idx(block)], group_col)
+
+    def province_summary(self, block: str, group_col: str = "tinh") -> pd.DataFrame:
+        """Bảng thống kê tổng điểm theo nhóm tỉnh (bỏ nhóm không có thí sinh)."""
+        labels, counts = self.group_counts(block, group_col)
+        rows = [
+            {group_col: label, **summarize_counts(c)}
+            for label, c in zip(labels, counts) if c.sum() > 0
+        ]
+        return pd.DataFrame(rows)
+
+    def summary_table(self, provinces: list = None, province_col: str = "tinh") -> pd.DataFrame:
+        """Bảng thống kê tổng điểm của mọi tổ hợp (mỗi dòng một tổ hợp)."""
+        mask   = province_mask(provinces, province_col)
+        counts = self.counts[mask].sum(axis=0)
+        rows   = {code: summarize_counts(c) for code, c in zip(self.codes, counts)}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def top_thresholds(self, n: int, provinces: list = None, province_col: str = "tinh") -> pd.DataFrame:
+        """
+        Ngưỡng điểm top-N của mọi tổ hợp: tổng điểm của thí sinh xếp thứ `n`.
+
+        Args:
+            n:            Số thí sinh đứng đầu.
+            provinces:    Danh sách tỉnh (None = toàn quốc).
+            province_col: Cột tỉnh ứng với `provinces`.
+
+        Returns:
+            DataFrame index = mã tổ hợp, cột:
+              threshold → tổng điểm của thí sinh thứ n (NaN nếu < n thí sinh)
+              n_at_or_above → số thí sinh đạt ≥ threshold (≥ n do đồng điểm)
+        """
+        mask   = province_mask(provinces, province_col)
+        counts = self.counts[mask].sum(axis=0)
+        ge     = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]       # số thí sinh ≥ mức
+        level  = (ge >= n).sum(axis=1) - 1                          # mức cao nhất còn đủ n
+        ok     = level >= 0
+        return pd.DataFrame({
+            "threshold":     np.where(ok, level / SCORE_SCALE, np.nan),
+            "n_at_or_above": np.where(ok, ge[np.arange(len(level)), np.maximum(level, 0)], 0),
+        }, index=self.codes)
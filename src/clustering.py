@@ -0,0 +1,865 @@
+"""
+clustering.py — Phân cụm K-Means ở mức thí sinh trên vector điểm nhiều môn.
+
+Điểm nằm trên lưới SCORE_STEP nên rất nhiều thí sinh có cùng vector điểm
+(vd: cùng bộ Toán–Lí–Hoá). Thay vì phân cụm 1,1 triệu dòng, vector điểm được
+gộp thành các vector duy nhất kèm số thí sinh (trọng số), rồi chạy
+`KMeans` / `MiniBatchKMeans` với `sample_weight` — kết quả tương đương phân
+cụm trên dòng thô (cùng hàm mục tiêu), nhưng nhanh và nhẹ hơn nhiều.
+
+Khối môn (block) có thể là list cột điểm hoặc mã tổ hợp trong
+ADMISSION_BLOCKS (vd: 'A00', 'D01' — N1 là điểm Ngoại ngữ của thí sinh thi
+Tiếng Anh).
+
+`kmeans_sweep` fit K-Means cho dải k (Elbow + Silhouette) song song trên
+process pool, nhớ kết quả trong RAM và trên đĩa (CACHE_DIR/kmeans) theo băm
+của ma trận đặc trưng + tham số; mô hình của k được chọn lấy lại từ sweep
+thay vì fit lần nữa.
+
+`cluster_provinces` chạy nhiều bài phân cụm tỉnh theo mean & std (mỗi bài một
+ClusterSpec) với một lần quét dữ liệu (`group_stats_many`) và một process
+pool chung cho mọi dải k (`kmeans_sweeps`).
+
+Ví dụ:
+    res = cluster_candidates(df, "A00", k=4)
+    res.profile()          # số thí sinh, tỉ lệ, ĐTB/độ lệch chuẩn từng môn theo cụm
+    res.predict(df)        # cụm của từng thí sinh (-1 nếu thiếu môn)
+
+    sweep = kmeans_sweep(X_scaled, range(2, 10))
+    sweep.best_k, sweep.model(4).labels_
+
+    out = cluster_provinces(df, [ClusterSpec("toan", "Toán"),
+                                 ClusterSpec(["toan", "li", "hoa"], "Tự Nhiên")])
+    out[1].stats           # mean/std theo tỉnh + cluster_rank
+"""
+
+import hashlib
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import sklearn
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from scipy import stats as scipy_stats
+from sklearn.preprocessing import StandardScaler
+from typing import NamedTuple
+
+from src.config import (
+    CACHE_DIR,
+    SCORE_SCALE,
+    N_SCORE_LEVELS,
+    SUBJECT_LABELS,
+    FOREIGN_LANG_LABELS,
+    ADMISSION_BLOCKS,
+)
+from src.aggregate import GroupIndex, GroupStats, group_stats_many
+from src.blocks import BLOCK_SUBJECTS, _level_matrix
+
+# Số dòng xử lý mỗi lô khi gộp vector điểm
+_BATCH_ROWS = 200_000
+
+# Số vector duy nhất tối thiểu để phương pháp 'auto' chuyển sang MiniBatchKMeans
+_MINIBATCH_MIN = 100_000
+
+# Thư mục cache của kmeans_sweep (None = chỉ nhớ trong RAM)
+KMEANS_CACHE_DIR = os.path.join(CACHE_DIR, "kmeans")
+
+# Tổng số điểm (cộng theo mọi tác vụ k) tối thiểu để kmeans_sweep(n_workers=None)
+# dùng process pool (dưới ngưỡng này chi phí khởi tạo process lớn hơn thời gian fit)
+_PARALLEL_MIN_ROWS = 5_000
+
+# Kết quả sweep đã tính trong phiên: khoá băm → KSweep
+_SWEEP_MEMO = {}
+
+# Phiên bản định dạng KSweep (đổi khi thêm trường để bỏ qua cache cũ)
+_SWEEP_VERSION = 2
+
+# Silhouette: số phần tử tối đa của ma trận khoảng cách tạm mỗi khối, và số
+# điểm tối đa để silhouette(method='auto') tính chính xác thay vì lấy mẫu
+_BLOCK_ELEMENTS         = 4_000_000
+_EXACT_SILHOUETTE_MAX   = 20_000
+
+
+def _label(subject: str) -> str:
+    """Tên hiển thị của môn (N1–N7 → tên ngôn ngữ)."""
+    return SUBJECT_LABELS.get(subject) or FOREIGN_LANG_LABELS.get(subject, subject)
+
+
+def block_subjects(block) -> list:
+    """
+    Danh sách cột (trong BLOCK_SUBJECTS) của một khối môn.
+
+    Args:
+        block: Mã tổ hợp trong ADMISSION_BLOCKS (vd: 'A00') hoặc list cột điểm.
+    """
+    subjects = list(ADMISSION_BLOCKS[block]) if isinstance(block, str) else list(block)
+    unknown  = [s for s in subjects if s not in BLOCK_SUBJECTS]
+    if unknown:
+        raise ValueError(f"Môn không hợp lệ: {unknown}")
+    return subjects
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Vector điểm duy nhất
+# ──────────────────────────────────────────────────────────────────────────────
+class ScoreVectors(NamedTuple):
+    """
+    Các vector mức điểm duy nhất của thí sinh có đủ điểm mọi môn trong khối.
+
+    Attributes:
+        subjects: list cột điểm.
+        keys:     int64 [U] — mã hoá vector (cơ số N_SCORE_LEVELS), tăng dần.
+        levels:   int16 [U, len(subjects)] — mức điểm (điểm = mức / SCORE_SCALE).
+        weights:  int64 [U] — số thí sinh có vector này.
+    """
+    subjects: list
+    keys:     np.ndarray
+    levels:   np.ndarray
+    weights:  np.ndarray
+
+    @property
+    def values(self) -> np.ndarray:
+        """Vector điểm float64 [U, len(subjects)]."""
+        return self.levels / SCORE_SCALE
+
+    @property
+    def n_candidates(self) -> int:
+        """Tổng số thí sinh (= tổng trọng số)."""
+        return int(self.weights.sum())
+
+
+def _encode(levels: np.ndarray) -> np.ndarray:
+    """Mã hoá mỗi dòng mức điểm thành một số int64 (cơ số N_SCORE_LEVELS)."""
+    keys = np.zeros(len(levels), np.int64)
+    for j in range(levels.shape[1]):
+        keys = keys * N_SCORE_LEVELS + levels[:, j]
+    return keys
+
+
+def _decode(keys: np.ndarray, n_subjects: int) -> np.ndarray:
+    levels = np.empty((len(keys), n_subjects), np.int16)
+    rest   = keys.copy()
+    for j in range(n_subjects - 1, -1, -1):
+        levels[:, j] = rest % N_SCORE_LEVELS
+        rest //= N_SCORE_LEVELS
+    return levels
+
+
+def _source_columns(subjects: list) -> list:
+    """Cột của DataFrame cần đọc cho các môn (N1–N7 → ngoai_ngu + mã ngoại ngữ)."""
+    cols = ["ngoai_ngu" if s in FOREIGN_LANG_LABELS else s for s in subjects]
+    if "ngoai_ngu" in cols and any(s in FOREIGN_LANG_LABELS for s in subjects):
+        cols.append("ma_mon_ngoai_ngu")
+    return list(dict.fromkeys(cols))
+
+
+def _block_level_matrix(df: pd.DataFrame, subjects: list) -> np.ndarray:
+    """Ma trận mức điểm int16 [len(df), len(subjects)], -1 = không có điểm."""
+    levels = _level_matrix(df[_source_columns(subjects)])
+    return levels[:, [BLOCK_SUBJECTS.index(s) for s in subjects]]
+
+
+def score_vectors(df: pd.DataFrame, block, batch_rows: int = _BATCH_ROWS) -> ScoreVectors:
+    """
+    Gộp vector điểm của các thí sinh có đủ điểm mọi môn trong khối thành các
+    vector duy nhất kèm số lượng (theo lô, bộ nhớ tạm ~ batch_rows dòng).
+
+    Args:
+        df:    DataFrame điểm (float hoặc dạng nén của src.encoding).
+        block: Mã tổ hợp hoặc list cột điểm.
+
+    Returns:
+        ScoreVectors.
+    """
+    subjects = block_subjects(block)
+    if len(subjects) > 8:
+        raise ValueError("Tối đa 8 môn mỗi khối (mã hoá vector trong int64)")
+    missing = [c for c in _source_columns(subjects) if c not in df.columns]
+    if missing:
+        raise KeyError(f"Không có cột điểm {missing} trong DataFrame")
+
+    keys, counts = [], []
+    for start in range(0, len(df), batch_rows):
+        levels = _block_level_matrix(df.iloc[start:start + batch_rows], subjects)
+        levels = levels[(levels >= 0).all(axis=1)].astype(np.int64)
+        k, c   = np.unique(_encode(levels), return_counts=True)
+        keys.append(k)
+        counts.append(c)
+
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    weights       = np.bincount(inverse, weights=np.concatenate(counts), minlength=len(keys))
+    return ScoreVectors(subjects, keys, _decode(keys, len(subjects)), weights.astype(np.int64))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# K-Means có trọng số
+# ──────────────────────────────────────────────────────────────────────────────
+class CandidateClusters:
+    """
+    Kết quả phân cụm thí sinh; cụm được đánh số theo thứ hạng điểm trung
+    bình (0 = cụm có ĐTB các môn cao nhất), giống cluster_rank trong
+    src.plotting.
+
+    Attributes:
+        vectors: ScoreVectors đã phân cụm.
+        labels:  int64 [U] — cụm của từng vector duy nhất.
+        centers: float64 [k, len(subjects)] — tâm cụm theo thang điểm gốc.
+        inertia: Tổng bình phương khoảng cách có trọng số (không gian chuẩn hoá).
+        model:   Mô hình sklearn đã fit (trên không gian chuẩn hoá).
+        scaler:  StandardScaler có trọng số dùng để chuẩn hoá.
+    """
+
+    def __init__(self, vectors: ScoreVectors, model, scaler: StandardScaler):
+        centers = scaler.inverse_transform(model.cluster_centers_)
+        order   = np.argsort(-centers.mean(axis=1), kind="stable")
+        rank    = np.empty(len(order), np.int64)
+        rank[order] = np.arange(len(order))
+
+        self.vectors = vectors
+        self.model   = model
+        self.scaler  = scaler
+        self.labels  = rank[model.labels_]
+        self.centers = centers[order]
+        self.inertia = float(model.inertia_)
+
+    @property
+    def subjects(self) -> list:
+        return self.vectors.subjects
+
+    @property
+    def k(self) -> int:
+        return len(self.centers)
+
+    def sizes(self) -> np.ndarray:
+        """Số thí sinh mỗi cụm."""
+        return np.bincount(self.labels, weights=self.vectors.weights, minlength=self.k).astype(np.int64)
+
+    def profile(self) -> pd.DataFrame:
+        """
+        Bảng hồ sơ cụm (tính có trọng số trên vector duy nhất).
+
+        Returns:
+            DataFrame index = cluster_rank, cột n, share, n_vectors,
+            mean_{môn}, std_{môn} và mean_all (ĐTB các môn).
+        """
+        w, x, lbl = self.vectors.weights.astype("float64"), self.vectors.values, self.labels
+        n    = np.bincount(lbl, weights=w, minlength=self.k)
+        out  = pd.DataFrame({
+            "n":         n.astype(np.int64),
+            "share":     n / n.sum(),
+            "n_vectors": np.bincount(lbl, minlength=self.k),
+        })
+        for j, s in enumerate(self.subjects):
+            s1 = np.bincount(lbl, weights=w * x[:, j], minlength=self.k)
+            s2 = np.bincount(lbl, weights=w * x[:, j] ** 2, minlength=self.k)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = s1 / n
+                var  = (s2 - n * mean ** 2) / (n - 1)
+            out[f"mean_{s}"] = mean
+            out[f"std_{s}"]  = np.sqrt(np.maximum(var, 0))
+        out["mean_all"] = out[[f"mean_{s}" for s in self.subjects]].mean(axis=1)
+        out.index.name  = "cluster_rank"
+        return out
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Cụm của từng dòng trong `df` (tra theo vector điểm; -1 nếu thiếu môn
+        hoặc vector không có trong dữ liệu đã phân cụm).
+        """
+        levels = _block_level_matrix(df, self.subjects)
+        ok     = (levels >= 0).all(axis=1)
+        keys   = _encode(np.where(ok[:, None], levels, 0).astype(np.int64))
+        pos    = np.clip(np.searchsorted(self.vectors.keys, keys), 0, len(self.vectors.keys) - 1)
+        found  = ok & (self.vectors.keys[pos] == keys)
+        return np.where(found, self.labels[pos], -1)
+
+
+def _make_kmeans(method: str, n_points: int, k: int, random_state: int, n_init: int):
+    """KMeans hoặc MiniBatchKMeans ('auto': MiniBatch khi n_points ≥ _MINIBATCH_MIN)."""
+    if method not in ("auto", "kmeans", "minibatch"):
+        raise ValueError("method phải là 'auto', 'kmeans' hoặc 'minibatch'")
+    if method == "auto":
+        method = "minibatch" if n_points >= _MINIBATCH_MIN else "kmeans"
+    if method == "kmeans":
+        return KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=n_init, batch_size=4096)
+
+
+def fit_weighted_kmeans(
+    vectors: ScoreVectors,
+    k: int = 4,
+    method: str = "auto",
+    random_state: int = 42,
+    n_init: int = 10,
+) -> CandidateClusters:
+    """
+    K-Means có trọng số trên các vector điểm duy nhất (đã chuẩn hoá z-score
+    có trọng số, như StandardScaler trên dữ liệu thô).
+
+    Args:
+        vectors:      ScoreVectors từ `score_vectors`.
+        k:            Số cụm.
+        method:       'kmeans', 'minibatch' hoặc 'auto' (MiniBatchKMeans khi
+                      số vector duy nhất ≥ _MINIBATCH_MIN).
+        random_state: Seed.
+        n_init:       Số lần khởi tạo.
+
+    Returns:
+        CandidateClusters.
+    """
+    if len(vectors.keys) < k:
+        raise ValueError(f"Chỉ có {len(vectors.keys)} vector điểm khác nhau, không đủ cho k = {k}")
+
+    weights = vectors.weights.astype("float64")
+    scaler  = StandardScaler().fit(vectors.values, sample_weight=weights)
+    X       = scaler.transform(vectors.values)
+    model   = _make_kmeans(method, len(X), k, random_state, n_init)
+    model.fit(X, sample_weight=weights)
+    return CandidateClusters(vectors, model, scaler)
+
+
+def cluster_candidates(
+    df: pd.DataFrame,
+    block,
+    k: int = 4,
+    method: str = "auto",
+    random_state: int = 42,
+    verbose: bool = True,
+) -> CandidateClusters:
+    """
+    Phân cụm thí sinh theo vector điểm của một khối môn: gộp vector trùng
+    (`score_vectors`) rồi chạy K-Means có trọng số (`fit_weighted_kmeans`).
+
+    Args:
+        df:           DataFrame điểm.
+        block:        Mã tổ hợp (vd: 'A00') hoặc list cột điểm.
+        k:            Số cụm.
+        method:       Xem `fit_weighted_kmeans`.
+        random_state: Seed.
+        verbose:      In bảng tổng hợp cụm.
+
+    Returns:
+        CandidateClusters.
+    """
+    vectors = score_vectors(df, block)
+    res     = fit_weighted_kmeans(vectors, k, method, random_state)
+    if verbose:
+        name = block if isinstance(block, str) else " + ".join(_label(s) for s in block)
+        print(f"Khối {name}: {vectors.n_candidates:,} thí sinh đủ điểm, "
+              f"{len(vectors.keys):,} vector điểm khác nhau")
+        prof = res.profile()
+        print(f"\n=== CỤM THÍ SINH (KHỐI {name.upper()}, k = {k}) ===")
+        for rank, row in prof.iterrows():
+            means = ", ".join(
+                f"{_label(s)} {row[f'mean_{s}']:.2f}" for s in res.subjects
+            )
+            print(f"[Cụm {rank + 1}] {int(row['n']):>9,} thí sinh ({row['share']:.1%})  |  {means}")
+    return res
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Silhouette cho dữ liệu lớn
+# ──────────────────────────────────────────────────────────────────────────────
+class SilhouetteResult(NamedTuple):
+    """Silhouette trung bình (có trọng số) kèm khoảng tin cậy (= score khi tính chính xác)."""
+    score:    float
+    ci_low:   float
+    ci_high:  float
+    n_points: int     # số điểm đã tính silhouette
+
+
+def _point_silhouettes(X, labels, weights, idx, block_elements: int = _BLOCK_ELEMENTS) -> np.ndarray:
+    """
+    Silhouette của các điểm `idx` so với toàn bộ X (có trọng số), tính theo
+    khối dòng để ma trận khoảng cách tạm không vượt `block_elements` phần tử.
+
+    Với trọng số w (số thí sinh trùng vector), kết quả bằng đúng silhouette
+    của từng thí sinh trên dữ liệu thô: a(i) chia cho (W_cụm − 1) vì các bản
+    sao khác của i nằm ở khoảng cách 0; cụm chỉ có một thí sinh cho s = 0
+    (như sklearn).
+    """
+    k        = int(labels.max()) + 1
+    onehot   = np.zeros((len(X), k))
+    onehot[np.arange(len(X)), labels] = weights
+    W        = onehot.sum(axis=0)
+    sq       = (X ** 2).sum(axis=1)
+    rows     = max(1, block_elements // len(X))
+    out      = np.empty(len(idx))
+    for start in range(0, len(idx), rows):
+        ii  = idx[start:start + rows]
+        d2  = sq[ii, None] + sq[None, :] - 2 * X[ii] @ X.T
+        S   = np.sqrt(np.maximum(d2, 0)) @ onehot                 # Σ w·d tới từng cụm
+        own = labels[ii]
+        r   = np.arange(len(ii))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            a = S[r, own] / (W[own] - 1)
+            mean_other = S / W
+        mean_other[r, own] = np.inf
+        b   = mean_other.min(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sil = (b - a) / np.maximum(a, b)
+        out[start:start + len(ii)] = np.where(W[own] > 1, np.nan_to_num(sil), 0.0)
+    return out
+
+
+def silhouette_weighted(X, labels, sample_weight=None, block_elements: int = _BLOCK_ELEMENTS) -> float:
+    """
+    Silhouette chính xác (có trọng số) — bằng `sklearn.metrics.silhouette_score`
+    trên dữ liệu thô đã bung theo trọng số, nhưng chỉ tốn O(U²) trên U điểm
+    duy nhất và bộ nhớ tạm giới hạn bởi `block_elements`.
+    """
+    X       = np.asarray(X, dtype="float64")
+    labels  = np.unique(labels, return_inverse=True)[1]
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype="float64")
+    sil     = _point_silhouettes(X, labels, weights, np.arange(len(X)), block_elements)
+    return float((weights * sil).sum() / weights.sum())
+
+
+def silhouette_sampled(
+    X,
+    labels,
+    sample_weight=None,
+    n_samples: int = 2_000,
+    confidence: float = 0.95,
+    random_state: int = 42,
+) -> SilhouetteResult:
+    """
+    Ước lượng Silhouette bằng mẫu phân tầng theo cụm: mỗi cụm rút số thí
+    sinh tỉ lệ với kích thước (≥ 2, rút theo trọng số, có hoàn lại), silhouette
+    của từng thí sinh trong mẫu tính chính xác trên toàn bộ X. Khoảng tin cậy
+    dùng phương sai của ước lượng phân tầng (xấp xỉ chuẩn).
+
+    Chi phí O(n_samples × U) thời gian, bộ nhớ theo khối.
+    """
+    X       = np.asarray(X, dtype="float64")
+    labels  = np.unique(labels, return_inverse=True)[1]
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype="float64")
+    rng     = np.random.default_rng(random_state)
+
+    W     = np.bincount(labels, weights=weights)
+    share = W / W.sum()
+    idx, strata = [], []
+    for c in range(len(W)):
+        members = np.flatnonzero(labels == c)
+        m       = max(2, int(round(n_samples * share[c])))
+        idx.append(rng.choice(members, size=m, p=weights[members] / W[c]))
+        strata.append(np.full(m, c))
+    idx, strata = np.concatenate(idx), np.concatenate(strata)
+
+    sil   = _point_silhouettes(X, labels, weights, idx)
+    means = np.array([sil[strata == c].mean() for c in range(len(W))])
+    var   = np.array([sil[strata == c].var(ddof=1) / (strata == c).sum() for c in range(len(W))])
+    score = float((share * means).sum())
+    half  = float(scipy_stats.norm.ppf(0.5 + confidence / 2) * np.sqrt((share ** 2 * var).sum()))
+    return SilhouetteResult(score, score - half, score + half, len(idx))
+
+
+def silhouette(
+    X,
+    labels,
+    sample_weight=None,
+    method: str = "auto",
+    n_samples: int = 2_000,
+    random_state: int = 42,
+) -> SilhouetteResult:
+    """
+    Silhouette cho mọi cỡ dữ liệu.
+
+    Args:
+        X:             Ma trận điểm (đã chuẩn hoá).
+        labels:        Nhãn cụm.
+        sample_weight: Trọng số (vd: số thí sinh trùng vector), None = 1.
+        method:        'exact' (`silhouette_weighted`), 'sample'
+                       (`silhouette_sampled`) hoặc 'auto' (exact khi số điểm
+                       ≤ _EXACT_SILHOUETTE_MAX).
+        n_samples:     Cỡ mẫu cho 'sample'.
+        random_state:  Seed cho 'sample'.
+
+    Returns:
+        SilhouetteResult.
+    """
+    if method not in ("auto", "exact", "sample"):
+        raise ValueError("method phải là 'auto', 'exact' hoặc 'sample'")
+    if method == "auto":
+        method = "exact" if len(X) <= _EXACT_SILHOUETTE_MAX else "sample"
+    if method == "sample":
+        return silhouette_sampled(X, labels, sample_weight, n_samples, random_state=random_state)
+    score = silhouette_weighted(X, labels, sample_weight)
+    return SilhouetteResult(score, score, score, len(X))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Dải k cho Elbow / Silhouette
+# ──────────────────────────────────────────────────────────────────────────────
+class KSweep(NamedTuple):
+    """
+    Kết quả fit K-Means cho một dải k.
+
+    Attributes:
+        k_values:        list k theo thứ tự.
+        inertias:        float64 [len(k_values)].
+        silhouettes:     float64 [len(k_values)].
+        silhouette_low:  Cận dưới khoảng tin cậy của Silhouette (= silhouettes khi tính chính xác).
+        silhouette_high: Cận trên khoảng tin cậy của Silhouette.
+        models:          dict k → mô hình đã fit.
+    """
+    k_values:        list
+    inertias:        np.ndarray
+    silhouettes:     np.ndarray
+    silhouette_low:  np.ndarray
+    silhouette_high: np.ndarray
+    models:          dict
+
+    @property
+    def best_k(self) -> int:
+        """k có Silhouette cao nhất."""
+        return self.k_values[int(np.argmax(self.silhouettes))]
+
+    @property
+    def is_approximate(self) -> bool:
+        """True nếu Silhouette được ước lượng bằng lấy mẫu."""
+        return bool((self.silhouette_low < self.silhouette_high).any())
+
+    def model(self, k: int):
+        """Mô hình đã fit của k (KeyError nếu k không nằm trong sweep)."""
+        return self.models[k]
+
+
+def _fit_k(task):
+    X, weights, k, method, random_state, n_init, sil_method = task
+    km = _make_kmeans(method, len(X), k, random_state, n_init)
+    km.fit(X, sample_weight=weights)
+    sil = silhouette(X, km.labels_, weights, sil_method, random_state=random_state)
+    return km, float(km.inertia_), sil
+
+
+def _sweep_key(X: np.ndarray, weights, params: tuple) -> str:
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(X, dtype="float64").tobytes())
+    if weights is not None:
+        h.update(np.ascontiguousarray(weights, dtype="float64").tobytes())
+    h.update(repr((X.shape, params, sklearn.__version__, _SWEEP_VERSION)).encode())
+    return h.hexdigest()
+
+
+def _load_sweep(key: str, cache_dir: str):
+    """KSweep đã nhớ (RAM, rồi đĩa) theo khoá băm; None nếu chưa có."""
+    if key in _SWEEP_MEMO:
+        return _SWEEP_MEMO[key]
+    path = os.path.join(cache_dir, f"{key}.pkl") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            _SWEEP_MEMO[key] = pickle.load(f)
+        return _SWEEP_MEMO[key]
+    return None
+
+
+def _store_sweep(key: str, sweep: KSweep, cache_dir: str) -> None:
+    _SWEEP_MEMO[key] = sweep
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"{key}.pkl")
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(sweep, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+def kmeans_sweeps(
+    Xs: list,
+    k_values: list,
+    random_state: int = 42,
+    n_init: int = 10,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    sample_weights: list = None,
+    method: str = "kmeans",
+    sil_method: str = "auto",
+) -> list:
+    """
+    `kmeans_sweep` cho nhiều ma trận đặc trưng cùng lúc: mọi cặp (ma trận, k)
+    chưa có trong cache được đưa vào CÙNG một process pool, nên nhiều bài
+    phân cụm nhỏ (vd: mỗi môn / khối theo tỉnh) chạy đồng thời thay vì lần lượt.
+
+    Args:
+        Xs:             list ma trận đặc trưng (đã chuẩn hoá).
+        k_values:       list dải k, mỗi ma trận một dải (hoặc một dải dùng chung).
+        n_workers:      Số process (None = số CPU nếu tổng số điểm cần fit
+                        ≥ _PARALLEL_MIN_ROWS, 1 = tuần tự).
+        sample_weights: list trọng số theo từng ma trận (None = 1).
+        Các tham số còn lại như `kmeans_sweep`.
+
+    Returns:
+        list KSweep theo thứ tự `Xs`.
+    """
+    Xs = [np.asarray(X, dtype="float64") for X in Xs]
+    if isinstance(k_values, range) or (len(k_values) and np.isscalar(k_values[0])):
+        k_values = [k_values] * len(Xs)
+    k_values = [[int(k) for k in ks] for ks in k_values]
+    weights  = sample_weights if sample_weights is not None else [None] * len(Xs)
+    keys     = [
+        _sweep_key(X, w, (ks, random_state, n_init, method, sil_method))
+        for X, w, ks in zip(Xs, weights, k_values)
+    ]
+
+    sweeps = [_load_sweep(key, cache_dir) for key in keys]
+    todo   = {}
+    for i, key in enumerate(keys):
+        if sweeps[i] is None:
+            todo.setdefault(key, i)
+    tasks = [
+        (Xs[i], weights[i], k, method, random_state, n_init, sil_method)
+        for i in todo.values() for k in k_values[i]
+    ]
+    if tasks:
+        if n_workers is None:
+            n_points  = sum(len(t[0]) for t in tasks)
+            n_workers = (os.cpu_count() or 1) if n_points >= _PARALLEL_MIN_ROWS else 1
+        n_workers = max(1, min(n_workers, len(tasks)))
+        if n_workers == 1:
+            fits = [_fit_k(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                fits = list(pool.map(_fit_k, tasks))
+
+        pos = 0
+        for key, i in todo.items():
+            ks, part = k_values[i], fits[pos:pos + len(k_values[i])]
+            pos     += len(ks)
+            sweep    = KSweep(
+                k_values=ks,
+                inertias=np.array([f[1] for f in part]),
+                silhouettes=np.array([f[2].score for f in part]),
+                silhouette_low=np.array([f[2].ci_low for f in part]),
+                silhouette_high=np.array([f[2].ci_high for f in part]),
+                models={k: f[0] for k, f in zip(ks, part)},
+            )
+            _store_sweep(key, sweep, cache_dir)
+        sweeps = [_SWEEP_MEMO[key] for key in keys]
+    return sweeps
+
+
+def kmeans_sweep(
+    X: np.ndarray,
+    k_values=range(2, 10),
+    random_state: int = 42,
+    n_init: int = 10,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    sample_weight=None,
+    method: str = "kmeans",
+    sil_method: str = "auto",
+) -> KSweep:
+    """
+    Fit K-Means cho mọi k trong `k_values` (mỗi k một tác vụ trên process
+    pool) kèm inertia và Silhouette. Kết quả được nhớ theo băm của `X`,
+    trọng số và tham số: trong RAM cho phiên hiện tại và dưới dạng pickle
+    trong `cache_dir` cho các lần chạy sau — dữ liệu không đổi thì không fit lại.
+
+    Args:
+        X:             Ma trận đặc trưng (đã chuẩn hoá).
+        k_values:      Dải k.
+        random_state:  Seed của KMeans (và của mẫu Silhouette).
+        n_init:        Số lần khởi tạo của KMeans.
+        n_workers:     Số process (None = số CPU nếu len(X) × số k ≥ _PARALLEL_MIN_ROWS,
+                       1 = tuần tự).
+        cache_dir:     Thư mục cache trên đĩa (None = không ghi đĩa).
+        sample_weight: Trọng số điểm (vd: ScoreVectors.weights), None = 1.
+        method:        'kmeans', 'minibatch' hoặc 'auto' (xem `fit_weighted_kmeans`).
+        sil_method:    'exact', 'sample' hoặc 'auto' (xem `silhouette`).
+
+    Returns:
+        KSweep.
+    """
+    sweep, = kmeans_sweeps([X], [list(k_values)], random_state, n_init, n_workers, cache_dir,
+                           [sample_weight], method, sil_method)
+    return sweep
+
+
+def fit_kmeans(X: np.ndarray, k: int, sweep: KSweep = None, **kwargs):
+    """
+    Mô hình KMeans k cụm trên X: lấy từ `sweep` nếu đã có k, nếu không thì
+    fit (qua `kmeans_sweep` với đúng một k, nên cũng được cache).
+    """
+    if sweep is not None and k in sweep.models:
+        return sweep.model(k)
+    return kmeans_sweep(X, [k], **kwargs).model(k)
+
+
+def candidate_sweep(
+    vectors: ScoreVectors,
+    k_values=range(2, 10),
+    method: str = "auto",
+    sil_method: str = "auto",
+    random_state: int = 42,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+) -> KSweep:
+    """
+    Dải k (Elbow + Silhouette) cho phân cụm thí sinh: K-Means có trọng số
+    trên vector điểm duy nhất đã chuẩn hoá như `fit_weighted_kmeans`;
+    Silhouette có trọng số (chính xác hoặc lấy mẫu kèm khoảng tin cậy).
+    """
+    weights = vectors.weights.astype("float64")
+    X       = StandardScaler().fit(vectors.values, sample_weight=weights).transform(vectors.values)
+    return kmeans_sweep(X, k_values, random_state, n_workers=n_workers, cache_dir=cache_dir,
+                        sample_weight=weights, method=method, sil_method=sil_method)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Phân cụm tỉnh theo mean & std (nhiều bài trong một lần quét)
+# ──────────────────────────────────────────────────────────────────────────────
+class ClusterSpec(NamedTuple):
+    """
+    Một bài phân cụm nhóm (tỉnh) theo mean & std điểm.
+
+    Attributes:
+        subjects:  str = đơn môn (như `kmeans_subject_2d`); list = đa môn, chỉ
+                   tính thí sinh thi đủ các môn (như `kmeans_multi_subject_2d`).
+        label:     Tên hiển thị (vd: 'Toán', 'Tự Nhiên').
+        k:         Số cụm.
+        group_col: Cột nhóm ('tinh' hoặc 'tinh_moi').
+    """
+    subjects:  object
+    label:     str
+    k:         int = 4
+    group_col: str = "tinh"
+
+    @property
+    def columns(self) -> list:
+        return [self.subjects] if isinstance(self.subjects, str) else list(self.subjects)
+
+    @property
+    def multi(self) -> bool:
+        return not isinstance(self.subjects, str)
+
+    @property
+    def slug(self) -> str:
+        """Tên dùng trong tên file ảnh (thêm cột nhóm nếu khác 'tinh')."""
+        slug = "_".join(self.columns)
+        return slug if self.group_col == "tinh" else f"{slug}_{self.group_col}"
+
+
+class ProvinceClusters(NamedTuple):
+    """
+    Kết quả một bài phân cụm nhóm.
+
+    Attributes:
+        spec:         ClusterSpec.
+        stats:        Bảng theo nhóm: mean_/std_ từng môn (+ mean_all, std_all
+                      nếu đa môn), cluster, cluster_rank (0 = ĐTB cao nhất).
+        feat_cols:    Cột đặc trưng theo thứ tự của mô hình.
+        n_candidates: Số thí sinh được tính (đa môn: thi đủ các môn).
+        sweep:        KSweep của dải k (Elbow + Silhouette).
+        model:        KMeans spec.k cụm (trên đặc trưng đã chuẩn hoá).
+        scaler:       StandardScaler của đặc trưng.
+        rank_map:     dict nhãn cụm của mô hình → cluster_rank.
+    """
+    spec:         ClusterSpec
+    stats:        pd.DataFrame
+    feat_cols:    list
+    n_candidates: int
+    sweep:        KSweep
+    model:        object
+    scaler:       StandardScaler
+    rank_map:     dict
+
+    @property
+    def axes(self) -> tuple:
+        """Cột trục (x, y) của scatter 2D."""
+        if self.spec.multi:
+            return "mean_all", "std_all"
+        return self.feat_cols[0], self.feat_cols[1]
+
+    def centers_2d(self) -> np.ndarray:
+        """Tâm cụm trên trục scatter (mean/std TB các môn) [k, 2], theo nhãn mô hình."""
+        centers = self.scaler.inverse_transform(self.model.cluster_centers_)
+        cols    = self.spec.columns
+        mean_ix = [self.feat_cols.index(f"mean_{c}") for c in cols]
+        std_ix  = [self.feat_cols.index(f"std_{c}") for c in cols]
+        return np.array([[np.mean(c[mean_ix]), np.mean(c[std_ix])] for c in centers])
+
+
+def _province_features(gs: GroupStats, spec: ClusterSpec):
+    """Bảng mean/std theo nhóm, cột đặc trưng, scaler và ma trận đã chuẩn hoá."""
+    cols      = spec.columns
+    stats     = gs.table(cols).dropna().reset_index(drop=True)
+    mean_cols = [f"mean_{c}" for c in cols]
+    std_cols  = [f"std_{c}"  for c in cols]
+    if spec.multi:
+        stats["mean_all"] = stats[mean_cols].mean(axis=1)
+        stats["std_all"]  = stats[std_cols].mean(axis=1)
+    feat_cols = [col for pair in zip(mean_cols, std_cols) for col in pair]
+    scaler    = StandardScaler()
+    X_scaled  = scaler.fit_transform(stats[feat_cols].values)
+    return stats, feat_cols, scaler, X_scaled
+
+
+def _cluster_stats(pairs: list, n_workers: int, cache_dir: str) -> list:
+    """Phân cụm mọi (GroupStats, ClusterSpec): các dải k fit chung một pool."""
+    prepared = [_province_features(gs, spec) for gs, spec in pairs]
+    k_ranges = [
+        range(2, min(len(p[0]), 10)) if spec.multi else range(2, 10)
+        for p, (_, spec) in zip(prepared, pairs)
+    ]
+    sweeps = kmeans_sweeps([p[3] for p in prepared], [list(k) for k in k_ranges],
+                           n_workers=n_workers, cache_dir=cache_dir)
+
+    results = []
+    for (gs, spec), (stats, feat_cols, scaler, X_scaled), sweep in zip(pairs, prepared, sweeps):
+        km               = fit_kmeans(X_scaled, spec.k, sweep, cache_dir=cache_dir)
+        stats["cluster"] = km.labels_
+        x_col            = "mean_all" if spec.multi else feat_cols[0]
+        cluster_order    = (
+            stats.groupby("cluster")[x_col].mean()
+            .sort_values(ascending=False).index.tolist()
+        )
+        rank_map              = {c: i for i, c in enumerate(cluster_order)}
+        stats["cluster_rank"] = stats["cluster"].map(rank_map)
+        n_candidates          = int(gs.n[:, gs.subjects.index(spec.columns[0])].sum())
+        results.append(ProvinceClusters(spec, stats, feat_cols, n_candidates,
+                                        sweep, km, scaler, rank_map))
+    return results
+
+
+def province_clusters(
+    gs: GroupStats,
+    spec: ClusterSpec,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+) -> ProvinceClusters:
+    """
+    Phân cụm nhóm theo mean & std từ GroupStats đã dựng (đa môn: GroupStats
+    complete=True trên đúng spec.columns).
+    """
+    return _cluster_stats([(gs, spec)], n_workers, cache_dir)[0]
+
+
+def cluster_provinces(
+    df: pd.DataFrame,
+    specs: list,
+    index: GroupIndex = None,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+) -> list:
+    """
+    Nhiều bài phân cụm nhóm cùng lúc: mọi histogram theo nhóm (mọi cột
+    nhóm, môn đơn lẻ và từng khối đa môn) dựng trong MỘT lần quét df qua
+    `group_stats_many`, rồi mọi dải k của mọi bài fit chung một process pool
+    (`kmeans_sweeps`).
+
+    Args:
+        df:        DataFrame điểm.
+        specs:     list ClusterSpec.
+        index:     GroupIndex của df (tuỳ chọn).
+        n_workers: Số process cho toàn bộ tác vụ fit.
+        cache_dir: Thư mục cache kết quả K-Means (None = không ghi đĩa).
+
+    Returns:
+        list ProvinceClusters theo thứ tự `specs`.
+    """
+    specs    = [s if isinstance(s, ClusterSpec) else ClusterSpec(*s) for s in specs]
+    requests = [(s.group_col, s.columns, s.multi) for s in specs]
+    stats    = group_stats_many(df, requests, index=index)
+    return _cluster_stats(list(zip(stats, specs)), n_workers, cache_dir)
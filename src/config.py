@@ -2,11 +2,19 @@
 config.py — Hằng số dùng chung cho toàn bộ dự án phân tích điểm thi THPT 2025.
 """
 
+import os
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Thư mục xuất biểu đồ
 # ──────────────────────────────────────────────────────────────────────────────
 OUTPUT_DIR = "dist/charts"
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Thư mục cache kết quả tính toán (K-Means…), tuyệt đối theo gốc dự án để
+# notebook chạy từ notebooks/ vẫn dùng chung cache
+# ──────────────────────────────────────────────────────────────────────────────
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Cột điểm số
 # ──────────────────────────────────────────────────────────────────────────────
@@ -17,6 +25,12 @@ SCORE_COLS = [
     "ngoai_ngu", "giao_duc_cong_dan",
 ]
 
+# Bước điểm nhỏ nhất: mọi môn đều là bội của 0.05 (đa số là bội của 0.25)
+# → điểm 0–10 ứng với 201 mức rời rạc, mã hoá vừa trong uint8
+SCORE_STEP     = 0.05
+SCORE_SCALE    = 20                     # = 1 / SCORE_STEP (số mức mỗi điểm)
+N_SCORE_LEVELS = 10 * SCORE_SCALE + 1   # 0.00, 0.05, …, 10.00
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Nhãn hiển thị tiếng Việt cho từng môn thi
 # ──────────────────────────────────────────────────────────────────────────────
@@ -49,6 +63,65 @@ FOREIGN_LANG_LABELS = {
     "N7": "Tiếng Hàn",
 }
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Tổ hợp xét tuyển (mã tổ hợp → 3 môn)
+# Mã N1–N7 = điểm 'ngoai_ngu' của thí sinh thi đúng ngôn ngữ đó; môn GDCD
+# trong các tổ hợp cũ được tính bằng GDKT&PL (chương trình 2018)
+# ──────────────────────────────────────────────────────────────────────────────
+_GDKTPL = "giao_duc_kinh_te_va_phap_luat"
+
+ADMISSION_BLOCKS = {
+    "A00": ("toan", "li", "hoa"),
+    "A01": ("toan", "li", "N1"),
+    "A02": ("toan", "li", "sinh"),
+    "A03": ("toan", "li", "su"),
+    "A04": ("toan", "li", "dia"),
+    "A05": ("toan", "hoa", "su"),
+    "A06": ("toan", "hoa", "dia"),
+    "A07": ("toan", "su", "dia"),
+    "A08": ("toan", "su", _GDKTPL),
+    "A09": ("toan", "dia", _GDKTPL),
+    "A10": ("toan", "li", _GDKTPL),
+    "A11": ("toan", "hoa", _GDKTPL),
+    "B00": ("toan", "hoa", "sinh"),
+    "B02": ("toan", "sinh", "dia"),
+    "B03": ("toan", "sinh", "van"),
+    "B04": ("toan", "sinh", _GDKTPL),
+    "B08": ("toan", "sinh", "N1"),
+    "C00": ("van", "su", "dia"),
+    "C01": ("van", "toan", "li"),
+    "C02": ("van", "toan", "hoa"),
+    "C03": ("van", "toan", "su"),
+    "C04": ("van", "toan", "dia"),
+    "C05": ("van", "li", "hoa"),
+    "C08": ("van", "hoa", "sinh"),
+    "C12": ("van", "su", "sinh"),
+    "C13": ("van", "sinh", "dia"),
+    "C14": ("van", "toan", _GDKTPL),
+    "C19": ("van", "su", _GDKTPL),
+    "C20": ("van", "dia", _GDKTPL),
+    "D01": ("van", "toan", "N1"),
+    "D02": ("van", "toan", "N2"),
+    "D03": ("van", "toan", "N3"),
+    "D04": ("van", "toan", "N4"),
+    "D05": ("van", "toan", "N5"),
+    "D06": ("van", "toan", "N6"),
+    "DD2": ("van", "toan", "N7"),
+    "D07": ("toan", "hoa", "N1"),
+    "D08": ("toan", "sinh", "N1"),
+    "D09": ("toan", "su", "N1"),
+    "D10": ("toan", "dia", "N1"),
+    "D11": ("van", "li", "N1"),
+    "D12": ("van", "hoa", "N1"),
+    "D13": ("van", "sinh", "N1"),
+    "D14": ("van", "su", "N1"),
+    "D15": ("van", "dia", "N1"),
+    "D66": ("van", _GDKTPL, "N1"),
+    "D84": ("toan", _GDKTPL, "N1"),
+    "X06": ("toan", "li", "tin_hoc"),
+    "X26": ("toan", "tin_hoc", "N1"),
+}
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Màu sắc & nhãn cho K-Means (k=4)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -248,3 +321,13 @@ PROVINCE_NEW_PROVINCE = {
     "Hà Nội":         "Hà Nội",
     "Thừa Thiên Huế": "Thừa Thiên Huế",
 }
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Danh mục cho cột tỉnh dạng categorical (ma_tinh / tinh / tinh_moi)
+# Thứ tự danh mục cố định → mã số nguyên ổn định giữa các lần ETL
+# ──────────────────────────────────────────────────────────────────────────────
+PROVINCE_CODES     = sorted(CODE_PROVINCE)                            # "01" … "64"
+PROVINCE_NAMES     = [CODE_PROVINCE[c] for c in PROVINCE_CODES]       # cùng thứ tự
+NEW_PROVINCE_NAMES = list(dict.fromkeys(
+    PROVINCE_NEW_PROVINCE[name] for name in PROVINCE_NAMES
+))
@@ -0,0 +1,411 @@
+"""
+cube.py — Khối đếm điểm (tỉnh × môn × mức điểm) dựng một lần từ dữ liệu.
+
+Mọi điểm thi nằm trên lưới SCORE_STEP = 0.05 nên phân phối của bất kỳ
+(tỉnh, môn) nào đều được mô tả chính xác bằng một vector đếm 201 phần tử.
+Từ khối đếm có thể suy ra n, mean, phương sai, trung vị, phân vị, số điểm
+10 / điểm 0 mà không cần quét lại 1,1 triệu dòng. Khối đếm kèm số thí sinh
+theo số môn dự thi và các tổng tích chéo giữa từng cặp môn, nên toàn bộ EDA
+(histogram, số môn, tỷ lệ Ngoại ngữ, tương quan, số thí sinh theo tỉnh) chạy
+trên file khối đếm vài trăm KB.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import (
+    SCORE_COLS,
+    SCORE_SCALE,
+    N_SCORE_LEVELS,
+    FOREIGN_LANG_LABELS,
+    PROVINCE_CODES,
+    PROVINCE_NAMES,
+    NEW_PROVINCE_NAMES,
+    PROVINCE_NEW_PROVINCE,
+)
+from src.encoding import score_levels
+
+# Giá trị điểm ứng với từng mức
+SCORE_VALUES = np.arange(N_SCORE_LEVELS) / SCORE_SCALE
+
+# Trục tỉnh: 63 mã tỉnh + 1 ô cho thí sinh không xác định được tỉnh
+CUBE_PROVINCES = PROVINCE_CODES + [""]
+
+# Trục ngôn ngữ: N1–N7 + 1 ô cho mã khác / thiếu mã
+CUBE_LANGS = list(FOREIGN_LANG_LABELS) + [""]
+
+# Số dòng xử lý mỗi lô khi dựng khối đếm
+_BATCH_ROWS = 200_000
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Thống kê từ vector đếm
+# ──────────────────────────────────────────────────────────────────────────────
+def _value_at(cum: np.ndarray, k) -> np.ndarray:
+    """Giá trị thứ k (0-based) của mẫu đã sắp xếp, từ tổng tích luỹ `cum`."""
+    return np.searchsorted(cum, np.asarray(k), side="right") / SCORE_SCALE
+
+
+def quantile_from_counts(counts: np.ndarray, q) -> np.ndarray:
+    """
+    Phân vị từ vector đếm, nội suy tuyến tính giống `pd.Series.quantile`.
+
+    Args:
+        counts: Vector đếm theo mức (mức i ↔ điểm i / SCORE_SCALE); dài
+                N_SCORE_LEVELS với một môn, dài hơn với tổng điểm tổ hợp.
+        q:      Mức phân vị (số hoặc mảng) trong [0, 1].
+    """
+    counts = np.asarray(counts)
+    n      = int(counts.sum())
+    if n == 0:
+        return np.full(np.shape(q), np.nan)
+    cum  = np.cumsum(counts)
+    pos  = (n - 1) * np.asarray(q, dtype="float64")
+    lo   = np.floor(pos)
+    x_lo = _value_at(cum, lo)
+    x_hi = _value_at(cum, np.minimum(lo + 1, n - 1))
+    return x_lo + (pos - lo) * (x_hi - x_lo)
+
+
+def summarize_counts(counts: np.ndarray) -> dict:
+    """
+    Thống kê mô tả chính xác từ vector đếm (phương sai/std với ddof=1, như pandas).
+
+    Returns:
+        dict: n, mean, var, std, min, q25, median, q75, max, count_10, count_0
+        (count_10 = số thí sinh đạt mức cao nhất của vector).
+    """
+    counts = np.asarray(counts, dtype="int64")
+    n      = int(counts.sum())
+    levels = np.arange(len(counts), dtype="float64")
+    s1     = float(counts @ levels)
+    s2     = float(counts @ (levels * levels))
+
+    mean = s1 / n / SCORE_SCALE if n else np.nan
+    var  = (s2 - s1 * s1 / n) / (n - 1) / SCORE_SCALE**2 if n > 1 else np.nan
+    nz   = np.flatnonzero(counts)
+    q25, median, q75 = quantile_from_counts(counts, [0.25, 0.5, 0.75])
+    return {
+        "n":        n,
+        "mean":     mean,
+        "var":      var,
+        "std":      np.sqrt(var),
+        "min":      nz[0] / SCORE_SCALE if n else np.nan,
+        "q25":      q25,
+        "median":   median,
+        "q75":      q75,
+        "max":      nz[-1] / SCORE_SCALE if n else np.nan,
+        "count_10": int(counts[-1]),
+        "count_0":  int(counts[0]),
+    }
+
+
+def boxplot_stats_from_counts(counts: np.ndarray, whis: float = 1.5, label: str = None) -> dict:
+    """
+    Thống kê box plot từ vector đếm, cùng định nghĩa với
+    `matplotlib.cbook.boxplot_stats` (tứ phân vị nội suy tuyến tính, râu tới
+    điểm xa nhất trong [Q1 − whis·IQR, Q3 + whis·IQR]); dùng với `Axes.bxp`.
+    Fliers chỉ gồm các mức điểm khác nhau (điểm trùng vẽ chồng lên nhau).
+    """
+    counts = np.asarray(counts, dtype="int64")
+    n      = int(counts.sum())
+    values = np.flatnonzero(counts) / SCORE_SCALE
+    q1, med, q3 = quantile_from_counts(counts, [0.25, 0.5, 0.75])
+    iqr    = q3 - q1
+    inside = values[(values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)]
+    whislo = inside.min() if len(inside) and inside.min() <= q1 else q1
+    whishi = inside.max() if len(inside) and inside.max() >= q3 else q3
+    notch  = 1.57 * iqr / np.sqrt(n)
+    stats  = {
+        "mean":   float(counts @ np.arange(len(counts))) / n / SCORE_SCALE,
+        "med":    med, "q1": q1, "q3": q3, "iqr": iqr,
+        "cilo":   med - notch, "cihi": med + notch,
+        "whislo": whislo, "whishi": whishi,
+        "fliers": values[(values < whislo) | (values > whishi)],
+    }
+    if label is not None:
+        stats["label"] = label
+    return stats
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Khối đếm
+# ──────────────────────────────────────────────────────────────────────────────
+def _province_index(df: pd.DataFrame) -> np.ndarray:
+    """Chỉ số trên trục CUBE_PROVINCES cho từng dòng (ô cuối = không rõ tỉnh)."""
+    if "ma_tinh" in df.columns:
+        codes = pd.Categorical(df["ma_tinh"].astype("string"), categories=PROVINCE_CODES).codes
+    else:
+        sbd   = df["sobaodanh"].astype("string").str[:2]
+        codes = pd.Categorical(sbd, categories=PROVINCE_CODES).codes
+    return np.where(codes < 0, len(PROVINCE_CODES), codes).astype(np.int64)
+
+
+def _lang_index(df: pd.DataFrame) -> np.ndarray:
+    """Chỉ số trên trục CUBE_LANGS cho từng dòng (ô cuối = mã khác/thiếu)."""
+    if "ma_mon_ngoai_ngu" not in df.columns:
+        return np.full(len(df), len(CUBE_LANGS) - 1, dtype=np.int64)
+    codes = pd.Categorical(df["ma_mon_ngoai_ngu"].astype("string"), categories=CUBE_LANGS[:-1]).codes
+    return np.where(codes < 0, len(CUBE_LANGS) - 1, codes).astype(np.int64)
+
+
+def province_mask(provinces, province_col: str = "tinh") -> np.ndarray:
+    """Mặt nạ bool trên trục CUBE_PROVINCES cho danh sách tỉnh (None = tất cả)."""
+    if provinces is None:
+        return np.ones(len(CUBE_PROVINCES), dtype=bool)
+    from src.loader import province_codes
+    codes = set(province_codes(provinces, province_col))
+    return np.array([c in codes for c in CUBE_PROVINCES])
+
+
+def group_province_counts(per_prov: np.ndarray, group_col: str = "tinh"):
+    """
+    Gộp mảng đếm theo 63 tỉnh (trục 0, thứ tự PROVINCE_CODES) thành nhóm tỉnh.
+
+    Args:
+        per_prov:  Mảng [63, ...] (vd: khối đếm bỏ ô tỉnh không rõ).
+        group_col: 'ma_tinh', 'tinh' hoặc 'tinh_moi'.
+
+    Returns:
+        (labels, counts) — counts có shape [số nhóm, ...].
+    """
+    if group_col == "ma_tinh":
+        return list(PROVINCE_CODES), per_prov.copy()
+    if group_col == "tinh":
+        return list(PROVINCE_NAMES), per_prov.copy()
+    if group_col == "tinh_moi":
+        idx    = [NEW_PROVINCE_NAMES.index(PROVINCE_NEW_PROVINCE[p]) for p in PROVINCE_NAMES]
+        counts = np.zeros((len(NEW_PROVINCE_NAMES),) + per_prov.shape[1:], np.int64)
+        np.add.at(counts, idx, per_prov)
+        return list(NEW_PROVINCE_NAMES), counts
+    raise ValueError(f"group_col không hợp lệ: '{group_col}'")
+
+
+class ScoreCube:
+    """
+    Khối đếm số thí sinh theo (tỉnh, môn, mức điểm) và, riêng Ngoại ngữ,
+    theo (tỉnh, mã ngôn ngữ, mức điểm).
+
+    Attributes:
+        counts:         int64 [len(CUBE_PROVINCES), len(SCORE_COLS), N_SCORE_LEVELS]
+        lang_counts:    int64 [len(CUBE_PROVINCES), len(CUBE_LANGS), N_SCORE_LEVELS]
+        subject_counts: int64 [len(CUBE_PROVINCES), len(SCORE_COLS) + 1] — số
+                        thí sinh theo số môn có điểm (0 … len(SCORE_COLS)).
+        pairs:          int64 [4, len(SCORE_COLS), len(SCORE_COLS)] — trên các
+                        thí sinh có điểm cả môn i lẫn j (đơn vị mức điểm):
+                        n, Σxᵢ, Σxᵢ², Σxᵢxⱼ. Đủ để tính tương quan Pearson
+                        từng cặp như `df.corr()`.
+    """
+
+    def __init__(self, counts: np.ndarray = None, lang_counts: np.ndarray = None,
+                 subject_counts: np.ndarray = None, pairs: np.ndarray = None):
+        P, S, L, G = len(CUBE_PROVINCES), len(SCORE_COLS), N_SCORE_LEVELS, len(CUBE_LANGS)
+        self.counts         = np.zeros((P, S, L), np.int64) if counts is None else counts.astype(np.int64)
+        self.lang_counts    = np.zeros((P, G, L), np.int64) if lang_counts is None else lang_counts.astype(np.int64)
+        self.subject_counts = (np.zeros((P, S + 1), np.int64) if subject_counts is None
+                               else subject_counts.astype(np.int64))
+        self.pairs          = np.zeros((4, S, S), np.int64) if pairs is None else pairs.astype(np.int64)
+
+    # ── Dựng ─────────────────────────────────────────────────────────────────
+    def add(self, df: pd.DataFrame) -> "ScoreCube":
+        """
+        Cộng dồn một DataFrame (float hoặc dạng nén) vào khối đếm bằng một
+        lần `np.bincount` trên chỉ số phẳng (tỉnh, môn, mức).
+        """
+        P, S, L, G = len(CUBE_PROVINCES), len(SCORE_COLS), N_SCORE_LEVELS, len(CUBE_LANGS)
+        prov  = _province_index(df)
+        scale = df.attrs.get("score_scale", {})
+
+        subjects = [s for s in SCORE_COLS if s in df.columns]
+        levels   = np.column_stack([score_levels(df[s], scale.get(s)) for s in subjects])
+        subj_idx = np.array([SCORE_COLS.index(s) for s in subjects], dtype=np.int64)
+
+        flat  = (prov[:, None] * S + subj_idx[None, :]) * L + levels
+        valid = levels >= 0
+        self.counts += np.bincount(flat[valid], minlength=P * S * L).reshape(P, S, L)
+
+        if "ngoai_ngu" in subjects:
+            lvl  = levels[:, subjects.index("ngoai_ngu")]
+            flat = (prov * G + _lang_index(df)) * L + lvl
+            self.lang_counts += np.bincount(flat[lvl >= 0], minlength=P * G * L).reshape(P, G, L)
+
+        n_subj = valid.sum(axis=1)
+        self.subject_counts += np.bincount(prov * (S + 1) + n_subj, minlength=P * (S + 1)).reshape(P, S + 1)
+
+        # Tổng tích chéo từng cặp môn: 4 phép nhân ma trận [môn × dòng] · [dòng × môn].
+        # float64 đúng tuyệt đối với số nguyên < 2⁵³ (mỗi lô ≤ batch_rows × 200²).
+        x    = np.zeros((len(df), S))
+        mask = np.zeros((len(df), S))
+        x[:, subj_idx]    = np.where(valid, levels, 0)
+        mask[:, subj_idx] = valid
+        self.pairs += np.rint(np.stack([
+            mask.T @ mask, x.T @ mask, (x * x).T @ mask, x.T @ x,
+        ])).astype(np.int64)
+        return self
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, batch_rows: int = _BATCH_ROWS) -> "ScoreCube":
+        """Dựng khối đếm từ DataFrame, xử lý theo lô để giới hạn bộ nhớ tạm."""
+        cube = cls()
+        for start in range(0, len(df), batch_rows):
+            cube.add(df.iloc[start:start + batch_rows])
+        return cube
+
+    @classmethod
+    def from_parquet(cls, parquet_file: str, batch_rows: int = _BATCH_ROWS) -> "ScoreCube":
+        """Dựng khối đếm bằng cách đọc file Parquet theo lô (chỉ các cột cần)."""
+        pf      = pq.ParquetFile(parquet_file)
+        names   = pf.schema_arrow.names
+        wanted  = ["sobaodanh", "ma_tinh", "ma_mon_ngoai_ngu"] + SCORE_COLS
+        columns = [c for c in wanted if c in names]
+        if "ma_tinh" in columns:
+            columns.remove("sobaodanh")
+
+        cube = cls()
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+            cube.add(batch.to_pandas())
+        return cube
+
+    # ── Lưu / nạp ────────────────────────────────────────────────────────────
+    def save(self, path: str) -> None:
+        """Lưu khối đếm ra file .npz (nén)."""
+        np.savez_compressed(
+            path,
+            counts=self.counts.astype(np.int32),
+            lang_counts=self.lang_counts.astype(np.int32),
+            subject_counts=self.subject_counts.astype(np.int32),
+            pairs=self.pairs,
+            provinces=np.array(CUBE_PROVINCES),
+            subjects=np.array(SCORE_COLS),
+            langs=np.array(CUBE_LANGS),
+            scale=SCORE_SCALE,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ScoreCube":
+        """Nạp khối đếm đã lưu; báo lỗi nếu trục không khớp cấu hình hiện tại."""
+        with np.load(path) as f:
+            if (list(f["provinces"]) != CUBE_PROVINCES or list(f["subjects"]) != SCORE_COLS
+                    or list(f["langs"]) != CUBE_LANGS or int(f["scale"]) != SCORE_SCALE):
+                raise ValueError(f"{path}: trục của khối đếm không khớp src.config — cần dựng lại.")
+            if "pairs" not in f.files:
+                raise ValueError(f"{path}: khối đếm phiên bản cũ (thiếu số môn / cặp môn) — cần dựng lại.")
+            return cls(f["counts"], f["lang_counts"], f["subject_counts"], f["pairs"])
+
+    # ── Truy vấn ─────────────────────────────────────────────────────────────
+    def score_counts(
+        self,
+        subject: str,
+        provinces: list = None,
+        province_col: str = "tinh",
+        lang: str = None,
+    ) -> np.ndarray:
+        """
+        Vector đếm theo mức điểm của một môn.
+
+        Args:
+            subject:      Cột điểm (vd: 'toan').
+            provinces:    Danh sách tỉnh (None = toàn quốc).
+            province_col: Cột tỉnh ứng với `provinces` ('tinh', 'tinh_moi', 'ma_tinh').
+            lang:         Mã ngôn ngữ N1–N7 (chỉ dùng với subject='ngoai_ngu').
+        """
+        mask = province_mask(provinces, province_col)
+        if lang is not None:
+            if subject != "ngoai_ngu":
+                raise ValueError("lang chỉ dùng với subject='ngoai_ngu'.")
+            return self.lang_counts[mask, CUBE_LANGS.index(lang)].sum(axis=0)
+        return self.counts[mask, SCORE_COLS.index(subject)].sum(axis=0)
+
+    def describe(self, subject: str, provinces: list = None, province_col: str = "tinh",
+                 lang: str = None) -> dict:
+        """Thống kê mô tả (xem `summarize_counts`) cho một môn / phạm vi."""
+        return summarize_counts(self.score_counts(subject, provinces, province_col, lang))
+
+    def group_counts(self, subject: str, group_col: str = "tinh", lang: str = None):
+        """
+        Vector đếm của từng nhóm tỉnh.
+
+        Args:
+            subject:   Cột điểm.
+            group_col: 'ma_tinh', 'tinh' hoặc 'tinh_moi'.
+            lang:      Mã ngôn ngữ (chỉ với 'ngoai_ngu').
+
+        Returns:
+            (labels, counts) — counts có shape [số nhóm, N_SCORE_LEVELS].
+        """
+        if lang is not None:
+            per_prov = self.lang_counts[:-1, CUBE_LANGS.index(lang)]
+        else:
+            per_prov = self.counts[:-1, SCORE_COLS.index(subject)]
+        return group_province_counts(per_prov, group_col)
+
+    def group_summary(self, subject: str, group_col: str = "tinh", lang: str = None) -> pd.DataFrame:
+        """Bảng thống kê mô tả theo nhóm tỉnh (bỏ nhóm không có thí sinh)."""
+        labels, counts = self.group_counts(subject, group_col, lang)
+        rows = [
+            {group_col: label, **summarize_counts(c)}
+            for label, c in zip(labels, counts) if c.sum() > 0
+        ]
+        return pd.DataFrame(rows)
+
+    def summary_table(self, provinces: list = None, province_col: str = "tinh") -> pd.DataFrame:
+        """Bảng thống kê mô tả của mọi môn (mỗi dòng một môn), như `describe().T`."""
+        rows = {s: summarize_counts(self.score_counts(s, provinces, province_col)) for s in SCORE_COLS}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def num_subjects_counts(self, provinces: list = None, province_col: str = "tinh") -> pd.Series:
+        """
+        Số thí sinh theo số môn có điểm (chỉ các giá trị có thí sinh), như
+        `df[SCORE_COLS].notna().sum(axis=1).value_counts().sort_index()`.
+        """
+        counts = self.subject_counts[province_mask(provinces, province_col)].sum(axis=0)
+        out    = pd.Series(counts, index=np.arange(len(counts)), name="count")
+        return out[out > 0]
+
+    def candidate_counts(self, group_col: str = "tinh") -> pd.Series:
+        """
+        Số thí sinh theo nhóm tỉnh (bỏ nhóm không có thí sinh), như
+        `df[group_col].value_counts()` nhưng theo thứ tự nhóm.
+        """
+        labels, counts = group_province_counts(self.subject_counts[:-1].sum(axis=1), group_col)
+        out = pd.Series(counts, index=pd.Index(labels, name=group_col), name="count")
+        return out[out > 0]
+
+    def lang_totals(self) -> pd.Series:
+        """Số thí sinh có điểm Ngoại ngữ theo mã ngôn ngữ N1–N7 (bỏ mã không có thí sinh)."""
+        counts = self.lang_counts[:, :-1].sum(axis=(0, 2))
+        out    = pd.Series(counts, index=pd.Index(CUBE_LANGS[:-1], name="ma_mon_ngoai_ngu"), name="count")
+        return out[out > 0]
+
+    def corr(self, subjects: list = None) -> pd.DataFrame:
+        """
+        Ma trận tương quan Pearson từng cặp môn (trên thí sinh có điểm cả hai
+        môn), như `df[subjects].corr()`; tính chính xác từ `pairs`.
+        """
+        subjects = subjects or SCORE_COLS
+        idx      = [SCORE_COLS.index(s) for s in subjects]
+        n, sx, sxx, sxy = (a[np.ix_(idx, idx)] for a in self.pairs)
+        sy, syy = sx.T, sxx.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Tử / mẫu số nguyên (chính xác), chỉ phép chia và căn là số thực
+            cov    = (n * sxy - sx * sy).astype("float64")
+            var_x  = (n * sxx - sx * sx).astype("float64")
+            var_y  = (n * syy - sy * sy).astype("float64")
+            values = np.where((n > 1) & (var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan)
+        np.fill_diagonal(values, np.where(np.diag(var_x) > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(values, -1, 1), index=subjects, columns=subjects)
+
+
+def write_score_cube(parquet_file: str, cube_file: str) -> ScoreCube:
+    """
+    Dựng khối đếm từ file Parquet và lưu ra `cube_file` (.npz).
+
+    Args:
+        parquet_file: File Parquet đầu ra của ETL.
+        cube_file:    Đường dẫn file khối đếm.
+    """
+    cube = ScoreCube.from_parquet(parquet_file)
+    cube.save(cube_file)
+    print(f"✅ Score cube: {cube_file}  ({int(cube.counts.sum()):,} điểm)")
+    return cube
@@ -0,0 +1,176 @@
+"""
+encoding.py — Lược đồ nén (fixed-point) cho dữ liệu điểm thi.
+
+Điểm số nằm trên lưới rời rạc SCORE_STEP = 0.05 nên được lưu dưới dạng mã
+uint8 (mã = điểm × scale, 255 = thiếu điểm) kèm hệ số scale trong
+`df.attrs["score_scale"]` và trong metadata Parquet. SBD lưu dạng uint32,
+các cột mã dạng categorical.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import SCORE_COLS, SCORE_SCALE
+
+# Mã dành cho giá trị thiếu (NaN)
+SCORE_NA = np.iinfo(np.uint8).max
+
+# Cột mã ít giá trị khác nhau → categorical
+CODE_COLS = ["ma_mon_ngoai_ngu", "origin_file", "origin_sheet"]
+
+# Khoá metadata Parquet chứa {cột: scale}
+_METADATA_KEY = b"score_scale"
+
+
+def is_compact(series: pd.Series) -> bool:
+    """True nếu Series là cột điểm đã mã hoá (kiểu số nguyên không dấu)."""
+    return pd.api.types.is_unsigned_integer_dtype(series.dtype)
+
+
+def encode_scores(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Mã hoá cột điểm float → uint8 (mã = điểm × SCORE_SCALE, NaN → SCORE_NA).
+
+    Args:
+        df:      DataFrame chứa cột điểm float.
+        columns: Cột cần mã hoá (mặc định: mọi cột SCORE_COLS có trong df).
+
+    Returns:
+        DataFrame mới với cột điểm đã mã hoá và `attrs["score_scale"]`.
+
+    Raises:
+        ValueError: nếu có điểm ngoài [0, 10] hoặc không nằm trên lưới SCORE_STEP.
+    """
+    columns = [c for c in (columns or SCORE_COLS) if c in df.columns]
+    scale   = dict(df.attrs.get("score_scale", {}))
+    encoded = {}
+
+    for col in columns:
+        if is_compact(df[col]):
+            continue
+        values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        isna   = np.isnan(values)
+        scaled = np.where(isna, 0.0, values) * SCORE_SCALE
+        codes  = np.rint(scaled)
+        if (np.abs(scaled - codes) > 1e-3).any() or (codes < 0).any() or (codes > 10 * SCORE_SCALE).any():
+            raise ValueError(f"Cột '{col}' có điểm không nằm trên lưới 1/{SCORE_SCALE} trong [0, 10].")
+        codes[isna]  = SCORE_NA
+        encoded[col] = codes.astype(np.uint8)
+        scale[col]   = SCORE_SCALE
+
+    out = df.assign(**encoded)
+    out.attrs["score_scale"] = scale
+    return out
+
+
+def decode_scores(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Giải mã cột điểm uint8 → float32 (SCORE_NA → NaN). Cột đã là float được
+    giữ nguyên, nên có thể gọi trên mọi DataFrame (nén hoặc không).
+
+    Args:
+        df:      DataFrame (nén hoặc không).
+        columns: Cột cần giải mã (mặc định: mọi cột SCORE_COLS có trong df).
+
+    Returns:
+        DataFrame với cột điểm float32; trả về chính `df` nếu không có gì để giải mã.
+    """
+    columns = [c for c in (columns or SCORE_COLS) if c in df.columns and is_compact(df[c])]
+    if not columns:
+        return df
+
+    scale   = df.attrs.get("score_scale", {})
+    decoded = {}
+    for col in columns:
+        codes  = df[col].to_numpy()
+        values = (codes / scale.get(col, SCORE_SCALE)).astype(np.float32)
+        values[codes == SCORE_NA] = np.nan
+        decoded[col] = values
+
+    out   = df.assign(**decoded)
+    rest  = {c: s for c, s in scale.items() if c not in decoded}
+    out.attrs["score_scale"] = rest
+    return out
+
+
+def score_levels(series: pd.Series, scale: int = None) -> np.ndarray:
+    """
+    Chỉ số mức điểm trên lưới SCORE_STEP (0 … N_SCORE_LEVELS-1), -1 = thiếu.
+    Nhận cả cột float lẫn cột đã mã hoá uint8.
+
+    Args:
+        series: Cột điểm.
+        scale:  Hệ số scale của cột nén (mặc định SCORE_SCALE).
+
+    Raises:
+        ValueError: nếu có điểm ngoài [0, 10] — mức điểm ngoài lưới sẽ tràn
+                    sang ô của môn kế tiếp trong các khối đếm phẳng
+                    (môn × N_SCORE_LEVELS + mức).
+    """
+    if is_compact(series):
+        codes  = series.to_numpy().astype(np.int16)
+        factor = SCORE_SCALE // (scale or SCORE_SCALE)
+        isna   = codes == SCORE_NA
+        levels = codes * factor
+    else:
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        isna   = np.isnan(values)
+        levels = np.rint(np.where(isna, 0.0, values) * SCORE_SCALE)
+
+    if ((levels < 0) | (levels > 10 * SCORE_SCALE))[~isna].any():
+        raise ValueError(f"Cột '{series.name}' có điểm ngoài [0, 10].")
+    return np.where(isna, -1, levels).astype(np.int16)
+
+
+def encode_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Chuyển DataFrame ETL sang lược đồ nén đầy đủ: điểm uint8, SBD uint32,
+    cột mã categorical.
+    """
+    out = encode_scores(df)
+    if "sobaodanh" in out.columns and not is_compact(out["sobaodanh"]):
+        out["sobaodanh"] = out["sobaodanh"].astype("int64").astype(np.uint32)
+    for col in CODE_COLS:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    return out
+
+
+def decode_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Nghịch đảo của `encode_frame`: trả về đúng kiểu dữ liệu của file ETL."""
+    out = decode_scores(df)
+    if "sobaodanh" in out.columns and is_compact(out["sobaodanh"]):
+        out["sobaodanh"] = out["sobaodanh"].astype(str).str.zfill(8).astype("string")
+    for col in CODE_COLS:
+        if col in out.columns and isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("string")
+    return out
+
+
+def write_compact_parquet(df: pd.DataFrame, path: str) -> None:
+    """Ghi DataFrame dạng nén ra Parquet, lưu hệ số scale vào metadata."""
+    df    = encode_frame(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta  = dict(table.schema.metadata or {})
+    meta[_METADATA_KEY] = json.dumps(df.attrs["score_scale"]).encode()
+    pq.write_table(table.replace_schema_metadata(meta), path)
+
+
+def read_compact_parquet(path: str, columns: list = None, decode: bool = False) -> pd.DataFrame:
+    """
+    Đọc file do `write_compact_parquet` ghi ra.
+
+    Args:
+        path:    Đường dẫn file Parquet nén.
+        columns: Danh sách cột cần đọc (None = tất cả).
+        decode:  True → giải mã về kiểu dữ liệu ETL thông thường.
+    """
+    table = pq.read_table(path, columns=columns)
+    meta  = pq.read_schema(path).metadata or {}
+    df    = table.to_pandas()
+    scale = json.loads(meta.get(_METADATA_KEY, b"{}"))
+    df.attrs["score_scale"] = {c: s for c, s in scale.items() if c in df.columns}
+    return decode_frame(df) if decode else df
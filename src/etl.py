@@ -2,85 +2,577 @@
 etl.py — ETL pipeline: Excel → Parquet, thêm cột tỉnh/tỉnh_mới.
 """
 
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
 from pathlib import Path
 from unidecode import unidecode
 
-from src.config import PROVINCE_NEW_PROVINCE, CODE_PROVINCE, SCORE_COLS
+from src.config import (
+    PROVINCE_NEW_PROVINCE,
+    SCORE_COLS,
+    PROVINCE_CODES,
+    PROVINCE_NAMES,
+    NEW_PROVINCE_NAMES,
+)
 
+# Cột giữ lại trong file Parquet (theo đúng thứ tự)
+KEEP_COLS = [
+    "sobaodanh", "toan", "van", "li", "hoa", "sinh", "tin_hoc",
+    "cong_nghe_cong_nghiep", "cong_nghe_nong_nghiep", "su", "dia",
+    "giao_duc_kinh_te_va_phap_luat", "ngoai_ngu", "giao_duc_cong_dan",
+    "ma_mon_ngoai_ngu", "origin_file", "origin_sheet",
+]
 
-def export_to_parquet(
-    folder_name: str,
-    output_filename: str = "combined_data.parquet",
-) -> None:
-    """
-    Đọc tất cả file .xlsx trong thư mục, chuẩn hoá, gộp thành một DataFrame
-    và xuất ra file Parquet.
+STRING_COLS = ["sobaodanh", "ma_mon_ngoai_ngu", "origin_file", "origin_sheet"]
 
-    Args:
-        folder_name:     Đường dẫn thư mục chứa file .xlsx.
-        output_filename: Tên file Parquet đầu ra.
-    """
-    data_dir = Path(folder_name)
-    all_dfs = []
+# Cột tỉnh suy ra từ 2 chữ số đầu SBD (categorical / dictionary-encoded)
+PROVINCE_COLS = ["ma_tinh", "tinh", "tinh_moi"]
 
-    # 1. Đọc tất cả sheet từ tất cả file Excel
-    for file_path in data_dir.glob("*.xlsx"):
-        print(f"Reading: {file_path.name}")
-        excel_data = pd.read_excel(file_path, sheet_name=None)
+# Bảng tra mã tỉnh số (0–99) → chỉ số danh mục; -1 = không có trong bảng mã
+_PROVINCE_INDEX = np.full(100, -1, dtype=np.int8)
+_PROVINCE_INDEX[[int(c) for c in PROVINCE_CODES]] = np.arange(len(PROVINCE_CODES))
 
-        for sheet_name, df in excel_data.items():
-            df["origin_file"]  = file_path.name
-            df["origin_sheet"] = str(sheet_name)
-            df.columns         = df.columns.astype(str)
-            all_dfs.append(df)
+_NEW_PROVINCE_INDEX = np.full(100, -1, dtype=np.int8)
+_NEW_PROVINCE_INDEX[[int(c) for c in PROVINCE_CODES]] = [
+    NEW_PROVINCE_NAMES.index(PROVINCE_NEW_PROVINCE[name]) for name in PROVINCE_NAMES
+]
 
-    if not all_dfs:
-        print("No data found to export.")
-        return
+# Kiểu Arrow cố định cho cột tỉnh — giữ nguyên qua vòng ghi/đọc Parquet
+_PROVINCE_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+# Tăng khi đổi quy tắc chuẩn hoá hoặc cách đặt tên fragment → mọi fragment cũ trong manifest bị bỏ
+MANIFEST_VERSION = 3
+
+# Số run tối đa trộn cùng lúc trong chế độ streaming (bộ đệm trộn ≈ chunk_rows dòng)
+_MERGE_FAN_IN = 16
+
+
+def _province_columns(sbd: np.ndarray) -> dict:
+    """
+    Suy ra 'ma_tinh', 'tinh', 'tinh_moi' từ SBD dạng số bằng một lần tra
+    mảng — trả về các cột pandas Categorical (ghi ra Parquet dạng dictionary).
+    """
+    code    = sbd // 1_000_000
+    valid   = (code >= 0) & (code < 100)
+    code    = np.where(valid, code, 0)
+    idx     = np.where(valid, _PROVINCE_INDEX[code], -1)
+    new_idx = np.where(valid, _NEW_PROVINCE_INDEX[code], -1)
+    return {
+        "ma_tinh":  pd.Categorical.from_codes(idx, categories=PROVINCE_CODES),
+        "tinh":     pd.Categorical.from_codes(idx, categories=PROVINCE_NAMES),
+        "tinh_moi": pd.Categorical.from_codes(new_idx, categories=NEW_PROVINCE_NAMES),
+    }
 
-    # 2. Gộp tất cả DataFrame
-    final_df = pd.concat(all_dfs, ignore_index=True)
 
+def _normalize_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Chuẩn hoá một sheet: tên cột không dấu, SBD 8 chữ số, chọn cột, ép kiểu
+    (string cho cột mã, float32 cho cột điểm) và thêm cột tỉnh.
+    """
     # Chuẩn hoá tên cột: bỏ dấu, viết thường, thay space → _
-    final_df.columns = [
-        unidecode(col).lower().replace(" ", "_") for col in final_df.columns
-    ]
+    df.columns = [unidecode(str(col)).lower().replace(" ", "_") for col in df.columns]
+    if "sobaodanh" not in df.columns:
+        df = df.iloc[0:0].assign(sobaodanh=pd.Series(dtype="int64"))
 
     # Lọc dòng có SBD, chuẩn hoá 8 chữ số
-    final_df = final_df[final_df["sobaodanh"].notna()]
-    final_df["sobaodanh"] = (
-        final_df["sobaodanh"].astype(int).astype(str).str.zfill(8)
-    )
-
-    # Chọn và sắp xếp cột
-    keep_cols = [
-        "sobaodanh", "toan", "van", "li", "hoa", "sinh", "tin_hoc",
-        "cong_nghe_cong_nghiep", "cong_nghe_nong_nghiep", "su", "dia",
-        "giao_duc_kinh_te_va_phap_luat", "ngoai_ngu", "giao_duc_cong_dan",
-        "ma_mon_ngoai_ngu", "origin_file", "origin_sheet",
-    ]
-    final_df = final_df[keep_cols]
+    df  = df[df["sobaodanh"].notna()].reindex(columns=KEEP_COLS)
+    sbd = df["sobaodanh"].astype("int64").to_numpy()
+    df["sobaodanh"] = df["sobaodanh"].astype(int).astype(str).str.zfill(8)
 
     # Kiểu string
-    string_cols = ["sobaodanh", "ma_mon_ngoai_ngu", "origin_file", "origin_sheet"]
-    for col in string_cols:
-        if col in final_df.columns:
-            final_df[col] = final_df[col].astype("string")
+    for col in STRING_COLS:
+        df[col] = df[col].astype("string")
 
     # Kiểu float32 cho điểm số
     for col in SCORE_COLS:
-        if col in final_df.columns:
-            final_df[col] = pd.to_numeric(final_df[col], errors="coerce").astype("float32")
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+
+    # Cột tỉnh: ma_tinh → tinh → tinh_moi
+    return df.assign(**_province_columns(sbd))
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Chuyển sheet đã chuẩn hoá sang pyarrow.Table với schema cố định."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in PROVINCE_COLS:
+        i     = table.schema.get_field_index(col)
+        table = table.set_column(i, col, table.column(col).cast(_PROVINCE_TYPE))
+    return table
+
+
+def _read_workbook(file_path: str) -> list:
+    """
+    Đọc toàn bộ sheet của một file Excel và chuẩn hoá từng sheet.
+
+    Chạy được trong process con: chỉ nhận đường dẫn và trả về danh sách
+    pyarrow.Table (một bảng/sheet, cùng schema) theo thứ tự sheet trong file.
+    """
+    file_path   = Path(file_path)
+    excel_data  = pd.read_excel(file_path, sheet_name=None)
+    tables      = []
+
+    for sheet_name, df in excel_data.items():
+        df["origin_file"]  = file_path.name
+        df["origin_sheet"] = str(sheet_name)
+        df = _normalize_sheet(df)
+        tables.append(_to_arrow(df))
+
+    return tables
+
+
+def _ingest_workbooks(file_paths: list, n_workers: int = 1):
+    """
+    Đọc các workbook (tuần tự hoặc bằng process pool), yield
+    (file_path, tables) theo đúng thứ tự `file_paths`.
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(file_paths)))
+
+    if n_workers == 1:
+        for file_path in file_paths:
+            print(f"Reading: {file_path.name}")
+            yield file_path, _read_workbook(str(file_path))
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        results = pool.map(_read_workbook, [str(p) for p in file_paths])
+        for file_path, tables in zip(file_paths, results):
+            print(f"Reading: {file_path.name}")
+            yield file_path, tables
+
+
+def _iter_sheet_chunks(file_path: Path, chunk_rows: int):
+    """
+    Đọc từng sheet theo khối `chunk_rows` dòng bằng iterator read-only của
+    openpyxl (không nạp cả workbook vào RAM), yield DataFrame đã chuẩn hoá.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows   = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(col) for col in header]
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == chunk_rows:
+                    yield _chunk_frame(batch, header, file_path.name, ws.title)
+                    batch = []
+            if batch:
+                yield _chunk_frame(batch, header, file_path.name, ws.title)
+    finally:
+        wb.close()
+
+
+def _chunk_frame(batch: list, header: list, file_name: str, sheet_name: str) -> pd.DataFrame:
+    """Dựng DataFrame từ một khối dòng thô và chuẩn hoá như `_normalize_sheet`."""
+    df = pd.DataFrame.from_records(batch, columns=header)
+    df["origin_file"]  = file_name
+    df["origin_sheet"] = str(sheet_name)
+    return _normalize_sheet(df)
+
+
+def _write_sorted_runs(file_paths: list, spill_path: str, chunk_rows: int, merge_rows: int):
+    """
+    Pha 1 của external sort: mỗi khối được sắp xếp theo SBD rồi ghi thành một
+    "run" (chuỗi row group liên tiếp, mỗi row group ≤ `merge_rows` dòng) vào
+    file tạm.
+
+    Returns:
+        (runs, schema, n_rows) — runs là list các list chỉ số row group.
+    """
+    runs, writer, schema, n_rows, n_groups = [], None, None, 0, 0
+    try:
+        for file_path in file_paths:
+            print(f"Reading: {file_path.name}")
+            for df in _iter_sheet_chunks(file_path, chunk_rows):
+                if df.empty:
+                    continue
+                table = _to_arrow(df).sort_by("sobaodanh")
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(spill_path, schema)
+                writer.write_table(table, row_group_size=merge_rows)
+
+                groups    = -(-table.num_rows // merge_rows)
+                runs.append(list(range(n_groups, n_groups + groups)))
+                n_groups += groups
+                n_rows   += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return runs, schema, n_rows
+
+
+def _merge_into(spill: pq.ParquetFile, runs: list, writer: pq.ParquetWriter, row_group_rows: int) -> int:
+    """
+    Trộn k run đã sắp xếp theo từng lô rồi ghi vào `writer`.
+
+    Mỗi vòng lấy khoá nhỏ nhất trong các khoá cuối của lô hiện tại ở mỗi run
+    làm ngưỡng; mọi dòng ≤ ngưỡng đều an toàn để xuất. Chỉ giữ tối đa một
+    row group mỗi run trong RAM.
+
+    Returns:
+        Số row group đã ghi (phần dư cuối cùng thành một row group riêng).
+    """
+    cursors = [iter(groups) for groups in runs]
+
+    def _next_group(i):
+        rg = next(cursors[i], None)
+        return None if rg is None else spill.read_row_group(rg)
+
+    heads     = [_next_group(i) for i in range(len(runs))]
+    pending   = []
+    n_pending = 0
+    n_groups  = 0
+    while True:
+        active = [i for i, head in enumerate(heads) if head is not None]
+        if not active:
+            break
+        keys  = {i: heads[i].column("sobaodanh").to_numpy(zero_copy_only=False) for i in active}
+        bound = min(keys[i][-1] for i in active)
+
+        parts = []
+        for i in active:
+            cut = int(np.searchsorted(keys[i], bound, side="right"))
+            parts.append(heads[i].slice(0, cut))
+            rest     = heads[i].slice(cut)
+            heads[i] = rest if rest.num_rows else _next_group(i)
+
+        merged = pa.concat_tables(parts).sort_by("sobaodanh")
+        pending.append(merged)
+        n_pending += merged.num_rows
+        if n_pending >= row_group_rows:
+            # Chỉ ghi các row group đầy, phần dư chờ vòng sau
+            buf  = pa.concat_tables(pending)
+            full = buf.num_rows - buf.num_rows % row_group_rows
+            writer.write_table(buf.slice(0, full), row_group_size=row_group_rows)
+            pending, n_pending = [buf.slice(full)], buf.num_rows - full
+            n_groups += full // row_group_rows
+
+    if n_pending:
+        writer.write_table(pa.concat_tables(pending), row_group_size=row_group_rows)
+        n_groups += 1
+    return n_groups
+
+
+def _merge_pass(spill_path: str, runs: list, next_path: str, schema, merge_rows: int) -> list:
+    """
+    Một lượt trộn trung gian: gộp từng nhóm `_MERGE_FAN_IN` run liên tiếp
+    thành một run mới (row group `merge_rows` dòng) trong file tạm `next_path`.
+
+    Returns:
+        Danh sách run mới (list các list chỉ số row group).
+    """
+    spill    = pq.ParquetFile(spill_path)
+    merged   = []
+    n_groups = 0
+    with pq.ParquetWriter(next_path, schema) as writer:
+        for start in range(0, len(runs), _MERGE_FAN_IN):
+            groups    = _merge_into(spill, runs[start:start + _MERGE_FAN_IN], writer, merge_rows)
+            merged.append(list(range(n_groups, n_groups + groups)))
+            n_groups += groups
+    return merged
+
+
+def _merge_sorted_runs(spill_path: str, runs: list, output_filename: str, schema, row_group_rows: int) -> None:
+    """
+    Pha 2 của external sort: trộn các run (≤ `_MERGE_FAN_IN`) thẳng vào file
+    Parquet đầu ra.
+    """
+    spill = pq.ParquetFile(spill_path)
+    with pq.ParquetWriter(output_filename, schema) as writer:
+        _merge_into(spill, runs, writer, row_group_rows)
+
+
+def _export_streaming(file_paths: list, output_filename: str, chunk_rows: int) -> bool:
+    """
+    ETL bộ nhớ giới hạn: đọc Excel theo khối, ghi các run đã sắp xếp ra file
+    tạm rồi trộn (external merge sort) thẳng vào file Parquet đầu ra.
+
+    Mỗi lượt trộn chỉ mở tối đa `_MERGE_FAN_IN` run, mỗi run giữ một row
+    group `chunk_rows // _MERGE_FAN_IN` dòng, nên bộ đệm trộn ≈ `chunk_rows`
+    dòng bất kể số file; nhiều run hơn thì thêm lượt trộn trung gian.
 
-    final_df = final_df.sort_values("sobaodanh").reset_index(drop=True)
+    Returns:
+        True nếu file đầu ra đã được ghi.
+    """
+    merge_rows = max(1, chunk_rows // _MERGE_FAN_IN)
+    spill_dir  = Path(output_filename).resolve().parent
+    with tempfile.TemporaryDirectory(dir=spill_dir, prefix=".etl_spill_") as tmp:
+        spill_path = os.path.join(tmp, "runs_0.parquet")
+        runs, schema, n_rows = _write_sorted_runs(file_paths, spill_path, chunk_rows, merge_rows)
+
+        if not runs:
+            print("No data found to export.")
+            return False
+
+        n_pass = 0
+        while len(runs) > _MERGE_FAN_IN:
+            n_pass   += 1
+            next_path = os.path.join(tmp, f"runs_{n_pass}.parquet")
+            runs      = _merge_pass(spill_path, runs, next_path, schema, merge_rows)
+            os.remove(spill_path)
+            spill_path = next_path
+
+        _merge_sorted_runs(spill_path, runs, output_filename, schema, chunk_rows)
+
+    print("-" * 40)
+    print(f"✅ Exported to: {output_filename}")
+    print(f"   Rows:    {n_rows:,}")
+    print(f"   Columns: {len(schema)}")
+    return True
+
+
+def _file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 của nội dung file, đọc theo từng khối."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(manifest_path: Path) -> dict:
+    """Đọc manifest; trả về manifest rỗng nếu chưa có hoặc khác phiên bản."""
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "files": {}, "output": None}
+
+
+def _store_manifest(manifest_path: Path, entries: dict, output: Path) -> None:
+    manifest = {"version": MANIFEST_VERSION, "files": entries,
+                "output": _file_stat(output) if output.exists() else None}
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def _fragment_name(file_path: Path, sha256: str) -> str:
+    """
+    Tên fragment = tên workbook + hash nội dung: fragment mang cột
+    origin_file nên hai workbook trùng nội dung nhưng khác tên không được
+    dùng chung một fragment.
+    """
+    return f"{file_path.stem}_{sha256[:16]}.parquet"
+
+
+def _file_stat(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _export_incremental(file_paths: list, output_filename: str, n_workers: int) -> bool:
+    """
+    ETL tăng dần: mỗi workbook có một fragment Parquet riêng (đặt tên theo
+    tên file + hash nội dung) được ghi trong manifest. Chỉ đọc lại workbook mới/đã đổi,
+    bỏ fragment của workbook đã xoá, rồi gộp lại file đầu ra từ các fragment.
+
+    Returns:
+        True nếu file đầu ra đã được ghi lại.
+    """
+    output        = Path(output_filename)
+    frag_dir      = output.with_name(f"{output.stem}_fragments")
+    manifest_path = output.with_name(f"{output.name}.manifest.json")
+    frag_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = _load_manifest(manifest_path)
+    old      = manifest["files"]
+    entries  = {}
+    changed  = []
+
+    # 1. So khớp (size, mtime) → nếu khác mới tính hash nội dung
+    for file_path in file_paths:
+        entry = _file_stat(file_path)
+        prev  = old.get(file_path.name)
+        if prev and (prev["fragment"] is None or (frag_dir / prev["fragment"]).exists()):
+            if prev["size"] == entry["size"] and prev["mtime_ns"] == entry["mtime_ns"]:
+                entries[file_path.name] = prev
+                continue
+            entry["sha256"] = _file_sha256(file_path)
+            if entry["sha256"] == prev["sha256"]:
+                entries[file_path.name] = {**entry, "fragment": prev["fragment"]}
+                continue
+        else:
+            entry["sha256"] = _file_sha256(file_path)
+
+        entry["fragment"] = _fragment_name(file_path, entry["sha256"])
+        entries[file_path.name] = entry
+        changed.append(file_path)
+
+    removed = sorted(set(old) - set(entries))
+
+    # 2. Đọc lại workbook mới/đã đổi → ghi fragment
+    for file_path, tables in _ingest_workbooks(changed, n_workers):
+        if not tables:
+            # Workbook không có sheet → không có fragment; ghi None để lần sau coi là không đổi
+            entries[file_path.name]["fragment"] = None
+            continue
+        pq.write_table(pa.concat_tables(tables), frag_dir / entries[file_path.name]["fragment"])
+
+    # 3. Dọn fragment không còn được tham chiếu
+    live = {entry["fragment"] for entry in entries.values() if entry["fragment"]}
+    for frag in frag_dir.glob("*.parquet"):
+        if frag.name not in live:
+            frag.unlink()
+
+    print(f"Manifest: {len(entries) - len(changed)} giữ nguyên, "
+          f"{len(changed)} đọc lại, {len(removed)} đã xoá")
+
+    if (not changed and not removed and output.exists()
+            and manifest["output"] == _file_stat(output)):
+        if entries != old:
+            # size/mtime mới (file bị touch, nội dung không đổi) → lưu để lần sau khỏi hash lại
+            _store_manifest(manifest_path, entries, output)
+        print(f"✅ Không có thay đổi — giữ nguyên {output_filename}")
+        return False
+
+    # 4. Gộp fragment theo thứ tự tên file (giống hệt chạy đầy đủ)
+    fragments = [
+        frag_dir / entries[fp.name]["fragment"] for fp in file_paths
+        if entries[fp.name]["fragment"] and (frag_dir / entries[fp.name]["fragment"]).exists()
+    ]
+    if not fragments:
+        print("No data found to export.")
+        return False
+
+    table = pa.concat_tables([pq.read_table(f) for f in fragments])
+    table = table.sort_by("sobaodanh")
+    pq.write_table(table, output_filename)
+
+    _store_manifest(manifest_path, entries, output)
+
+    print("-" * 40)
+    print(f"✅ Exported to: {output_filename}")
+    print(f"   Rows:    {table.num_rows:,}")
+    print(f"   Columns: {table.num_columns}")
+    return True
+
+
+def _export_full(file_paths: list, output_filename: str, n_workers: int) -> bool:
+    """
+    ETL trong RAM: đọc mọi workbook, gộp, sắp xếp rồi ghi một lần.
+
+    Returns:
+        True nếu file đầu ra đã được ghi.
+    """
+    # 1. Đọc tất cả sheet từ tất cả file Excel
+    all_tables = []
+    for _, tables in _ingest_workbooks(file_paths, n_workers):
+        all_tables.extend(tables)
+
+    if not all_tables:
+        print("No data found to export.")
+        return False
+
+    # 2. Gộp tất cả bảng (thứ tự cố định) và sắp xếp ổn định theo SBD
+    table = pa.concat_tables(all_tables)
+    table = table.sort_by("sobaodanh")
 
     # 3. Xuất Parquet
-    final_df.to_parquet(output_filename, engine="pyarrow", index=False)
+    pq.write_table(table, output_filename)
     print("-" * 40)
     print(f"✅ Exported to: {output_filename}")
-    print(f"   Rows:    {len(final_df):,}")
-    print(f"   Columns: {len(final_df.columns)}")
+    print(f"   Rows:    {table.num_rows:,}")
+    print(f"   Columns: {table.num_columns}")
+    return True
+
+
+def write_partitioned_dataset(
+    parquet_file: str = "combined_data.parquet",
+    partition_dir: str = "combined_data",
+) -> None:
+    """
+    Ghi lại file Parquet thành dataset phân vùng kiểu Hive theo tỉnh
+    (`partition_dir/ma_tinh=XX/*.parquet`) để đọc có chọn lọc bằng
+    `src.loader.load_dataset`. Dữ liệu được truyền theo lô, không nạp cả file.
+
+    Args:
+        parquet_file:  File Parquet nguồn (đầu ra của `export_to_parquet`).
+        partition_dir: Thư mục dataset đầu ra (bị ghi đè toàn bộ).
+    """
+    if os.path.isdir(partition_dir):
+        shutil.rmtree(partition_dir)
+
+    ds.write_dataset(
+        ds.dataset(parquet_file, format="parquet"),
+        partition_dir,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("ma_tinh", _PROVINCE_TYPE)]), flavor="hive"),
+        basename_template="part-{i}.parquet",
+    )
+    n_parts = len(list(Path(partition_dir).glob("ma_tinh=*")))
+    print(f"✅ Partitioned dataset: {partition_dir}  ({n_parts} tỉnh)")
+
+
+def export_to_parquet(
+    folder_name: str,
+    output_filename: str = "combined_data.parquet",
+    n_workers: int = 1,
+    streaming: bool = False,
+    chunk_rows: int = 100_000,
+    incremental: bool = False,
+    partition_dir: str = None,
+    cube_file: str = None,
+) -> None:
+    """
+    Đọc tất cả file .xlsx trong thư mục, chuẩn hoá, gộp thành một DataFrame
+    và xuất ra file Parquet.
+
+    Các file được xử lý theo thứ tự tên và gộp theo đúng thứ tự đó, nên kết
+    quả chạy song song giống hệt (từng byte) kết quả chạy tuần tự.
+
+    Args:
+        folder_name:     Đường dẫn thư mục chứa file .xlsx.
+        output_filename: Tên file Parquet đầu ra.
+        n_workers:       Số process đọc Excel song song
+                         (1 = tuần tự, None = số CPU).
+        streaming:       True → đọc theo khối và ghi row group dần dần
+                         (external merge sort theo SBD); RAM đỉnh không tăng
+                         theo số file đầu vào. Chế độ này chạy tuần tự.
+        chunk_rows:      Số dòng mỗi khối / row group khi streaming=True.
+        incremental:     True → giữ manifest (path, size, mtime, hash →
+                         fragment Parquet) cạnh file đầu ra, chỉ đọc lại
+                         workbook mới/đã đổi. Không dùng cùng streaming.
+        partition_dir:   Nếu có, ghi thêm dataset phân vùng `ma_tinh=XX/`
+                         vào thư mục này (xem `write_partitioned_dataset`).
+        cube_file:       Nếu có, dựng khối đếm điểm (tỉnh × môn × mức điểm)
+                         và lưu ra file .npz này (xem `src.cube`).
+    """
+    if streaming and incremental:
+        raise ValueError("streaming=True và incremental=True không dùng cùng nhau.")
+
+    data_dir   = Path(folder_name)
+    file_paths = sorted(data_dir.glob("*.xlsx"))
+    if streaming:
+        written = _export_streaming(file_paths, output_filename, chunk_rows)
+    elif incremental:
+        written = _export_incremental(file_paths, output_filename, n_workers)
+    else:
+        written = _export_full(file_paths, output_filename, n_workers)
+
+    if partition_dir and os.path.exists(output_filename):
+        if written or not os.path.isdir(partition_dir):
+            write_partitioned_dataset(output_filename, partition_dir)
+
+    if cube_file and os.path.exists(output_filename):
+        if written or not os.path.exists(cube_file):
+            from src.cube import write_score_cube
+            write_score_cube(output_filename, cube_file)
 
 
 def add_province_columns(
@@ -90,16 +582,19 @@ def add_province_columns(
     Thêm cột 'ma_tinh', 'tinh' (tỉnh gốc) và 'tinh_moi' (sau sáp nhập)
     vào file Parquet đã có.
 
+    `export_to_parquet` đã tự thêm các cột này; hàm chỉ còn dùng để nâng cấp
+    file Parquet do phiên bản ETL cũ tạo ra (file đã có cột sẽ không bị ghi lại).
+
     Args:
         parquet_file: Đường dẫn file Parquet cần cập nhật.
     """
-    df = pd.read_parquet(parquet_file)
-
-    if "ma_tinh" not in df.columns:
-        df["ma_tinh"] = df["sobaodanh"].str[:2]
+    if set(PROVINCE_COLS) <= set(pq.read_schema(parquet_file).names):
+        print(f'✅ {parquet_file} đã có cột "ma_tinh", "tinh", "tinh_moi" — bỏ qua.')
+        return
 
-    df["tinh"]     = df["ma_tinh"].map(CODE_PROVINCE).astype("string")
-    df["tinh_moi"] = df["tinh"].map(PROVINCE_NEW_PROVINCE).astype("string")
+    df  = pd.read_parquet(parquet_file)
+    sbd = df["sobaodanh"].astype("int64").to_numpy()
+    df  = df.drop(columns=PROVINCE_COLS, errors="ignore").assign(**_province_columns(sbd))
 
     df.to_parquet(parquet_file, engine="pyarrow", index=False)
     print(f'✅ Đã thêm cột "ma_tinh", "tinh", "tinh_moi" → {parquet_file}')
@@ -0,0 +1,189 @@
+"""
+loader.py — Đọc dữ liệu điểm thi: chọn lọc (cột + tỉnh) bằng pyarrow.dataset,
+hoặc qua cache Arrow IPC ánh xạ bộ nhớ (memory-mapped) cho notebook.
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from src.config import (
+    PROVINCE_CODE,
+    PROVINCE_NEW_PROVINCE,
+    PROVINCE_CODES,
+    PROVINCE_NAMES,
+    NEW_PROVINCE_NAMES,
+)
+from src.etl import KEEP_COLS, PROVINCE_COLS
+
+# Danh mục cố định cho cột tỉnh (giống hệt file Parquet do ETL ghi ra)
+_CATEGORIES = {
+    "ma_tinh":  PROVINCE_CODES,
+    "tinh":     PROVINCE_NAMES,
+    "tinh_moi": NEW_PROVINCE_NAMES,
+}
+
+
+def province_codes(provinces, province_col: str = "tinh") -> list:
+    """
+    Đổi danh sách tỉnh sang danh sách mã tỉnh 2 chữ số.
+
+    Args:
+        provinces:    Tên tỉnh cũ ('tinh'), tỉnh mới ('tinh_moi') hoặc mã ('ma_tinh').
+        province_col: Cột mà `provinces` thuộc về.
+
+    Returns:
+        list mã tỉnh (vd: ['04', '34']) theo thứ tự mã.
+    """
+    provinces = set(provinces)
+    if province_col == "ma_tinh":
+        unknown = provinces - set(PROVINCE_CODES)
+        codes   = provinces & set(PROVINCE_CODES)
+    elif province_col == "tinh":
+        unknown = provinces - set(PROVINCE_CODE)
+        codes   = {PROVINCE_CODE[p] for p in provinces - unknown}
+    elif province_col == "tinh_moi":
+        unknown = provinces - set(NEW_PROVINCE_NAMES)
+        codes   = {PROVINCE_CODE[old] for old, new in PROVINCE_NEW_PROVINCE.items() if new in provinces}
+    else:
+        raise ValueError(f"province_col phải là một trong {PROVINCE_COLS}, nhận '{province_col}'.")
+
+    if unknown:
+        raise ValueError(f"Không tìm thấy trong '{province_col}': {sorted(unknown)}")
+    return sorted(codes)
+
+
+def _open_dataset(source: str) -> ds.Dataset:
+    """Mở file Parquet đơn hoặc thư mục phân vùng `ma_tinh=XX/`."""
+    if os.path.isdir(source):
+        partitioning = ds.partitioning(pa.schema([("ma_tinh", pa.string())]), flavor="hive")
+        return ds.dataset(source, format="parquet", partitioning=partitioning)
+    return ds.dataset(source, format="parquet")
+
+
+def load_dataset(
+    source: str = "combined_data.parquet",
+    columns: list = None,
+    provinces: list = None,
+    province_col: str = "tinh",
+) -> pd.DataFrame:
+    """
+    Đọc dữ liệu điểm thi, chỉ lấy các cột và tỉnh cần thiết.
+
+    Với thư mục phân vùng (`export_to_parquet(..., partition_dir=...)`), bộ lọc
+    tỉnh được đẩy xuống mức phân vùng nên chỉ các thư mục `ma_tinh=XX/` liên
+    quan được mở; với file Parquet đơn, bộ lọc được áp dụng khi quét.
+
+    Args:
+        source:       File Parquet hoặc thư mục dataset phân vùng.
+        columns:      Danh sách cột cần đọc (None = tất cả).
+        provinces:    Danh sách tỉnh cần giữ (None = tất cả).
+        province_col: Cột tỉnh ứng với `provinces` ('tinh', 'tinh_moi', 'ma_tinh').
+
+    Returns:
+        DataFrame cùng kiểu dữ liệu với `pd.read_parquet` trên file ETL.
+    """
+    dataset = _open_dataset(source)
+    names   = dataset.schema.names
+
+    if columns is None:
+        order   = KEEP_COLS + PROVINCE_COLS
+        columns = [c for c in order if c in names] + [c for c in names if c not in order]
+    missing = [c for c in columns if c not in names]
+    if missing:
+        raise KeyError(f"Không có cột {missing} trong {source}")
+
+    filter_ = None
+    if provinces is not None:
+        filter_ = ds.field("ma_tinh").isin(province_codes(provinces, province_col))
+
+    df = dataset.to_table(columns=columns, filter=filter_).to_pandas()
+
+    # Cột tỉnh: luôn trả về categorical với danh mục đầy đủ, cố định
+    for col in PROVINCE_COLS:
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col].astype("string"), categories=_CATEGORIES[col])
+    return df
+
+
+# Khoá metadata trong file cache: (size, mtime) của file Parquet nguồn
+_SOURCE_KEY = b"source_stat"
+
+
+def _source_stat(path: Path) -> bytes:
+    st = path.stat()
+    return json.dumps({"size": st.st_size, "mtime_ns": st.st_mtime_ns}).encode()
+
+
+def cache_path(parquet_file: str, columns: list = None) -> Path:
+    """
+    Đường dẫn file cache Arrow IPC cho một tập cột của `parquet_file`
+    (vd: `combined_data.cache/3f2a9c….arrow`).
+    """
+    parquet_file = Path(parquet_file)
+    key = hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:12]
+    return parquet_file.with_suffix(".cache") / f"{key}.arrow"
+
+
+def _build_cache(parquet_file: Path, columns: list, path: Path) -> None:
+    """
+    Ghi cache Arrow IPC không nén. Cột float được lưu với NaN (không có
+    validity bitmap) để pandas dùng thẳng vùng nhớ đã ánh xạ, không sao chép.
+    """
+    table = pq.read_table(parquet_file, columns=columns)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            table = table.set_column(i, field, pc.fill_null(table.column(i), np.nan))
+
+    meta  = dict(table.schema.metadata or {})
+    meta[_SOURCE_KEY] = _source_stat(parquet_file)
+    table = table.replace_schema_metadata(meta)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp     = path.with_suffix(".tmp")
+    options = pa.ipc.IpcWriteOptions(unify_dictionaries=True)
+    with pa.ipc.new_file(tmp, table.schema, options=options) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def load_cached(
+    parquet_file: str = "combined_data.parquet",
+    columns: list = None,
+) -> pd.DataFrame:
+    """
+    Đọc dữ liệu qua cache Arrow IPC memory-mapped nằm cạnh file Parquet.
+
+    Lần đầu (hoặc khi file Parquet thay đổi size/mtime) cache được dựng lại
+    từ Parquet; các lần sau chỉ ánh xạ file cache vào bộ nhớ nên gần như
+    không tốn thời gian giải mã. Mảng trả về là read-only (dùng `.copy()`
+    nếu cần sửa tại chỗ).
+
+    Args:
+        parquet_file: File Parquet nguồn.
+        columns:      Danh sách cột cần dùng (None = tất cả); mỗi tập cột có
+                      một file cache riêng.
+
+    Returns:
+        DataFrame cùng kiểu dữ liệu với `pd.read_parquet(parquet_file, columns=columns)`.
+    """
+    parquet_file = Path(parquet_file)
+    path         = cache_path(parquet_file, columns)
+
+    fresh = False
+    if path.exists():
+        schema = pa.ipc.open_file(pa.memory_map(str(path))).schema
+        fresh  = (schema.metadata or {}).get(_SOURCE_KEY) == _source_stat(parquet_file)
+    if not fresh:
+        print(f"Building cache: {path}")
+        _build_cache(parquet_file, columns, path)
+
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas(split_blocks=True)
@@ -0,0 +1,198 @@
+"""
+percentile.py — Tra cứu thứ hạng phần trăm (percentile rank) của điểm thi.
+
+Bảng tích luỹ được dựng một lần từ `ScoreCube` (từng môn) và, nếu có,
+`BlockCube` (tổng điểm tổ hợp A00, D01…) cho mọi phạm vi: toàn quốc, từng
+tỉnh cũ ('tinh'), tỉnh mới ('tinh_moi') và từng mã Ngoại ngữ ('lang'). Mỗi
+truy vấn chỉ là một phép tra mảng (percentile) hoặc tìm kiếm nhị phân trên
+các mức điểm (score_at_percentile) — không quét lại DataFrame.
+
+Tham số `subject` nhận tên môn ('toan') hoặc mã tổ hợp ('A00'); với tổ hợp,
+điểm là tổng điểm (0–30 với tổ hợp 3 môn).
+
+Phạm vi (scope) được viết dạng tuple:
+    None                    → toàn quốc
+    ("tinh", "Hà Nội")      → tỉnh cũ
+    ("tinh_moi", "Đà Nẵng") → tỉnh mới (sau sáp nhập)
+    ("lang", "N1")          → thí sinh thi Tiếng Anh (chỉ với 'ngoai_ngu';
+                              tổ hợp không có phạm vi này → NaN)
+"""
+
+import numpy as np
+
+from src.config import (
+    SCORE_COLS,
+    SCORE_SCALE,
+    N_SCORE_LEVELS,
+    PROVINCE_NAMES,
+    NEW_PROVINCE_NAMES,
+)
+from src.blocks import BlockCube
+from src.cube import CUBE_LANGS, ScoreCube, group_province_counts
+
+# Cách tính thứ hạng (giống scipy.stats.percentileofscore)
+#   weak   → % thí sinh có điểm ≤ x
+#   strict → % thí sinh có điểm < x
+#   mean   → trung bình của hai cách trên
+PERCENTILE_KINDS = ("weak", "strict", "mean")
+
+# Sai số cho điểm nằm sát mức lưới
+_EPS = 1e-6
+
+
+class PercentileTable:
+    """
+    Bảng phân phối tích luỹ [phạm vi, môn/tổ hợp, mức điểm] dựng từ
+    ScoreCube (và BlockCube nếu có). Trục mức điểm dài bằng lưới tổng điểm
+    tổ hợp dài nhất; hàng của môn đơn giữ nguyên tổng sau mức 200.
+
+    Attributes:
+        scopes:   list phạm vi theo thứ tự trục 0 (None = toàn quốc).
+        subjects: SCORE_COLS + mã tổ hợp của BlockCube, theo thứ tự trục 1.
+        cum:      int64 [len(scopes), len(subjects), n_levels]
+        total:    int64 [len(scopes), len(subjects)]
+    """
+
+    def __init__(self, cube: ScoreCube, blocks: BlockCube = None):
+        S, L = len(SCORE_COLS), N_SCORE_LEVELS
+        langs = CUBE_LANGS[:-1]
+
+        self.scopes = (
+            [None]
+            + [("tinh", p) for p in PROVINCE_NAMES]
+            + [("tinh_moi", p) for p in NEW_PROVINCE_NAMES]
+            + [("lang", g) for g in langs]
+        )
+        per_lang = np.zeros((len(langs), S, L), np.int64)
+        per_lang[:, SCORE_COLS.index("ngoai_ngu")] = cube.lang_counts[:, :-1].sum(axis=0)
+        parts = [self._scope_counts(cube.counts, per_lang)]
+        self.subjects = list(SCORE_COLS)
+
+        if blocks is not None:
+            no_lang = np.zeros((len(langs),) + blocks.counts.shape[1:], np.int64)
+            parts.append(self._scope_counts(blocks.counts, no_lang))
+            self.subjects += list(blocks.codes)
+
+        n_levels = max(c.shape[-1] for c in parts)
+        counts   = np.concatenate(
+            [np.pad(c, ((0, 0), (0, 0), (0, n_levels - c.shape[-1]))) for c in parts], axis=1,
+        )
+        self.cum   = np.cumsum(counts, axis=-1)
+        self.total = self.cum[..., -1]
+        self._scope_index   = {scope: i for i, scope in enumerate(self.scopes)}
+        self._subject_index = {s: i for i, s in enumerate(self.subjects)}
+
+    @staticmethod
+    def _scope_counts(counts: np.ndarray, per_lang: np.ndarray) -> np.ndarray:
+        """Xếp chồng [toàn quốc, 63 tỉnh, tỉnh mới, ngoại ngữ] từ khối đếm theo tỉnh."""
+        per_prov   = counts[:-1]                         # 63 tỉnh (bỏ ô không rõ)
+        _, per_new = group_province_counts(per_prov, "tinh_moi")
+        return np.concatenate([counts.sum(axis=0)[None], per_prov, per_new, per_lang])
+
+    @classmethod
+    def from_frame(cls, df, blocks=None) -> "PercentileTable":
+        """
+        Dựng bảng trực tiếp từ DataFrame (qua ScoreCube và BlockCube).
+
+        Args:
+            df:     DataFrame điểm (float hoặc dạng nén).
+            blocks: Tổ hợp cần tra (xem `block_weights`; None = mọi tổ hợp
+                    trong ADMISSION_BLOCKS).
+        """
+        return cls(ScoreCube.from_frame(df), BlockCube.from_frame(df, blocks))
+
+    @classmethod
+    def load(cls, cube_file: str, blocks: BlockCube = None) -> "PercentileTable":
+        """
+        Dựng bảng từ file khối đếm do ETL ghi ra; `blocks` (vd:
+        `BlockCube.from_parquet(...)`) bổ sung tra cứu theo tổ hợp.
+        """
+        return cls(ScoreCube.load(cube_file), blocks)
+
+    # ── Chỉ số ───────────────────────────────────────────────────────────────
+    def _scope_idx(self, scopes) -> np.ndarray:
+        if scopes is None or isinstance(scopes, tuple):
+            scopes = [scopes]
+        try:
+            return np.array([self._scope_index[s] for s in scopes], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Phạm vi không hợp lệ: {e.args[0]!r}") from None
+
+    def _subject_idx(self, subjects) -> np.ndarray:
+        if isinstance(subjects, str):
+            subjects = [subjects]
+        try:
+            return np.array([self._subject_index[s] for s in subjects], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Môn/tổ hợp không hợp lệ: {e.args[0]!r}") from None
+
+    # ── Truy vấn theo lô ─────────────────────────────────────────────────────
+    def percentile_batch(self, subjects, scores, scopes, kind: str = "weak") -> np.ndarray:
+        """
+        Thứ hạng phần trăm (0–100) cho nhiều truy vấn cùng lúc.
+
+        Args:
+            subjects: Tên môn / mã tổ hợp, hoặc mảng (broadcast với `scores`).
+            scores:   Mảng điểm (tổng điểm với tổ hợp).
+            scopes:   Một phạm vi hoặc list phạm vi (broadcast với `scores`).
+            kind:     'weak' (≤), 'strict' (<) hoặc 'mean'.
+
+        Returns:
+            Mảng float64 (NaN nếu phạm vi không có thí sinh).
+        """
+        if kind not in PERCENTILE_KINDS:
+            raise ValueError(f"kind phải là một trong {PERCENTILE_KINDS}")
+
+        scores = np.asarray(scores, dtype="float64")
+        si, ji, scores = np.broadcast_arrays(self._scope_idx(scopes), self._subject_idx(subjects), scores)
+
+        top    = self.cum.shape[-1] - 1
+        scaled = scores * SCORE_SCALE
+        le     = np.clip(np.floor(scaled + _EPS), -1, top).astype(np.int64)
+        lt     = np.clip(np.ceil(scaled - _EPS) - 1, -1, top).astype(np.int64)
+
+        # Tra thẳng ô (phạm vi, môn, mức) — không chép cả hàng tích luỹ mỗi truy vấn
+        total = self.total[si, ji].astype("float64")
+        n_le  = np.where(le >= 0, self.cum[si, ji, np.maximum(le, 0)], 0)
+        n_lt  = np.where(lt >= 0, self.cum[si, ji, np.maximum(lt, 0)], 0)
+
+        count = {"weak": n_le, "strict": n_lt, "mean": (n_le + n_lt) / 2}[kind]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, 100.0 * count / total, np.nan)
+
+    def score_at_percentile_batch(self, subjects, percentiles, scopes) -> np.ndarray:
+        """
+        Điểm nhỏ nhất x sao cho ít nhất `p`% thí sinh có điểm ≤ x
+        (nghịch đảo của `percentile_batch(kind='weak')`).
+
+        Tìm kiếm nhị phân vector hoá trên các mức điểm: O(log bins) mỗi truy vấn.
+        """
+        p = np.asarray(percentiles, dtype="float64")
+        si, ji, p = np.broadcast_arrays(self._scope_idx(scopes), self._subject_idx(subjects), p)
+
+        total  = self.total[si, ji]
+        target = np.clip(p, 0, 100) / 100.0 * total
+
+        lo = np.zeros(p.shape, np.int64)
+        hi = np.full(p.shape, self.cum.shape[-1] - 1, np.int64)
+        while (lo < hi).any():
+            mid   = (lo + hi) // 2
+            reach = self.cum[si, ji, mid] >= target - _EPS
+            hi    = np.where(reach, mid, hi)
+            lo    = np.where(reach, lo, mid + 1)
+
+        return np.where(total > 0, lo / SCORE_SCALE, np.nan)
+
+    # ── Truy vấn đơn ─────────────────────────────────────────────────────────
+    def percentile(self, subject: str, score, scope=None, kind: str = "weak"):
+        """
+        Thứ hạng phần trăm của `score` môn (hoặc tổ hợp) `subject` trong phạm vi `scope`.
+        `score` có thể là số hoặc mảng.
+        """
+        out = self.percentile_batch(subject, score, scope, kind)
+        return float(out[0]) if np.ndim(score) == 0 else out
+
+    def score_at_percentile(self, subject: str, p, scope=None):
+        """Điểm ứng với thứ hạng `p` (0–100); `p` có thể là số hoặc mảng."""
+        out = self.score_at_percentile_batch(subject, p, scope)
+        return float(out[0]) if np.ndim(p) == 0 else out
@@ -2,21 +2,48 @@
 plotting.py — Hàm vẽ biểu đồ dùng chung.
 """
 
+import functools
+import hashlib
+import inspect
+import json
 import os
+import time
+import warnings
 import numpy as np
+import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.patheffects as pe
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
 import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
 from scipy.spatial import ConvexHull
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import StandardScaler
+from sklearn.exceptions import ConvergenceWarning
+from typing import NamedTuple
 
 from src.config import (
     OUTPUT_DIR,
     SUBJECT_LABELS,
     CLUSTER_COLORS,
     CLUSTER_LABELS,
+    N_SCORE_LEVELS,
+    SCORE_COLS,
+    SCORE_SCALE,
+)
+from src.cube import CUBE_LANGS, ScoreCube, summarize_counts
+from src.encoding import decode_scores, score_levels
+from src.aggregate import GroupIndex, GroupStats, group_stats
+from src.clustering import (
+    KMEANS_CACHE_DIR,
+    ClusterSpec,
+    ProvinceClusters,
+    candidate_sweep,
+    cluster_provinces,
+    province_clusters,
+    score_vectors,
 )
 
 
@@ -26,115 +53,506 @@ def setup_style() -> None:
     plt.rcParams["figure.dpi"] = 120
 
 
-def plot_score_histogram(data, title: str, filename: str) -> None:
+# ──────────────────────────────────────────────────────────────────────────────
+# Hàng đợi vẽ biểu đồ
+# ──────────────────────────────────────────────────────────────────────────────
+# Phiên bản style chung: tăng khi đổi phần vẽ dùng chung mà khoá băm không
+# thấy (vd: font hệ thống, thư viện ngoài src.*) để vẽ lại mọi PNG. Sửa một
+# hàm vẽ, lớp hay hằng số trong src.* không cần tăng — chúng đã nằm trong khoá.
+STYLE_VERSION = 1
+
+# Chỉ mục cache trong mỗi thư mục ảnh: tên file PNG → khoá nội dung
+CHART_INDEX = ".chart_index.json"
+
+# Cạnh bin của histogram điểm (0.5 điểm)
+HIST_BINS = np.arange(0, 10.5, 0.5)
+
+class ChartJob(NamedTuple):
+    """
+    Một biểu đồ chờ vẽ: `func(save_path=path, **kwargs)`. `kwargs` chỉ chứa
+    dữ liệu đã tổng hợp (vector đếm, bảng theo tỉnh, ...) để gửi sang process
+    khác với chi phí nhỏ.
+    """
+    path:   str
+    func:   object
+    kwargs: dict
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+    def render(self) -> None:
+        self.func(save_path=self.path, **self.kwargs)
+
+
+def _style_params() -> dict:
+    """rcParams hiện tại (style của setup_style), trừ backend."""
+    return {k: v for k, v in plt.rcParams.items() if k != "backend"}
+
+
+# ── Cache biểu đồ theo nội dung ──────────────────────────────────────────────
+def _digest(h, obj) -> None:
+    """Băm ổn định (không phụ thuộc id / thứ tự dict) của dữ liệu đầu vào biểu đồ."""
+    if obj is None or isinstance(obj, (bool, int, float, str, np.generic)):
+        h.update(repr(obj).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        frame = obj if isinstance(obj, pd.DataFrame) else obj.to_frame()
+        h.update(repr((type(obj).__name__, list(frame.columns), [str(t) for t in frame.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, tuple) and hasattr(obj, "_fields"):
+        h.update(type(obj).__name__.encode())
+        _digest(h, dict(zip(obj._fields, obj)))
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}[{len(obj)}]".encode())
+        for item in obj:
+            _digest(h, item)
+    elif isinstance(obj, dict):
+        h.update(f"dict[{len(obj)}]".encode())
+        for key in sorted(obj, key=repr):
+            _digest(h, key)
+            _digest(h, obj[key])
+    elif callable(obj) and hasattr(obj, "__qualname__"):
+        h.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+    elif hasattr(obj, "__dict__"):
+        h.update(type(obj).__name__.encode())
+        _digest(h, vars(obj))
+    else:
+        h.update(repr(obj).encode())
+
+
+def _is_constant(value) -> bool:
+    """Dữ liệu thuần (số, chuỗi, mảng, list/tuple/dict lồng nhau) — không phải cache hay đối tượng."""
+    if value is None or isinstance(value, (bool, int, float, str, np.generic, np.ndarray)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_constant(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_constant(k) and _is_constant(v) for k, v in value.items())
+    return False
+
+
+def _code_names(code) -> set:
+    """Tên global mà một code object dùng, kể cả trong comprehension / hàm lồng."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def _is_src(obj) -> bool:
+    return (inspect.isfunction(obj) or inspect.isclass(obj)) and obj.__module__.startswith("src.")
+
+
+@functools.lru_cache(maxsize=None)
+def _source(obj) -> bytes:
+    """Mã nguồn của hàm / lớp (nhớ theo đối tượng: getsource của lớp phải phân tích cả module)."""
+    try:
+        return inspect.getsource(obj).encode()
+    except (OSError, TypeError):
+        return f"{obj.__module__}.{obj.__qualname__}".encode()
+
+
+def _code_digest(h, obj, seen: set) -> None:
+    """
+    Mã nguồn hàm vẽ và mọi thứ trong src.* mà nó dùng theo tên: hàm (đệ
+    quy), lớp (mã nguồn cả lớp, kèm phụ thuộc của từng method) và hằng số
+    cấp module viết hoa (băm theo giá trị, vd: HIST_BINS, CLUSTER_COLORS).
     """
-    Vẽ histogram phân phối điểm và lưu ra file PNG.
+    if obj in seen:
+        return
+    seen.add(obj)
+    if not (inspect.isfunction(obj) or inspect.isclass(obj)):
+        h.update(repr(obj).encode())
+        return
+    h.update(_source(obj))
 
-    Args:
-        data:     Series/array điểm số (đã dropna).
-        title:    Tiêu đề biểu đồ.
-        filename: Đường dẫn file PNG đầu ra.
+    if inspect.isclass(obj):
+        for member in vars(obj).values():
+            member = member.fget if isinstance(member, property) else getattr(member, "__func__", member)
+            if _is_src(member):
+                _code_digest(h, member, seen)
+        return
+
+    for name in sorted(_code_names(obj.__code__)):
+        dep = obj.__globals__.get(name)
+        if _is_src(dep):
+            _code_digest(h, dep, seen)
+        elif name.isupper() and _is_constant(dep):
+            h.update(name.encode())
+            _digest(h, dep)
+
+
+def _src_types(obj) -> set:
+    """Lớp trong src.* của dữ liệu đầu vào (NamedTuple lồng nhau, list, dict)."""
+    types = {type(obj)} if type(obj).__module__.startswith("src.") else set()
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            types |= _src_types(item)
+    return types
+
+
+def chart_key(job: ChartJob) -> str:
+    """
+    Khoá nội dung của một biểu đồ: băm dữ liệu đầu vào (đã tổng hợp), tham
+    số, mã nguồn hàm vẽ cùng hàm / lớp / hằng số trong src.* mà nó dùng, mã
+    nguồn lớp của dữ liệu đầu vào (method như `ProvinceClusters.centers_2d`),
+    rcParams và STYLE_VERSION. Khoá không đổi ⇒ PNG không đổi, không cần vẽ lại.
+    """
+    h    = hashlib.sha1()
+    seen = set()
+    h.update(repr((STYLE_VERSION, matplotlib.__version__, sns.__version__)).encode())
+    _code_digest(h, job.func, seen)
+    for cls in sorted(_src_types(job.kwargs), key=lambda c: f"{c.__module__}.{c.__qualname__}"):
+        _code_digest(h, cls, seen)
+    h.update(repr(sorted(_style_params().items(), key=lambda kv: kv[0])).encode())
+    _digest(h, job.kwargs)
+    return h.hexdigest()
+
+
+def _load_index(directory: str) -> dict:
+    """Chỉ mục cache của một thư mục ảnh: tên file → khoá nội dung."""
+    path = os.path.join(directory, CHART_INDEX)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_index(directory: str, updates: dict) -> None:
+    if not updates:
+        return
+    index = _load_index(directory)
+    index.update(updates)
+    path = os.path.join(directory, CHART_INDEX)
+    tmp  = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _is_fresh(job: ChartJob, key: str, index: dict) -> bool:
+    return index.get(job.filename) == key and os.path.exists(job.path)
+
+
+def _init_render_worker(params: dict) -> None:
+    """Khởi tạo process vẽ: backend Agg (không cần màn hình) + style của process chính."""
+    plt.switch_backend("Agg")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        plt.rcParams.update(params)
+
+
+def _render_job(job: ChartJob) -> tuple:
+    start = time.perf_counter()
+    job.render()
+    seconds = time.perf_counter() - start
+    return job.filename, job.path, seconds, os.path.getsize(job.path), os.getpid()
+
+
+class RenderQueue:
+    """
+    Hàng đợi ChartJob: các hàm vẽ nhận `queue=` sẽ đưa biểu đồ vào đây thay
+    vì vẽ ngay; `run()` vẽ tất cả song song trên process pool (backend Agg),
+    mỗi process vẽ và mã hoá PNG độc lập. Biểu đồ có khoá nội dung
+    (`chart_key`) trùng với chỉ mục CHART_INDEX trong thư mục ảnh và file
+    PNG vẫn còn thì được bỏ qua.
+
+    Ví dụ:
+        queue = RenderQueue()
+        plot_all_subject_histograms(df, queue=queue)
+        kmeans_subject_2d(df, "toan", "Toán", queue=queue)
+        manifest = queue.run()      # file, path, seconds, bytes, pid
     """
-    bins = np.arange(0, 10.5, 0.5)
 
-    n       = len(data)
-    mean    = data.mean()
-    median  = data.median()
-    std     = data.std()
-    count_10 = (data == 10).sum()
-    count_0  = (data == 0).sum()
+    def __init__(self):
+        self.jobs = []
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def add(self, job: ChartJob) -> None:
+        self.jobs.append(job)
+
+    def extend(self, jobs) -> None:
+        self.jobs.extend(jobs)
+
+    def run(self, n_workers: int = None, verbose: bool = True, force: bool = False) -> pd.DataFrame:
+        """
+        Vẽ mọi job đang chờ (trừ biểu đồ không đổi) rồi làm rỗng hàng đợi.
+
+        Args:
+            n_workers: Số process (None = số CPU, 1 = tuần tự trong process hiện tại).
+            verbose:   In tên file và thời gian vẽ từng biểu đồ.
+            force:     Vẽ lại cả biểu đồ có trong cache.
+
+        Returns:
+            Manifest: DataFrame (file, path, cached, seconds, bytes, pid) theo
+            thứ tự job; attrs['wall_seconds'] là tổng thời gian thực.
+        """
+        jobs, self.jobs = self.jobs, []
+        start   = time.perf_counter()
+        keys    = [chart_key(job) for job in jobs]
+        indexes = {d: _load_index(d) for d in {os.path.dirname(job.path) for job in jobs}}
+        stale   = [
+            i for i, (job, key) in enumerate(zip(jobs, keys))
+            if force or not _is_fresh(job, key, indexes[os.path.dirname(job.path)])
+        ]
+
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(stale)))
+        if n_workers == 1:
+            rendered = [_render_job(jobs[i]) for i in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_render_worker,
+                                     initargs=(_style_params(),)) as pool:
+                rendered = list(pool.map(_render_job, [jobs[i] for i in stale]))
+
+        rows = {i: (file, path, False, seconds, size, pid)
+                for i, (file, path, seconds, size, pid) in zip(stale, rendered)}
+        updates = {}
+        for i in stale:
+            updates.setdefault(os.path.dirname(jobs[i].path), {})[jobs[i].filename] = keys[i]
+        for directory, entries in updates.items():
+            _store_index(directory, entries)
+        for i, job in enumerate(jobs):
+            if i not in rows:
+                rows[i] = (job.filename, job.path, True, 0.0, os.path.getsize(job.path), None)
+
+        manifest = pd.DataFrame([rows[i] for i in range(len(jobs))],
+                                columns=["file", "path", "cached", "seconds", "bytes", "pid"])
+        manifest.attrs["wall_seconds"] = time.perf_counter() - start
+        if verbose:
+            for file, cached, seconds in zip(manifest["file"], manifest["cached"], manifest["seconds"]):
+                print(f"Cached: {file}" if cached else f"Saved: {file}  ({seconds:.2f}s)")
+            print(f"Đã vẽ {len(stale)}/{len(manifest)} biểu đồ trong {manifest.attrs['wall_seconds']:.1f}s "
+                  f"({n_workers} process, tổng thời gian vẽ {manifest['seconds'].sum():.1f}s)")
+        return manifest
+
+
+def _submit(job: ChartJob, queue: RenderQueue = None, verbose: bool = True) -> None:
+    """
+    Đưa job vào `queue`, hoặc vẽ ngay nếu không có hàng đợi (bỏ qua nếu
+    khoá nội dung trùng chỉ mục cache và PNG vẫn còn).
+    """
+    if queue is not None:
+        queue.add(job)
+        return
+    directory = os.path.dirname(job.path)
+    key       = chart_key(job)
+    if _is_fresh(job, key, _load_index(directory)):
+        if verbose:
+            print(f"Cached: {job.filename}")
+        return
+    job.render()
+    _store_index(directory, {job.filename: key})
+    if verbose:
+        print(f"Saved: {job.filename}")
+
+
+# ── Mẫu hình dùng lại ───────────────────────────────────────────────────────
+# Hình dựng sẵn theo tên bố cục, riêng cho từng process (kể cả process vẽ
+# của RenderQueue): tên → (rcParams lúc dựng, mẫu)
+_TEMPLATES = {}
+
+
+def _template(name: str, build) -> dict:
+    """
+    Mẫu hình của bố cục `name`, dựng bằng `build()` ở lần đầu (hoặc khi
+    rcParams đổi, vd: gọi lại setup_style). Mẫu là dict chứa figure, trục và
+    các artist mà hàm vẽ chỉ cần thay dữ liệu/chữ cho từng biểu đồ; bố cục
+    (vị trí trục, khung cắt ảnh) được tính một lần lúc dựng.
+    """
+    params = _style_params()
+    cached = _TEMPLATES.get(name)
+    if cached is None or cached[0] != params:
+        cached = _TEMPLATES[name] = (params, build())
+    return cached[1]
+
+
+def _new_figure(figsize: tuple) -> Figure:
+    """
+    Figure gắn thẳng canvas Agg, không đăng ký với pyplot: dùng lại được mà
+    không cần plt.close và không tự hiện trong notebook.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _tight_bbox(fig: Figure) -> Bbox:
+    """Khung cắt ảnh như `bbox_inches="tight"` (kèm savefig.pad_inches), tính một lần."""
+    pad = plt.rcParams["savefig.pad_inches"]
+    return fig.get_tightbbox(fig.canvas.get_renderer()).padded(pad)
 
-    fig, ax = plt.subplots(figsize=(9, 6))
-    sns.histplot(data, bins=bins, binrange=(0, 10), kde=False, ax=ax)
 
-    ax.set_title(title, fontsize=14, fontweight="bold")
+def _bin_counts(counts: np.ndarray) -> np.ndarray:
+    """
+    Gộp vector đếm trên lưới điểm thành số thí sinh mỗi bin HIST_BINS (bin
+    cuối đóng hai đầu, như np.histogram / sns.histplot).
+    """
+    step = int(round((HIST_BINS[1] - HIST_BINS[0]) * SCORE_SCALE))
+    idx  = np.minimum(np.arange(len(counts)) // step, len(HIST_BINS) - 2)
+    return np.bincount(idx, weights=counts, minlength=len(HIST_BINS) - 1)
+
+
+def _build_histogram_template() -> dict:
+    """
+    Mẫu histogram điểm: 20 cột HIST_BINS, nhãn trục, hộp tóm tắt. Bố cục và
+    khung cắt tính với nhãn trục y rộng nhất (6 chữ số) nên mọi biểu đồ cùng
+    kích thước và không bị cắt chữ.
+    """
+    fig  = _new_figure((9, 6))
+    ax   = fig.subplots()
+    bars = ax.bar(HIST_BINS[:-1], np.zeros(len(HIST_BINS) - 1), width=np.diff(HIST_BINS), align="edge",
+                  color=to_rgba("C0", 0.75), edgecolor="white", linewidth=1.0)
+
+    title = ax.set_title("Phân bố điểm", fontsize=14, fontweight="bold")
     ax.set_xlabel("Điểm số")
     ax.set_ylabel("Số lượng thí sinh")
     ax.set_xlim(0, 10)
-    ax.set_xticks(bins)
-
-    summary_text = (
-        f"Số thí sinh: {n:,}\n"
-        f"ĐTB: {mean:.2f}\n"
-        f"Trung vị: {median:.2f}\n"
-        f"Độ lệch chuẩn: {std:.2f}\n"
-        f"Số điểm 10: {count_10:,}\n"
-        f"Số điểm 0: {count_0:,}"
-    )
-    plt.gcf().text(
-        0.15, 0.7, summary_text, fontsize=12,
+    ax.set_xticks(HIST_BINS)
+    summary = fig.text(
+        0.15, 0.7, "\n".join(["0"] * 6), fontsize=12,
         bbox=dict(facecolor="white", alpha=0.8, edgecolor="gray"),
     )
 
-    plt.tight_layout()
-    plt.savefig(filename, dpi=120, bbox_inches="tight")
-    plt.close(fig)
+    ax.set_ylim(0, 999_999)
+    fig.tight_layout()
+    bbox = _tight_bbox(fig)
+    ax.set_autoscaley_on(True)
+    return dict(fig=fig, ax=ax, bars=bars, title=title, summary=summary, bbox=bbox)
 
 
-def plot_all_subject_histograms(df, output_dir: str = OUTPUT_DIR) -> None:
+def plot_score_histogram_counts(counts: np.ndarray, title: str, save_path: str) -> None:
+    """
+    Vẽ histogram phân phối điểm từ vector đếm trên lưới điểm (N_SCORE_LEVELS
+    mức) và lưu ra file PNG. Cột histogram và hộp tóm tắt đều suy ra từ
+    vector đếm nên thời gian vẽ không phụ thuộc số thí sinh; hình dùng lại
+    mẫu dựng sẵn (chỉ đổi chiều cao cột và chữ), không dựng figure hay tính
+    lại bố cục cho từng môn.
+
+    Args:
+        counts:    Vector đếm theo mức điểm (vd: `GroupStats.group_counts`).
+        title:     Tiêu đề biểu đồ.
+        save_path: Đường dẫn file PNG đầu ra.
+    """
+    tpl     = _template("histogram", _build_histogram_template)
+    summary = summarize_counts(counts)
+
+    for bar, height in zip(tpl["bars"], _bin_counts(counts)):
+        bar.set_height(height)
+    tpl["ax"].relim()
+    tpl["ax"].autoscale_view(scalex=False)
+
+    tpl["title"].set_text(title)
+    tpl["summary"].set_text(
+        f"Số thí sinh: {summary['n']:,}\n"
+        f"ĐTB: {summary['mean']:.2f}\n"
+        f"Trung vị: {summary['median']:.2f}\n"
+        f"Độ lệch chuẩn: {summary['std']:.2f}\n"
+        f"Số điểm 10: {summary['count_10']:,}\n"
+        f"Số điểm 0: {summary['count_0']:,}"
+    )
+    tpl["fig"].savefig(save_path, dpi=120, bbox_inches=tpl["bbox"])
+
+
+def plot_score_histogram(data, title: str, filename: str) -> None:
+    """
+    Vẽ histogram phân phối điểm và lưu ra file PNG (đếm theo mức điểm một
+    lần rồi vẽ bằng `plot_score_histogram_counts`).
+
+    Args:
+        data:     Series/array điểm số (đã dropna).
+        title:    Tiêu đề biểu đồ.
+        filename: Đường dẫn file PNG đầu ra.
+    """
+    plot_score_histogram_counts(_score_counts(pd.Series(data)), title, filename)
+
+
+def _score_counts(series: pd.Series) -> np.ndarray:
+    """Vector đếm trên lưới điểm (N_SCORE_LEVELS mức) của một cột điểm."""
+    levels = score_levels(series)
+    return np.bincount(levels[levels >= 0], minlength=N_SCORE_LEVELS)
+
+
+def plot_all_subject_histograms(df, output_dir: str = OUTPUT_DIR, queue: RenderQueue = None) -> None:
     """
     Vẽ histogram cho tất cả các môn thi (trừ ngoại ngữ xử lý riêng).
 
     Args:
-        df:         DataFrame đã load từ Parquet.
+        df:         DataFrame đã load từ Parquet, hoặc ScoreCube (src.cube).
         output_dir: Thư mục lưu ảnh.
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
     """
     os.makedirs(output_dir, exist_ok=True)
-    score_columns = df.select_dtypes(include=["float32", "float64"]).columns
-    score_columns = score_columns.drop("ngoai_ngu", errors="ignore")
-
-    for col in score_columns:
-        data = df[col].dropna()
-        if not data.empty:
-            file_path = os.path.join(output_dir, f"{col}.png")
+    if isinstance(df, ScoreCube):
+        columns = ((col, df.score_counts(col)) for col in SCORE_COLS if col != "ngoai_ngu")
+    else:
+        df = decode_scores(df)
+        score_columns = df.select_dtypes(include=["float32", "float64"]).columns
+        score_columns = score_columns.drop("ngoai_ngu", errors="ignore")
+        columns = ((col, _score_counts(df[col])) for col in score_columns)
+
+    for col, counts in columns:
+        if counts.sum():
             label = SUBJECT_LABELS.get(col, col)
-            plot_score_histogram(data, f"Phân bố điểm - {label}", file_path)
-            print(f"Saved: {col}.png")
+            _submit(ChartJob(os.path.join(output_dir, f"{col}.png"), plot_score_histogram_counts,
+                             dict(counts=counts, title=f"Phân bố điểm - {label}")), queue)
 
 
-def plot_foreign_language_histograms(df, output_dir: str = OUTPUT_DIR) -> None:
+def plot_foreign_language_histograms(
+    df,
+    output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    queue: RenderQueue = None,
+) -> None:
     """
     Vẽ histogram điểm Ngoại ngữ, tách theo từng mã ngôn ngữ (N1–N7).
 
     Args:
-        df:         DataFrame đã load từ Parquet.
+        df:         DataFrame đã load từ Parquet, hoặc ScoreCube (src.cube).
         output_dir: Thư mục lưu ảnh.
+        index:      GroupIndex của df có cột 'ma_mon_ngoai_ngu' (tuỳ chọn):
+                    mỗi ngôn ngữ chỉ đọc đúng các dòng của nó.
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
     """
     from src.config import FOREIGN_LANG_LABELS
 
     os.makedirs(output_dir, exist_ok=True)
-    if "ngoai_ngu" not in df.columns or "ma_mon_ngoai_ngu" not in df.columns:
-        return
-
-    langs = df[["ngoai_ngu", "ma_mon_ngoai_ngu"]].dropna(
-        subset=["ngoai_ngu", "ma_mon_ngoai_ngu"]
-    )
-    for code, group in langs.groupby("ma_mon_ngoai_ngu"):
-        filename  = os.path.join(output_dir, f"ngoai_ngu_{code}.png")
+    if isinstance(df, ScoreCube):
+        langs = ((code, df.score_counts("ngoai_ngu", lang=code)) for code in CUBE_LANGS[:-1])
+    else:
+        df = decode_scores(df, ["ngoai_ngu"])
+        if "ngoai_ngu" not in df.columns or "ma_mon_ngoai_ngu" not in df.columns:
+            return
+        if index is not None:
+            col    = "ma_mon_ngoai_ngu"
+            groups = ((code, index.take(df, col, code, ["ngoai_ngu"])) for code in index.groups(col))
+        else:
+            groups = df[["ngoai_ngu", "ma_mon_ngoai_ngu"]].groupby("ma_mon_ngoai_ngu", observed=True)
+        langs = ((code, _score_counts(group["ngoai_ngu"])) for code, group in groups)
+
+    for code, counts in langs:
+        if not counts.sum():
+            continue
         lang_name = FOREIGN_LANG_LABELS.get(code, code)
         title     = f"Phân bố điểm Ngoại ngữ - {lang_name} ({code})"
-        plot_score_histogram(group["ngoai_ngu"], title, filename)
-        print(f"Saved: ngoai_ngu_{code}.png")
-
+        _submit(ChartJob(os.path.join(output_dir, f"ngoai_ngu_{code}.png"), plot_score_histogram_counts,
+                         dict(counts=counts, title=title)), queue)
 
-def plot_foreign_language_bar(df, output_dir: str = OUTPUT_DIR) -> None:
-    """
-    Vẽ bar chart ngang – tỷ lệ đăng ký thi các môn Ngoại ngữ.
 
-    Args:
-        df:         DataFrame đã load từ Parquet.
-        output_dir: Thư mục lưu ảnh.
-    """
+def _plot_foreign_language_bar(lang_counts: pd.Series, save_path: str) -> None:
+    """Bar chart ngang số thí sinh theo mã ngoại ngữ (lang_counts đã sắp tăng dần)."""
     from src.config import FOREIGN_LANG_LABELS
 
-    os.makedirs(output_dir, exist_ok=True)
-    lang_counts = (
-        df[df["ma_mon_ngoai_ngu"].notna() & df["ngoai_ngu"].notna()]
-        ["ma_mon_ngoai_ngu"]
-        .value_counts()
-        .sort_values(ascending=True)
-    )
-
     total    = lang_counts.sum()
     y_labels = [f"{FOREIGN_LANG_LABELS.get(c, c)} ({c})" for c in lang_counts.index]
     counts   = lang_counts.values
@@ -184,26 +602,52 @@ def plot_foreign_language_bar(df, output_dir: str = OUTPUT_DIR) -> None:
         ax.spines["bottom"].set_color("#CCCCCC")
 
         plt.tight_layout()
-        save_path = os.path.join(output_dir, "ngoai_ngu_bar.png")
         plt.savefig(save_path, dpi=120, bbox_inches="tight")
         plt.close(fig)
-    print(f"Saved: ngoai_ngu_bar.png")
 
 
-def plot_num_subjects_bar(df, output_dir: str = OUTPUT_DIR) -> None:
+def plot_foreign_language_bar(
+    df,
+    output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    queue: RenderQueue = None,
+) -> None:
     """
-    Vẽ bar chart phân bố số môn thi của mỗi thí sinh.
+    Vẽ bar chart ngang – tỷ lệ đăng ký thi các môn Ngoại ngữ.
 
     Args:
-        df:         DataFrame đã load từ Parquet (phải có cột num_subjects).
+        df:         DataFrame đã load từ Parquet, hoặc ScoreCube (src.cube).
         output_dir: Thư mục lưu ảnh.
+        index:      GroupIndex của df có cột 'ma_mon_ngoai_ngu' (tuỳ chọn,
+                    đếm bằng mã nhóm sẵn có thay vì value_counts).
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
     """
-    from src.config import SCORE_COLS
-
     os.makedirs(output_dir, exist_ok=True)
-    df = df.copy()
-    df["num_subjects"]  = df[SCORE_COLS].notna().sum(axis=1)
-    num_subj_counts     = df["num_subjects"].value_counts().sort_index()
+    if isinstance(df, ScoreCube):
+        lang_counts = df.lang_totals().sort_values(ascending=True)
+    elif index is not None:
+        df     = decode_scores(df, ["ngoai_ngu"])
+        col    = "ma_mon_ngoai_ngu"
+        codes  = index.codes(col)
+        keep   = (codes >= 0) & df["ngoai_ngu"].notna().to_numpy()
+        counts = np.bincount(codes[keep], minlength=len(index.groups(col)))
+        lang_counts = pd.Series(counts, index=index.groups(col))
+        lang_counts = lang_counts[lang_counts > 0].sort_values(ascending=True)
+    else:
+        df          = decode_scores(df, ["ngoai_ngu"])
+        lang_counts = (
+            df[df["ma_mon_ngoai_ngu"].notna() & df["ngoai_ngu"].notna()]
+            ["ma_mon_ngoai_ngu"]
+            .value_counts()
+            .sort_values(ascending=True)
+        )
+
+    _submit(ChartJob(os.path.join(output_dir, "ngoai_ngu_bar.png"), _plot_foreign_language_bar,
+                     dict(lang_counts=lang_counts)), queue)
+
+
+def _plot_num_subjects_bar(num_subj_counts: pd.Series, save_path: str) -> None:
+    """Bar chart số thí sinh theo số môn thi (num_subj_counts đã sắp theo số môn)."""
     total_students      = num_subj_counts.sum()
     BAR_COLOR           = "#2176AE"
 
@@ -244,31 +688,33 @@ def plot_num_subjects_bar(df, output_dir: str = OUTPUT_DIR) -> None:
         ax.spines["bottom"].set_color("#CCCCCC")
 
         plt.tight_layout()
-        save_path = os.path.join(output_dir, "num_subjects_bar.png")
         plt.savefig(save_path, dpi=120, bbox_inches="tight")
         plt.close(fig)
-    print(f"Saved: num_subjects_bar.png")
 
 
-def plot_correlation_heatmap(df, output_dir: str = OUTPUT_DIR) -> None:
+def plot_num_subjects_bar(df, output_dir: str = OUTPUT_DIR, queue: RenderQueue = None) -> None:
     """
-    Vẽ heatmap tương quan giữa các môn thi chính.
+    Vẽ bar chart phân bố số môn thi của mỗi thí sinh.
 
     Args:
-        df:         DataFrame đã load từ Parquet.
+        df:         DataFrame đã load từ Parquet, hoặc ScoreCube (src.cube).
         output_dir: Thư mục lưu ảnh.
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
     """
     os.makedirs(output_dir, exist_ok=True)
-    corr_cols = ["toan", "van", "li", "hoa", "sinh", "su", "dia", "ngoai_ngu"]
-    corr_labels = {
-        "toan": "Toán", "van": "Ngữ văn", "li": "Vật lí",
-        "hoa": "Hóa học", "sinh": "Sinh học", "su": "Lịch sử",
-        "dia": "Địa lí", "ngoai_ngu": "Ngoại ngữ",
-    }
-    corr_matrix = df[corr_cols].corr().round(2)
-    corr_matrix.index   = [corr_labels[c] for c in corr_matrix.index]
-    corr_matrix.columns = [corr_labels[c] for c in corr_matrix.columns]
-
+    if isinstance(df, ScoreCube):
+        num_subj_counts = df.num_subjects_counts()
+    else:
+        df = decode_scores(df, SCORE_COLS)
+        df = df.copy()
+        df["num_subjects"] = df[SCORE_COLS].notna().sum(axis=1)
+        num_subj_counts    = df["num_subjects"].value_counts().sort_index()
+    _submit(ChartJob(os.path.join(output_dir, "num_subjects_bar.png"), _plot_num_subjects_bar,
+                     dict(num_subj_counts=num_subj_counts)), queue)
+
+
+def _plot_correlation_heatmap(corr_matrix: pd.DataFrame, save_path: str) -> None:
+    """Heatmap tam giác dưới của ma trận tương quan."""
     mask = np.zeros_like(corr_matrix, dtype=bool)
     mask[np.triu_indices_from(mask, k=1)] = True
 
@@ -285,109 +731,108 @@ def plot_correlation_heatmap(df, output_dir: str = OUTPUT_DIR) -> None:
     ax.tick_params(axis="x", labelsize=12, rotation=30)
     ax.tick_params(axis="y", labelsize=12, rotation=0)
     plt.tight_layout()
-    save_path = os.path.join(output_dir, "corr_heatmap.png")
     plt.savefig(save_path, dpi=120, bbox_inches="tight")
     plt.close(fig)
-    print(f"Saved: corr_heatmap.png")
 
 
-def kmeans_subject_2d(
-    df,
-    subject_col: str,
-    subject_label: str,
-    k: int = 4,
-    group_col: str = "tinh",
-    output_dir: str = OUTPUT_DIR,
-):
+def plot_correlation_heatmap(df, output_dir: str = OUTPUT_DIR, queue: RenderQueue = None) -> None:
     """
-    Phân cụm K-Means (Elbow + Silhouette + scatter 2D) theo mean & std
-    của một môn thi đơn lẻ, theo nhóm tỉnh.
+    Vẽ heatmap tương quan giữa các môn thi chính.
 
     Args:
-        df:            DataFrame đã load từ Parquet.
-        subject_col:   Tên cột điểm (vd: 'toan').
-        subject_label: Tên hiển thị (vd: 'Toán').
-        k:             Số cụm K-Means.
-        group_col:     Cột nhóm (mặc định 'tinh').
-        output_dir:    Thư mục lưu ảnh.
-
-    Returns:
-        DataFrame thống kê theo tỉnh với cột cluster_rank.
+        df:         DataFrame đã load từ Parquet, hoặc ScoreCube (src.cube; tương
+                    quan tính chính xác từ tổng tích chéo từng cặp môn).
+        output_dir: Thư mục lưu ảnh.
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
     """
     os.makedirs(output_dir, exist_ok=True)
+    corr_cols = ["toan", "van", "li", "hoa", "sinh", "su", "dia", "ngoai_ngu"]
+    corr_labels = {
+        "toan": "Toán", "van": "Ngữ văn", "li": "Vật lí",
+        "hoa": "Hóa học", "sinh": "Sinh học", "su": "Lịch sử",
+        "dia": "Địa lí", "ngoai_ngu": "Ngoại ngữ",
+    }
+    if isinstance(df, ScoreCube):
+        corr_matrix = df.corr(corr_cols).round(2)
+    else:
+        corr_matrix = decode_scores(df, corr_cols)[corr_cols].corr().round(2)
+    corr_matrix.index   = [corr_labels[c] for c in corr_matrix.index]
+    corr_matrix.columns = [corr_labels[c] for c in corr_matrix.columns]
+    _submit(ChartJob(os.path.join(output_dir, "corr_heatmap.png"), _plot_correlation_heatmap,
+                     dict(corr_matrix=corr_matrix)), queue)
 
-    # --- Tính mean & std ---
-    mean_col = f"mean_{subject_col}"
-    std_col  = f"std_{subject_col}"
-    stats = (
-        df.dropna(subset=[group_col, subject_col])
-        .groupby(group_col)[subject_col]
-        .agg(**{mean_col: "mean", std_col: "std"})
-        .reset_index()
-        .dropna()
-    )
-    print(f"Số tỉnh có dữ liệu {subject_label}: {len(stats)}")
-
-    X        = stats[[mean_col, std_col]].values
-    scaler   = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    # --- Elbow + Silhouette ---
-    K_range    = range(2, 10)
-    inertias   = []
-    sil_scores = []
-    for kk in K_range:
-        km_    = KMeans(n_clusters=kk, random_state=42, n_init=10)
-        lbl_   = km_.fit_predict(X_scaled)
-        inertias.append(km_.inertia_)
-        sil_scores.append(silhouette_score(X_scaled, lbl_))
-
-    best_k_sil = list(K_range)[np.argmax(sil_scores)]
 
+def _plot_k_selection(sweep, label: str, suptitle: str, save_path: str) -> None:
+    """
+    Biểu đồ Elbow (inertia) + Silhouette theo k của một KSweep; khi Silhouette
+    được ước lượng bằng lấy mẫu thì vẽ thêm dải khoảng tin cậy.
+    """
+    K_range   = sweep.k_values
+    best_k    = sweep.best_k
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-    axes[0].plot(list(K_range), inertias, "o-", color="steelblue", linewidth=2, markersize=7)
-    axes[0].set_title(f"Elbow – Inertia vs K ({subject_label})", fontsize=13, fontweight="bold")
+    axes[0].plot(K_range, sweep.inertias, "o-", color="steelblue", linewidth=2, markersize=7)
+    axes[0].set_title(f"Elbow – Inertia vs K ({label})", fontsize=13, fontweight="bold")
     axes[0].set_xlabel("Số cụm K")
     axes[0].set_ylabel("Inertia (WCSS)")
     axes[0].xaxis.set_major_locator(plt.MaxNLocator(integer=True))
 
-    axes[1].plot(list(K_range), sil_scores, "o-", color="coral", linewidth=2, markersize=7)
-    axes[1].axvline(best_k_sil, linestyle="--", color="gray", alpha=0.7,
-                    label=f"Best k = {best_k_sil}")
-    axes[1].set_title(f"Silhouette Score vs K ({subject_label})", fontsize=13, fontweight="bold")
+    axes[1].plot(K_range, sweep.silhouettes, "o-", color="coral", linewidth=2, markersize=7)
+    if sweep.is_approximate:
+        axes[1].fill_between(K_range, sweep.silhouette_low, sweep.silhouette_high,
+                             color="coral", alpha=0.2, label="Khoảng tin cậy 95% (lấy mẫu)")
+    axes[1].axvline(best_k, linestyle="--", color="gray", alpha=0.7,
+                    label=f"Best k = {best_k}")
+    axes[1].set_title(f"Silhouette Score vs K ({label})", fontsize=13, fontweight="bold")
     axes[1].set_xlabel("Số cụm K")
     axes[1].set_ylabel("Silhouette Score")
     axes[1].xaxis.set_major_locator(plt.MaxNLocator(integer=True))
     axes[1].legend(fontsize=12)
 
-    plt.suptitle(f"Chọn K tối ưu – K-Means (mean & std {subject_label} theo tỉnh)",
-                 fontsize=14, fontweight="bold", y=1.02)
+    plt.suptitle(suptitle, fontsize=14, fontweight="bold", y=1.02)
     plt.tight_layout()
-    plt.savefig(
-        os.path.join(output_dir, f"kmeans_{subject_col}_optimal_k.png"),
-        dpi=120, bbox_inches="tight",
-    )
+    plt.savefig(save_path, dpi=120, bbox_inches="tight")
     plt.close(fig)
-    print(f"K tối ưu theo Silhouette ({subject_label}): {best_k_sil}")
 
-    # --- Fit K=k ---
-    km = KMeans(n_clusters=k, random_state=42, n_init=10)
-    stats["cluster"] = km.fit_predict(X_scaled)
 
-    cluster_order = (
-        stats.groupby("cluster")[mean_col].mean()
-        .sort_values(ascending=False).index.tolist()
-    )
-    rank_map             = {c: i for i, c in enumerate(cluster_order)}
-    stats["cluster_rank"] = stats["cluster"].map(rank_map)
-
-    # --- Scatter 2D ---
-    fig, ax = plt.subplots(figsize=(14, 9))
+def _build_cluster_scatter_template() -> dict:
+    """
+    Mẫu scatter phân cụm: trục nền xám nhạt, đã despine, bố cục tính một lần
+    với tiêu đề hai dòng và nhãn trục cỡ lớn nhất mà `_plot_cluster_scatter`
+    dùng.
+    """
+    fig = _new_figure((14, 9))
+    ax  = fig.subplots()
     ax.set_facecolor("#f9f9f9")
+    sns.despine(fig=fig)
+    ax.set_title("Phân cụm tỉnh\nFeatures", fontsize=15, fontweight="bold", pad=14)
+    ax.set_xlabel("Điểm trung bình", fontsize=13)
+    ax.set_ylabel("Độ lệch chuẩn", fontsize=13)
+    ax.tick_params(labelsize=11)
+    ax.set_ylim(0, 1.75)
+    fig.tight_layout()
+    return dict(fig=fig, ax=ax)
+
+
+def _plot_cluster_scatter(res: ProvinceClusters, save_path: str) -> None:
+    """
+    Scatter 2D (mean × std) các nhóm theo cụm, kèm convex hull và centroid.
+    Vẽ trên mẫu dựng sẵn: chỉ xoá và vẽ lại artist dữ liệu, tiêu đề, nhãn.
+    """
+    spec         = res.spec
+    stats, k     = res.stats, spec.k
+    x_col, y_col = res.axes
+    group_col    = spec.group_col
+
+    tpl     = _template("cluster_scatter", _build_cluster_scatter_template)
+    fig, ax = tpl["fig"], tpl["ax"]
+    for artist in [*ax.collections, *ax.patches, *ax.lines, *ax.texts]:
+        artist.remove()
+    ax.relim()
+    ax.set_autoscale_on(True)
 
     for rank in range(k):
         sub   = stats[stats["cluster_rank"] == rank]
-        pts   = sub[[mean_col, std_col]].values
+        pts   = sub[[x_col, y_col]].values
         color = CLUSTER_COLORS[rank]
         if len(pts) >= 3:
             hull      = ConvexHull(pts)
@@ -399,7 +844,7 @@ def kmeans_subject_2d(
     for rank in range(k):
         sub = stats[stats["cluster_rank"] == rank]
         ax.scatter(
-            sub[mean_col], sub[std_col],
+            sub[x_col], sub[y_col],
             label=f"{CLUSTER_LABELS[rank]}  (n={len(sub)})",
             color=CLUSTER_COLORS[rank],
             s=90, edgecolors="white", linewidths=0.8, zorder=4,
@@ -408,56 +853,137 @@ def kmeans_subject_2d(
     for _, row in stats.iterrows():
         ax.annotate(
             row[group_col],
-            xy=(row[mean_col], row[std_col]),
+            xy=(row[x_col], row[y_col]),
             xytext=(4, 4), textcoords="offset points",
             fontsize=7.2, color="#222222",
             path_effects=[pe.withStroke(linewidth=2, foreground="white")],
             zorder=5,
         )
 
-    centers = scaler.inverse_transform(km.cluster_centers_)
-    for i, center in enumerate(centers):
-        cr = rank_map[i]
+    for i, center in enumerate(res.centers_2d()):
+        cr = res.rank_map[i]
         ax.scatter(center[0], center[1],
                    marker="*", s=350, color=CLUSTER_COLORS[cr],
                    edgecolors="black", linewidths=0.9, zorder=6)
 
-    grand_mean = stats[mean_col].mean()
-    grand_std  = stats[std_col].mean()
+    grand_mean = stats[x_col].mean()
+    grand_std  = stats[y_col].mean()
     ax.axvline(grand_mean, color="gray", linestyle=":", linewidth=1.0, alpha=0.6)
     ax.axhline(grand_std,  color="gray", linestyle=":", linewidth=1.0, alpha=0.6)
     ax.text(
-        grand_mean + (stats[mean_col].max() - stats[mean_col].min()) * 0.01,
+        grand_mean + (stats[x_col].max() - stats[x_col].min()) * 0.01,
         ax.get_ylim()[1] * 0.995,
         f"ĐTB tổng: {grand_mean:.2f}", fontsize=9, color="gray", va="top",
     )
 
-    ax.set_title(
-        f"Phân cụm tỉnh theo Điểm {subject_label} – K-Means (k = {k})\n"
-        "Features: Điểm trung bình & Độ lệch chuẩn",
-        fontsize=15, fontweight="bold", pad=14,
-    )
-    ax.set_xlabel(f"Điểm trung bình {subject_label}", fontsize=13)
-    ax.set_ylabel(f"Độ lệch chuẩn {subject_label}", fontsize=13)
+    if spec.multi:
+        subject_names = " + ".join(SUBJECT_LABELS.get(c, c) for c in spec.columns)
+        ax.set_title(
+            f"Phân cụm tỉnh – Khối {spec.label} ({subject_names}) – K-Means (k = {k})\n"
+            f"Trục: ĐTB tổng hợp & Độ lệch chuẩn TB ({len(spec.columns)*2} features)",
+            fontsize=14, fontweight="bold", pad=14,
+        )
+        ax.set_xlabel(f"ĐTB tổng hợp ({subject_names})", fontsize=13)
+        ax.set_ylabel("Độ lệch chuẩn trung bình", fontsize=13)
+    else:
+        ax.set_title(
+            f"Phân cụm tỉnh theo Điểm {spec.label} – K-Means (k = {k})\n"
+            "Features: Điểm trung bình & Độ lệch chuẩn",
+            fontsize=15, fontweight="bold", pad=14,
+        )
+        ax.set_xlabel(f"Điểm trung bình {spec.label}", fontsize=13)
+        ax.set_ylabel(f"Độ lệch chuẩn {spec.label}", fontsize=13)
     ax.tick_params(labelsize=11)
     ax.legend(fontsize=11, title="Cụm (★ = centroid)", title_fontsize=11,
               framealpha=0.9, loc="upper left")
-    sns.despine()
-    plt.tight_layout()
-    save_path = os.path.join(output_dir, f"kmeans_{subject_col}_k{k}_2d.png")
-    plt.savefig(save_path, dpi=130, bbox_inches="tight")
-    plt.close(fig)
-    print(f"Saved: kmeans_{subject_col}_k{k}_2d.png")
+    # Khung cắt vẫn tính theo từng biểu đồ: nhãn tỉnh ở rìa có thể tràn ra ngoài trục
+    fig.savefig(save_path, dpi=130, bbox_inches="tight")
+
+
+def _cluster_chart_jobs(res: ProvinceClusters, output_dir: str) -> list:
+    """[Elbow + Silhouette, scatter 2D] của một bài phân cụm nhóm."""
+    spec  = res.spec
+    title = (f"Chọn K tối ưu – K-Means khối {spec.label}" if spec.multi
+             else f"Chọn K tối ưu – K-Means (mean & std {spec.label} theo tỉnh)")
+    k_file  = f"kmeans_{spec.slug}_optimal_k.png"
+    sc_file = f"kmeans_{spec.slug}_k{spec.k}_2d.png"
+    sweep   = res.sweep._replace(models={})     # biểu đồ không cần mô hình của từng k
+    return [
+        ChartJob(os.path.join(output_dir, k_file), _plot_k_selection,
+                 dict(sweep=sweep, label=spec.label, suptitle=title)),
+        ChartJob(os.path.join(output_dir, sc_file), _plot_cluster_scatter,
+                 dict(res=res._replace(sweep=sweep))),
+    ]
 
-    # --- Bảng tổng hợp ---
-    print(f"\n=== THÀNH PHẦN CÁC CỤM ({subject_label.upper()}) ===")
-    for rank in range(k):
-        sub = stats[stats["cluster_rank"] == rank].sort_values(mean_col, ascending=False)
+
+def _print_cluster_summary(res: ProvinceClusters) -> None:
+    """Thành phần từng cụm (số nhóm, ĐTB, độ lệch chuẩn, danh sách nhóm)."""
+    spec, stats  = res.spec, res.stats
+    x_col, y_col = res.axes
+    title        = f"KHỐI {spec.label.upper()}" if spec.multi else spec.label.upper()
+    print(f"\n=== THÀNH PHẦN CÁC CỤM ({title}) ===")
+    for rank in range(spec.k):
+        sub = stats[stats["cluster_rank"] == rank].sort_values(x_col, ascending=False)
         print(f"\n[Cụm {rank+1}] {CLUSTER_LABELS[rank]} — {len(sub)} tỉnh")
-        print(f"  ĐTB {subject_label}: {sub[mean_col].mean():.3f}  |  Std TB: {sub[std_col].mean():.3f}")
-        print(f"  Tỉnh: {', '.join(sub[group_col].tolist())}")
+        if spec.multi:
+            for c in spec.columns:
+                print(f"  ĐTB {SUBJECT_LABELS.get(c, c)}: {sub[f'mean_{c}'].mean():.3f}", end="  |  ")
+            print(f"\n  ĐTB tổng hợp: {sub[x_col].mean():.3f}  |  Std TB: {sub[y_col].mean():.3f}")
+        else:
+            print(f"  ĐTB {spec.label}: {sub[x_col].mean():.3f}  |  Std TB: {sub[y_col].mean():.3f}")
+        print(f"  Tỉnh: {', '.join(sub[spec.group_col].tolist())}")
 
-    return stats
+
+def kmeans_subject_2d(
+    df,
+    subject_col: str,
+    subject_label: str,
+    k: int = 4,
+    group_col: str = "tinh",
+    output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    queue: RenderQueue = None,
+    verbose: bool = True,
+):
+    """
+    Phân cụm K-Means (Elbow + Silhouette + scatter 2D) theo mean & std
+    của một môn thi đơn lẻ, theo nhóm tỉnh.
+
+    Args:
+        df:            DataFrame đã load từ Parquet, GroupStats (src.aggregate)
+                       đã dựng sẵn theo nhóm tỉnh, hoặc ScoreCube (src.cube).
+        subject_col:   Tên cột điểm (vd: 'toan').
+        subject_label: Tên hiển thị (vd: 'Toán').
+        k:             Số cụm K-Means.
+        group_col:     Cột nhóm (mặc định 'tinh'; bỏ qua nếu df là GroupStats).
+        output_dir:    Thư mục lưu ảnh.
+        index:         GroupIndex của df (tuỳ chọn, dùng lại mã nhóm).
+        n_workers:     Số process cho dải k (xem src.clustering.kmeans_sweep).
+        cache_dir:     Thư mục cache kết quả K-Means (None = không ghi đĩa).
+        queue:         RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
+        verbose:       In tiến trình và thành phần các cụm.
+
+    Returns:
+        DataFrame thống kê theo tỉnh với cột cluster_rank.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    gs   = df if isinstance(df, GroupStats) else group_stats(df, group_col, index=index)
+    spec = ClusterSpec(subject_col, subject_label, k, gs.group_col)
+    res  = province_clusters(gs, spec, n_workers=n_workers, cache_dir=cache_dir)
+    if verbose:
+        print(f"Số tỉnh có dữ liệu {subject_label}: {len(res.stats)}")
+
+    k_job, scatter_job = _cluster_chart_jobs(res, output_dir)
+    _submit(k_job, queue, verbose)
+    if verbose:
+        print(f"K tối ưu theo Silhouette ({subject_label}): {res.sweep.best_k}")
+    _submit(scatter_job, queue, verbose)
+
+    if verbose:
+        _print_cluster_summary(res)
+    return res.stats
 
 
 def kmeans_multi_subject_2d(
@@ -467,6 +993,11 @@ def kmeans_multi_subject_2d(
     k: int = 4,
     group_col: str = "tinh",
     output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    queue: RenderQueue = None,
+    verbose: bool = True,
 ):
     """
     Phân cụm K-Means đa môn (multi-feature) theo tỉnh.
@@ -474,168 +1005,128 @@ def kmeans_multi_subject_2d(
     Scatter 2D dùng trục = mean tổng hợp & std tổng hợp.
 
     Args:
-        df:           DataFrame đã load từ Parquet.
+        df:           DataFrame đã load từ Parquet, hoặc GroupStats dựng với
+                      complete=True trên đúng subject_cols.
         subject_cols: Danh sách cột điểm (vd: ['toan', 'li', 'hoa']).
         group_label:  Tên nhóm môn (vd: 'Tự Nhiên').
         k:            Số cụm K-Means.
-        group_col:    Cột nhóm (mặc định 'tinh').
+        group_col:    Cột nhóm (mặc định 'tinh'; bỏ qua nếu df là GroupStats).
         output_dir:   Thư mục lưu ảnh.
+        index:        GroupIndex của df (tuỳ chọn, dùng lại mã nhóm).
+        n_workers:    Số process cho dải k (xem src.clustering.kmeans_sweep).
+        cache_dir:    Thư mục cache kết quả K-Means (None = không ghi đĩa).
+        queue:        RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
+        verbose:      In tiến trình và thành phần các cụm.
 
     Returns:
         DataFrame thống kê theo tỉnh với cột cluster_rank.
     """
-    import warnings
-    warnings.filterwarnings("ignore")
     os.makedirs(output_dir, exist_ok=True)
 
-    slug = "_".join(subject_cols)
-
-    # 1. Lọc thí sinh thi đủ các môn
-    df_filtered = df.dropna(subset=subject_cols + [group_col])
-    df_filtered = df_filtered[df_filtered[subject_cols].notna().all(axis=1)]
-    print(f"Số thí sinh thi đủ {', '.join(subject_cols)}: {len(df_filtered):,}")
-
-    # 2. Tính mean & std theo tỉnh
-    agg_dict = {}
-    for col in subject_cols:
-        agg_dict[f"mean_{col}"] = (col, "mean")
-        agg_dict[f"std_{col}"]  = (col, "std")
-
-    stats = df_filtered.groupby(group_col).agg(**agg_dict).reset_index().dropna()
-    mean_cols = [f"mean_{c}" for c in subject_cols]
-    std_cols  = [f"std_{c}"  for c in subject_cols]
-    stats["mean_all"] = stats[mean_cols].mean(axis=1)
-    stats["std_all"]  = stats[std_cols].mean(axis=1)
-
-    # 3. Chuẩn hoá 2×n features
-    feat_cols = [col for pair in zip(mean_cols, std_cols) for col in pair]
-    X        = stats[feat_cols].values
-    scaler   = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    # 4. Elbow + Silhouette
-    K_range    = range(2, min(len(stats), 10))
-    inertias   = []
-    sil_scores = []
-    for kk in K_range:
-        km_  = KMeans(n_clusters=kk, random_state=42, n_init=10)
-        lbl_ = km_.fit_predict(X_scaled)
-        inertias.append(km_.inertia_)
-        sil_scores.append(silhouette_score(X_scaled, lbl_))
-
-    best_k_sil = list(K_range)[np.argmax(sil_scores)]
-    fig, axes  = plt.subplots(1, 2, figsize=(14, 5))
-    axes[0].plot(list(K_range), inertias, "o-", color="steelblue", linewidth=2, markersize=7)
-    axes[0].set_title(f"Elbow – Inertia vs K ({group_label})", fontsize=13, fontweight="bold")
-    axes[0].set_xlabel("Số cụm K"); axes[0].set_ylabel("Inertia (WCSS)")
-    axes[0].xaxis.set_major_locator(plt.MaxNLocator(integer=True))
-    axes[1].plot(list(K_range), sil_scores, "o-", color="coral", linewidth=2, markersize=7)
-    axes[1].axvline(best_k_sil, linestyle="--", color="gray", alpha=0.7,
-                    label=f"Best k = {best_k_sil}")
-    axes[1].set_title(f"Silhouette Score vs K ({group_label})", fontsize=13, fontweight="bold")
-    axes[1].set_xlabel("Số cụm K"); axes[1].set_ylabel("Silhouette Score")
-    axes[1].xaxis.set_major_locator(plt.MaxNLocator(integer=True))
-    axes[1].legend(fontsize=12)
-    plt.suptitle(f"Chọn K tối ưu – K-Means khối {group_label}",
-                 fontsize=14, fontweight="bold", y=1.02)
-    plt.tight_layout()
-    plt.savefig(
-        os.path.join(output_dir, f"kmeans_{slug}_optimal_k.png"),
-        dpi=120, bbox_inches="tight",
-    )
-    plt.close(fig)
-    print(f"K tối ưu theo Silhouette: {best_k_sil}")
-
-    # 5. Fit K=k
-    km = KMeans(n_clusters=k, random_state=42, n_init=10)
-    stats["cluster"] = km.fit_predict(X_scaled)
-    cluster_order    = (
-        stats.groupby("cluster")["mean_all"].mean()
-        .sort_values(ascending=False).index.tolist()
-    )
-    rank_map              = {c: i for i, c in enumerate(cluster_order)}
-    stats["cluster_rank"] = stats["cluster"].map(rank_map)
-
-    # 6. Scatter 2D
-    fig, ax = plt.subplots(figsize=(14, 9))
-    ax.set_facecolor("#f9f9f9")
-
-    for rank in range(k):
-        sub   = stats[stats["cluster_rank"] == rank]
-        pts   = sub[["mean_all", "std_all"]].values
-        color = CLUSTER_COLORS[rank]
-        if len(pts) >= 3:
-            hull      = ConvexHull(pts)
-            hull_pts  = np.append(hull.vertices, hull.vertices[0])
-            ax.fill(pts[hull_pts, 0], pts[hull_pts, 1], alpha=0.10, color=color, zorder=1)
-            ax.plot(pts[hull_pts, 0], pts[hull_pts, 1],
-                    linestyle="--", linewidth=1.2, color=color, alpha=0.5, zorder=2)
-
-    for rank in range(k):
-        sub = stats[stats["cluster_rank"] == rank]
-        ax.scatter(sub["mean_all"], sub["std_all"],
-                   label=f"{CLUSTER_LABELS[rank]}  (n={len(sub)})",
-                   color=CLUSTER_COLORS[rank],
-                   s=90, edgecolors="white", linewidths=0.8, zorder=4)
+    # Lọc thí sinh thi đủ các môn, mean & std theo tỉnh, K-Means (dải k có cache)
+    if isinstance(df, GroupStats):
+        gs = df
+    else:
+        gs = group_stats(df, group_col, subject_cols, complete=True, index=index)
+    spec = ClusterSpec(list(subject_cols), group_label, k, gs.group_col)
+    with warnings.catch_warnings():
+        # Ít tỉnh hơn số cụm thử → KMeans báo số cụm phân biệt < k; bỏ qua riêng cảnh báo này
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        res = province_clusters(gs, spec, n_workers=n_workers, cache_dir=cache_dir)
+    if verbose:
+        print(f"Số thí sinh thi đủ {', '.join(subject_cols)}: {res.n_candidates:,}")
+
+    k_job, scatter_job = _cluster_chart_jobs(res, output_dir)
+    _submit(k_job, queue, verbose)
+    if verbose:
+        print(f"K tối ưu theo Silhouette: {res.sweep.best_k}")
+    _submit(scatter_job, queue, verbose)
+
+    if verbose:
+        _print_cluster_summary(res)
+    return res.stats
+
+
+def cluster_many(
+    df,
+    specs: list,
+    output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    verbose: bool = True,
+):
+    """
+    Chạy nhiều bài phân cụm tỉnh (đơn môn / đa môn, 'tinh' / 'tinh_moi')
+    trong một lần: histogram theo nhóm của mọi bài dựng trong MỘT lần quét
+    df, mọi mô hình fit chung một process pool (src.clustering.cluster_provinces);
+    biểu đồ KHÔNG vẽ ngay mà trả về dưới dạng ChartJob.
 
-    for _, row in stats.iterrows():
-        ax.annotate(
-            row[group_col],
-            xy=(row["mean_all"], row["std_all"]),
-            xytext=(4, 4), textcoords="offset points",
-            fontsize=7.2, color="#222222",
-            path_effects=[pe.withStroke(linewidth=2, foreground="white")],
-            zorder=5,
-        )
+    Args:
+        df:         DataFrame điểm.
+        specs:      list ClusterSpec (hoặc tuple cùng thứ tự trường).
+        output_dir: Thư mục lưu ảnh của các ChartJob.
+        index:      GroupIndex của df (tuỳ chọn).
+        n_workers:  Số process cho toàn bộ tác vụ fit.
+        cache_dir:  Thư mục cache kết quả K-Means (None = không ghi đĩa).
+        verbose:    In thành phần các cụm của từng bài.
 
-    centers_orig = scaler.inverse_transform(km.cluster_centers_)
-    for i, center in enumerate(centers_orig):
-        cr         = rank_map[i]
-        c_mean_all = np.mean([center[feat_cols.index(f"mean_{c}")] for c in subject_cols])
-        c_std_all  = np.mean([center[feat_cols.index(f"std_{c}")]  for c in subject_cols])
-        ax.scatter(c_mean_all, c_std_all,
-                   marker="*", s=350, color=CLUSTER_COLORS[cr],
-                   edgecolors="black", linewidths=0.9, zorder=6)
+    Returns:
+        (list ProvinceClusters theo thứ tự specs, list ChartJob) — vẽ song
+        song bằng `RenderQueue.extend(jobs)` + `run()`, hoặc `job.render()`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = cluster_provinces(df, specs, index=index, n_workers=n_workers, cache_dir=cache_dir)
+    jobs    = []
+    for res in results:
+        jobs += _cluster_chart_jobs(res, output_dir)
+        if verbose:
+            print(f"\n##### {res.spec.label} (k = {res.spec.k}, K tối ưu theo Silhouette: {res.sweep.best_k})")
+            _print_cluster_summary(res)
+    return results, jobs
 
-    grand_mean = stats["mean_all"].mean()
-    grand_std  = stats["std_all"].mean()
-    ax.axvline(grand_mean, color="gray", linestyle=":", linewidth=1.0, alpha=0.6)
-    ax.axhline(grand_std,  color="gray", linestyle=":", linewidth=1.0, alpha=0.6)
-    ax.text(
-        grand_mean + (stats["mean_all"].max() - stats["mean_all"].min()) * 0.01,
-        ax.get_ylim()[1] * 0.995,
-        f"ĐTB tổng: {grand_mean:.2f}", fontsize=9, color="gray", va="top",
-    )
 
-    subject_names = " + ".join(
-        SUBJECT_LABELS.get(c, c) for c in subject_cols
-    )
-    ax.set_title(
-        f"Phân cụm tỉnh – Khối {group_label} ({subject_names}) – K-Means (k = {k})\n"
-        f"Trục: ĐTB tổng hợp & Độ lệch chuẩn TB ({len(subject_cols)*2} features)",
-        fontsize=14, fontweight="bold", pad=14,
-    )
-    ax.set_xlabel(f"ĐTB tổng hợp ({subject_names})", fontsize=13)
-    ax.set_ylabel("Độ lệch chuẩn trung bình", fontsize=13)
-    ax.tick_params(labelsize=11)
-    ax.legend(fontsize=11, title="Cụm (★ = centroid)", title_fontsize=11,
-              framealpha=0.9, loc="upper left")
-    sns.despine()
-    plt.tight_layout()
-    save_path = os.path.join(output_dir, f"kmeans_{slug}_k{k}_2d.png")
-    plt.savefig(save_path, dpi=130, bbox_inches="tight")
-    plt.close(fig)
-    print(f"Saved: kmeans_{slug}_k{k}_2d.png")
+def kmeans_candidates_optimal_k(
+    df,
+    block,
+    k_range=range(2, 10),
+    output_dir: str = OUTPUT_DIR,
+    sil_method: str = "auto",
+    n_workers: int = None,
+    cache_dir: str = KMEANS_CACHE_DIR,
+    queue: RenderQueue = None,
+):
+    """
+    Chọn K (Elbow + Silhouette) cho phân cụm thí sinh theo vector điểm của
+    một khối môn (src.clustering): K-Means có trọng số trên vector duy nhất,
+    Silhouette chính xác có trọng số hoặc ước lượng bằng mẫu phân tầng (kèm
+    khoảng tin cậy) khi số vector lớn — chạy được với 10⁵–10⁶ điểm.
 
-    # 7. Bảng tổng hợp
-    print(f"\n=== THÀNH PHẦN CÁC CỤM (KHỐI {group_label.upper()}) ===")
-    for rank in range(k):
-        sub = stats[stats["cluster_rank"] == rank].sort_values("mean_all", ascending=False)
-        print(f"\n[Cụm {rank+1}] {CLUSTER_LABELS[rank]} — {len(sub)} tỉnh")
-        for mc in mean_cols:
-            lbl = SUBJECT_LABELS.get(mc.replace("mean_", ""), mc)
-            print(f"  ĐTB {lbl}: {sub[mc].mean():.3f}", end="  |  ")
-        print(f"\n  ĐTB tổng hợp: {sub['mean_all'].mean():.3f}  |  Std TB: {sub['std_all'].mean():.3f}")
-        print(f"  Tỉnh: {', '.join(sub[group_col].tolist())}")
+    Args:
+        df:         DataFrame điểm.
+        block:      Mã tổ hợp (vd: 'A00') hoặc list cột điểm.
+        k_range:    Dải k.
+        output_dir: Thư mục lưu ảnh.
+        sil_method: 'exact', 'sample' hoặc 'auto'.
+        n_workers:  Số process cho dải k.
+        cache_dir:  Thư mục cache kết quả K-Means (None = không ghi đĩa).
+        queue:      RenderQueue (tuỳ chọn): đưa biểu đồ vào hàng đợi thay vì vẽ ngay.
 
-    return stats
+    Returns:
+        KSweep (mô hình của từng k dùng lại được qua `sweep.model(k)`).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    vectors = score_vectors(df, block)
+    sweep   = candidate_sweep(vectors, k_range, sil_method=sil_method,
+                              n_workers=n_workers, cache_dir=cache_dir)
+
+    name = block if isinstance(block, str) else " + ".join(SUBJECT_LABELS.get(s, s) for s in block)
+    slug = block if isinstance(block, str) else "_".join(block)
+    _submit(ChartJob(
+        os.path.join(output_dir, f"kmeans_candidates_{slug}_optimal_k.png"), _plot_k_selection,
+        dict(sweep=sweep._replace(models={}), label=name,
+             suptitle=f"Chọn K tối ưu – K-Means thí sinh khối {name} "
+                      f"({vectors.n_candidates:,} thí sinh, {len(vectors.keys):,} vector điểm)"),
+    ), queue)
+    print(f"K tối ưu theo Silhouette (thí sinh khối {name}): {sweep.best_k}")
+    return sweep
@@ -0,0 +1,305 @@
+"""
+resampling.py — Bootstrap và kiểm định hoán vị cho chênh lệch giữa hai nhóm,
+tính trên histogram điểm thay vì mẫu thô.
+
+Điểm nằm trên lưới SCORE_STEP nên một nhóm n thí sinh hoàn toàn xác định bởi
+vector đếm 201 mức:
+    bootstrap   : rút lại n điểm có hoàn lại  ≡ một mẫu Multinomial(n, counts / n)
+    hoán vị     : chia ngẫu nhiên mẫu gộp     ≡ một mẫu siêu bội đa biến trên counts_a + counts_b
+Mỗi lần lặp tốn O(số mức) thay vì O(n); các lần lặp được vector hoá theo khối
+[lần lặp × mức] và chia cho process pool.
+
+Tái lập: số lần lặp được cắt thành các khối cố định `_CHUNK`, mỗi khối có
+seed riêng sinh từ `np.random.SeedSequence(seed)` — cùng `seed` cho cùng kết
+quả bất kể `n_workers`.
+
+Ví dụ:
+    res = resample_two_groups(gs.group_counts("Hà Nội", "toan"),
+                              gs.group_counts("Nghệ An", "toan"), seed=42)
+    res["ci"]         # khoảng tin cậy bootstrap của mean/median/Cohen's d
+    res["perm_p"]     # p-value hoán vị
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from src.aggregate import GroupIndex, GroupStats, group_stats
+
+# Các thống kê chênh lệch (nhóm A − nhóm B)
+RESAMPLE_STATS = ("mean_diff", "median_diff", "cohens_d")
+
+# Số lần lặp mỗi khối (đơn vị chia việc và sinh seed)
+_CHUNK = 1_000
+
+# Sai số khi so sánh thống kê hoán vị với giá trị quan sát (thống kê rời rạc)
+_EPS = 1e-9
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Thống kê trên các histogram lặp
+# ──────────────────────────────────────────────────────────────────────────────
+def diff_stats(counts_a: np.ndarray, counts_b: np.ndarray) -> np.ndarray:
+    """
+    Các thống kê RESAMPLE_STATS cho từng cặp histogram.
+
+    Args:
+        counts_a: Vector đếm nhóm A, hoặc mảng [số lần lặp, số mức].
+        counts_b: Vector đếm nhóm B, cùng shape với A.
+
+    Returns:
+        float64 [len(RESAMPLE_STATS), ...] theo các trục đầu của đầu vào.
+    """
+    a, b  = np.atleast_2d(counts_a), np.atleast_2d(counts_b)
+    gs    = GroupStats(range(len(a)), ["a", "b"], np.stack([a, b], axis=1))
+    n     = gs.n.astype("float64")
+    mean  = gs.mean()
+    var   = gs.var()
+    med   = gs.median()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = np.sqrt(((n[:, 0] - 1) * var[:, 0] + (n[:, 1] - 1) * var[:, 1]) / (n.sum(axis=1) - 2))
+        out    = np.stack([
+            mean[:, 0] - mean[:, 1],
+            med[:, 0] - med[:, 1],
+            (mean[:, 0] - mean[:, 1]) / pooled,
+        ])
+    return out if np.ndim(counts_a) > 1 else out[:, 0]
+
+
+def _bootstrap_chunk(task) -> np.ndarray:
+    (counts_a, counts_b), size, seed = task
+    rng = np.random.default_rng(seed)
+    a   = rng.multinomial(counts_a.sum(), counts_a / counts_a.sum(), size=size)
+    b   = rng.multinomial(counts_b.sum(), counts_b / counts_b.sum(), size=size)
+    return diff_stats(a, b)
+
+
+def _permutation_chunk(task) -> np.ndarray:
+    (counts_a, counts_b), size, seed = task
+    rng    = np.random.default_rng(seed)
+    pooled = counts_a + counts_b
+    a      = rng.multivariate_hypergeometric(pooled, int(counts_a.sum()), size=size)
+    return diff_stats(a, pooled - a)
+
+
+def _seed_sequence(seed) -> np.random.SeedSequence:
+    """Seed (int, None hoặc SeedSequence) → SeedSequence để sinh seed con."""
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def _run_chunks(func, payload, n_resamples: int, seed, n_workers: int = None, executor=None) -> np.ndarray:
+    """
+    Chạy `func((payload, size, seed))` trên các khối lần lặp (tuần tự, trên
+    `executor` dùng chung, hoặc bằng process pool riêng) và nối kết quả theo
+    trục cuối.
+    """
+    sizes = [min(_CHUNK, n_resamples - s) for s in range(0, n_resamples, _CHUNK)]
+    seeds = _seed_sequence(seed).spawn(len(sizes))
+    tasks = [(payload, size, ss) for size, ss in zip(sizes, seeds)]
+
+    if executor is not None:
+        return np.concatenate(list(executor.map(func, tasks)), axis=-1)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(tasks)))
+    if n_workers == 1:
+        return np.concatenate([func(t) for t in tasks], axis=-1)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return np.concatenate(list(pool.map(func, tasks)), axis=-1)
+
+
+def _check_counts(counts_a, counts_b):
+    a = np.asarray(counts_a, dtype=np.int64)
+    b = np.asarray(counts_b, dtype=np.int64)
+    if a.ndim != 1 or a.shape != b.shape:
+        raise ValueError("counts_a và counts_b phải là vector đếm cùng số mức")
+    if a.sum() < 2 or b.sum() < 2:
+        raise ValueError("Mỗi nhóm phải có ít nhất 2 thí sinh.")
+    return a, b
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Bootstrap & hoán vị
+# ──────────────────────────────────────────────────────────────────────────────
+def bootstrap_diff(
+    counts_a,
+    counts_b,
+    n_resamples: int = 10_000,
+    confidence: float = 0.95,
+    seed=None,
+    n_workers: int = None,
+    executor=None,
+) -> pd.DataFrame:
+    """
+    Khoảng tin cậy bootstrap (phương pháp phân vị) cho chênh lệch mean,
+    median và Cohen's d giữa hai nhóm; mỗi nhóm được rút lại độc lập.
+
+    Args:
+        counts_a:    Vector đếm nhóm A (N_SCORE_LEVELS phần tử).
+        counts_b:    Vector đếm nhóm B.
+        n_resamples: Số lần lặp bootstrap.
+        confidence:  Mức tin cậy (vd: 0.95).
+        seed:        Seed (int hoặc None) — cùng seed cho cùng kết quả.
+        n_workers:   Số process (None = số CPU, 1 = tuần tự).
+        executor:    ProcessPoolExecutor dùng chung (bỏ qua n_workers).
+
+    Returns:
+        DataFrame index = RESAMPLE_STATS, cột estimate, se, ci_low, ci_high.
+    """
+    a, b = _check_counts(counts_a, counts_b)
+    reps = _run_chunks(_bootstrap_chunk, (a, b), n_resamples, seed, n_workers, executor)
+    tail = (1 - confidence) / 2
+    return pd.DataFrame({
+        "estimate": diff_stats(a, b),
+        "se":       np.nanstd(reps, axis=1, ddof=1),
+        "ci_low":   np.nanquantile(reps, tail, axis=1),
+        "ci_high":  np.nanquantile(reps, 1 - tail, axis=1),
+    }, index=list(RESAMPLE_STATS))
+
+
+def permutation_test(
+    counts_a,
+    counts_b,
+    n_resamples: int = 10_000,
+    alternative: str = "two-sided",
+    seed=None,
+    n_workers: int = None,
+    executor=None,
+) -> pd.Series:
+    """
+    P-value hoán vị (H₀: hai nhóm cùng phân phối) cho từng thống kê trong
+    RESAMPLE_STATS, tính như `scipy.stats.permutation_test`:
+    p một phía = (số lần thống kê hoán vị ≥ / ≤ quan sát + 1) / (n_resamples + 1),
+    p hai phía = min(2 · min(p_less, p_greater), 1).
+
+    Args:
+        counts_a:    Vector đếm nhóm A.
+        counts_b:    Vector đếm nhóm B.
+        n_resamples: Số lần hoán vị.
+        alternative: 'two-sided', 'greater' (A > B) hoặc 'less' (A < B).
+        seed:        Seed (int hoặc None).
+        n_workers:   Số process (None = số CPU, 1 = tuần tự).
+        executor:    ProcessPoolExecutor dùng chung (bỏ qua n_workers).
+
+    Returns:
+        Series index = RESAMPLE_STATS.
+    """
+    if alternative not in ("two-sided", "less", "greater"):
+        raise ValueError("alternative phải là 'two-sided', 'less' hoặc 'greater'")
+    a, b = _check_counts(counts_a, counts_b)
+    obs  = diff_stats(a, b)[:, None]
+    reps = _run_chunks(_permutation_chunk, (a, b), n_resamples, seed, n_workers, executor)
+
+    p_greater = ((reps >= obs - _EPS).sum(axis=1) + 1) / (n_resamples + 1)
+    p_less    = ((reps <= obs + _EPS).sum(axis=1) + 1) / (n_resamples + 1)
+    if alternative == "greater":
+        p = p_greater
+    elif alternative == "less":
+        p = p_less
+    else:
+        # Hai phía theo quy tắc của scipy: gấp đôi phía nhỏ hơn (không giả
+        # định phân phối hoán vị đối xứng quanh 0)
+        p = np.minimum(2 * np.minimum(p_less, p_greater), 1.0)
+    return pd.Series(p, index=list(RESAMPLE_STATS))
+
+
+def resample_two_groups(
+    counts_a,
+    counts_b,
+    n_resamples: int = 10_000,
+    confidence: float = 0.95,
+    seed=None,
+    n_workers: int = None,
+    executor=None,
+) -> dict:
+    """
+    Bootstrap CI và p-value hoán vị (hai phía) cho một cặp nhóm. Khi chạy
+    song song, bootstrap và hoán vị dùng chung một process pool (`executor`
+    nếu được truyền vào, nếu không thì mở một pool cho cả hai).
+
+    Returns:
+        dict gồm 'ci' (DataFrame của `bootstrap_diff`) và 'perm_p'
+        (Series của `permutation_test`).
+    """
+    boot_seed, perm_seed = _seed_sequence(seed).spawn(2)
+    if executor is None:
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, 2 * -(-n_resamples // _CHUNK)))
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                return resample_two_groups(counts_a, counts_b, n_resamples, confidence, seed, executor=pool)
+    return {
+        "ci":     bootstrap_diff(counts_a, counts_b, n_resamples, confidence, boot_seed, 1, executor),
+        "perm_p": permutation_test(counts_a, counts_b, n_resamples, "two-sided", perm_seed, 1, executor),
+    }
+
+
+def _pair_task(task) -> dict:
+    (counts_a, counts_b), n_resamples, confidence, seed = task
+    res = resample_two_groups(counts_a, counts_b, n_resamples, confidence, seed, n_workers=1)
+    row = {}
+    for stat in RESAMPLE_STATS:
+        row[stat]              = res["ci"].at[stat, "estimate"]
+        row[f"{stat}_ci_low"]  = res["ci"].at[stat, "ci_low"]
+        row[f"{stat}_ci_high"] = res["ci"].at[stat, "ci_high"]
+        row[f"{stat}_perm_p"]  = res["perm_p"][stat]
+    return row
+
+
+def resample_all_pairs(
+    df,
+    subject: str,
+    group_col: str = "tinh",
+    pairs: list = None,
+    n_resamples: int = 10_000,
+    confidence: float = 0.95,
+    seed=None,
+    n_workers: int = None,
+    index: GroupIndex = None,
+) -> pd.DataFrame:
+    """
+    Bootstrap CI + p-value hoán vị cho nhiều cặp nhóm của một môn; mỗi cặp
+    là một tác vụ trên process pool (các lần lặp trong cặp vẫn vector hoá).
+    Seed của từng cặp sinh từ `seed` theo thứ tự `pairs`.
+
+    Args:
+        df:          DataFrame điểm hoặc GroupStats theo group_col.
+        subject:     Cột điểm.
+        group_col:   Cột phân nhóm (bỏ qua nếu df là GroupStats).
+        pairs:       list (nhóm A, nhóm B); mặc định mọi cặp A < B có ≥ 2 thí sinh.
+        n_resamples: Số lần lặp cho mỗi cặp.
+        confidence:  Mức tin cậy của CI.
+        seed:        Seed (int hoặc None).
+        n_workers:   Số process (None = số CPU, 1 = tuần tự).
+        index:       GroupIndex của df (tuỳ chọn, dùng lại mã nhóm).
+
+    Returns:
+        DataFrame mỗi dòng một cặp: group_a, group_b và với mỗi thống kê s
+        trong RESAMPLE_STATS các cột s, s_ci_low, s_ci_high, s_perm_p.
+    """
+    gs = df if isinstance(df, GroupStats) else group_stats(df, group_col, index=index)
+    if pairs is None:
+        groups = [g for g in gs.groups if gs.group_counts(g, subject).sum() >= 2]
+        pairs  = [(a, b) for i, a in enumerate(groups) for b in groups[i + 1:]]
+
+    seeds = _seed_sequence(seed).spawn(len(pairs))
+    tasks = [
+        ((gs.group_counts(a, subject), gs.group_counts(b, subject)), n_resamples, confidence, ss)
+        for (a, b), ss in zip(pairs, seeds)
+    ]
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(tasks)))
+    if n_workers == 1:
+        rows = [_pair_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            rows = list(pool.map(_pair_task, tasks, chunksize=max(1, len(tasks) // (4 * n_workers))))
+
+    out = pd.DataFrame(rows)
+    out.insert(0, "group_b", [b for _, b in pairs])
+    out.insert(0, "group_a", [a for a, _ in pairs])
+    return out
@@ -0,0 +1,173 @@
+"""
+shared.py — Chia sẻ DataFrame điểm thi cho process con qua shared memory.
+
+Tiến trình chính ghi các cột (điểm, mã nhóm) một lần vào một khối
+`multiprocessing.shared_memory`; process con chỉ nhận một handle nhỏ và dựng
+lại DataFrame từ các view NumPy trỏ thẳng vào khối đó — không pickle, không
+sao chép dữ liệu.
+
+Ví dụ:
+    with share_frame(df, ["toan", "van", "tinh"]) as shared:
+        results = map_shared(per_subject_stats, shared, ["toan", "van"], n_workers=4)
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+from src.config import SCORE_COLS
+
+# Cột nhóm mặc định được chia sẻ cùng cột điểm (dạng mã số nguyên)
+GROUP_COLS = ["tinh", "tinh_moi", "ma_mon_ngoai_ngu"]
+
+# Căn lề mỗi cột trong khối shared memory
+_ALIGN = 8
+
+# Khối shared memory đang được process này gắn vào (giữ tham chiếu để view
+# NumPy không bị mất vùng nhớ khi object SharedMemory bị thu hồi)
+_ATTACHED = {}
+
+# DataFrame của process con trong `map_shared`
+_WORKER_FRAME = None
+
+
+class SharedFrameHandle(NamedTuple):
+    """Mô tả bố cục khối shared memory — đủ nhỏ để gửi sang process con."""
+    name:    str
+    n_rows:  int
+    columns: tuple   # (tên cột, dtype, offset, categories | None)
+    attrs:   dict
+
+
+class SharedFrame:
+    """
+    Chủ sở hữu khối shared memory (phía tiến trình chính). Dùng như context
+    manager để tự giải phóng khối khi xong việc.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, handle: SharedFrameHandle):
+        self.shm    = shm
+        self.handle = handle
+
+    def close(self) -> None:
+        """Đóng và huỷ khối shared memory."""
+        _ATTACHED.pop(self.handle.name, None)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _column_array(series: pd.Series):
+    """Trả về (mảng NumPy, categories | None) để ghi vào shared memory."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array.codes, list(series.cat.categories)
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.to_numpy(dtype=f"float{series.dtype.itemsize * 8}", na_value=np.nan), None
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(), None
+
+    # Cột chuỗi → mã số nguyên + danh mục
+    codes, uniques = pd.factorize(series, sort=True)
+    dtype = np.int8 if len(uniques) < 127 else np.int16 if len(uniques) < 32_767 else np.int32
+    return codes.astype(dtype), list(uniques)
+
+
+def share_frame(df: pd.DataFrame, columns: list = None) -> SharedFrame:
+    """
+    Ghi các cột của `df` vào một khối shared memory.
+
+    Cột số giữ nguyên dtype (kể cả mã uint8 của src.encoding), cột
+    categorical lưu mã số nguyên, cột chuỗi được mã hoá thành categorical.
+
+    Args:
+        df:      DataFrame nguồn.
+        columns: Cột cần chia sẻ (mặc định: cột điểm + cột nhóm có trong df).
+
+    Returns:
+        SharedFrame (nên dùng với `with`).
+    """
+    if columns is None:
+        columns = [c for c in SCORE_COLS + GROUP_COLS if c in df.columns]
+
+    arrays, layout, offset = [], [], 0
+    for col in columns:
+        arr, categories = _column_array(df[col])
+        arr    = np.ascontiguousarray(arr)
+        offset = -(-offset // _ALIGN) * _ALIGN
+        arrays.append((arr, offset))
+        layout.append((col, arr.dtype.str, offset, categories))
+        offset += arr.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for arr, start in arrays:
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=start)[:] = arr
+
+    attrs  = {k: v for k, v in df.attrs.items() if k == "score_scale"}
+    handle = SharedFrameHandle(shm.name, len(df), tuple(layout), attrs)
+    return SharedFrame(shm, handle)
+
+
+def attach_frame(handle: SharedFrameHandle) -> pd.DataFrame:
+    """
+    Dựng DataFrame (read-only, không sao chép) từ handle của `share_frame`.
+    Gọi được trong bất kỳ process nào trên cùng máy.
+    """
+    shm = _ATTACHED.get(handle.name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=handle.name)
+        _ATTACHED[handle.name] = shm
+
+    data = {}
+    for col, dtype, offset, categories in handle.columns:
+        arr = np.ndarray((handle.n_rows,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        arr.flags.writeable = False
+        if categories is not None:
+            arr = pd.Categorical.from_codes(
+                arr, dtype=pd.CategoricalDtype(categories), validate=False,
+            )
+        data[col] = arr
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs.update(handle.attrs)
+    return df
+
+
+def _attach_worker(handle: SharedFrameHandle) -> None:
+    global _WORKER_FRAME
+    _WORKER_FRAME = attach_frame(handle)
+
+
+def _run_task(task):
+    func, item = task
+    return func(_WORKER_FRAME, item)
+
+
+def map_shared(func, shared: SharedFrame, items: list, n_workers: int = None) -> list:
+    """
+    Chạy `func(df, item)` cho từng item trên process pool; mỗi process gắn vào
+    khối shared memory đúng một lần, chi phí bộ nhớ O(1) mỗi process.
+
+    Args:
+        func:      Hàm cấp module (pickle được), nhận (DataFrame, item).
+        shared:    SharedFrame từ `share_frame`.
+        items:     Danh sách tham số (vd: danh sách môn, cặp tỉnh...).
+        n_workers: Số process (None = số CPU).
+
+    Returns:
+        list kết quả theo đúng thứ tự `items`.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_attach_worker,
+        initargs=(shared.handle,),
+    ) as pool:
+        return list(pool.map(_run_task, [(func, item) for item in items]))
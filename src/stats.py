@@ -3,12 +3,89 @@ stats.py — Hàm kiểm định thống kê dùng chung.
 """
 
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats as scipy_stats
 import os
 
 from src.config import OUTPUT_DIR
+from src.aggregate import GroupIndex, GroupStats, group_stats
+from src.cube import SCORE_VALUES, ScoreCube, boxplot_stats_from_counts
+from src.plotting import ChartJob, RenderQueue, _submit
+from src.ranktests import mannwhitneyu_counts, ks_2samp_counts
+from src.resampling import resample_two_groups
+
+
+def _plot_two_groups(
+    counts_a: np.ndarray,
+    counts_b: np.ndarray,
+    group_a: str,
+    group_b: str,
+    mean_a: float,
+    mean_b: float,
+    subject_label: str,
+    test_name: str,
+    t_p: float,
+    alpha: float,
+    save_path: str,
+) -> None:
+    """
+    Histogram (mật độ) + box plot hai nhóm, vẽ thẳng từ vector đếm: histogram
+    dùng trọng số trên các mức điểm, box plot dùng thống kê suy ra từ vector
+    đếm (`Axes.bxp`) — không dựng lại mẫu điểm.
+    """
+    n_a, n_b = int(counts_a.sum()), int(counts_b.sum())
+
+    bins    = np.arange(0, 10.5, 0.5)
+    color_a = "#3498db"
+    color_b = "#e74c3c"
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Histogram
+    axes[0].hist(SCORE_VALUES, bins=bins, weights=counts_a, alpha=0.6, color=color_a, density=True,
+                 label=f"{group_a} (n={n_a:,}, μ={mean_a:.3f})")
+    axes[0].hist(SCORE_VALUES, bins=bins, weights=counts_b, alpha=0.6, color=color_b, density=True,
+                 label=f"{group_b} (n={n_b:,}, μ={mean_b:.3f})")
+    axes[0].axvline(mean_a, color=color_a, linestyle="--", linewidth=1.8)
+    axes[0].axvline(mean_b, color=color_b, linestyle="--", linewidth=1.8)
+    axes[0].set_title(f"Phân bố điểm {subject_label} (normalized)",
+                      fontsize=13, fontweight="bold")
+    axes[0].set_xlabel(f"Điểm {subject_label}")
+    axes[0].set_ylabel("Mật độ")
+    axes[0].legend(fontsize=11)
+    sns.despine(ax=axes[0])
+
+    # Box plot
+    box_stats = [boxplot_stats_from_counts(counts_a, label=group_a),
+                 boxplot_stats_from_counts(counts_b, label=group_b)]
+    bp = axes[1].bxp(
+        box_stats, patch_artist=True,
+        medianprops=dict(color="black", linewidth=2), widths=0.5,
+    )
+    for patch, color in zip(bp["boxes"], [color_a, color_b]):
+        patch.set_facecolor(color)
+        patch.set_alpha(0.6)
+    for i, (st, color) in enumerate(zip(box_stats, [color_a, color_b]), start=1):
+        axes[1].scatter(i, st["mean"], marker="D", color=color, s=60, zorder=5,
+                        label=f"Mean {st['label']}: {st['mean']:.3f}")
+
+    sig_label = "***" if t_p < 0.001 else "**" if t_p < 0.01 else "*" if t_p < alpha else "ns"
+    sig_text  = f"{test_name}'s t-test\np = {t_p:.2e}\n{sig_label}"
+    axes[1].text(0.97, 0.97, sig_text, transform=axes[1].transAxes,
+                 ha="right", va="top", fontsize=11,
+                 bbox=dict(facecolor="white", edgecolor="gray", alpha=0.85))
+    axes[1].set_title(f"Box plot điểm {subject_label}", fontsize=13, fontweight="bold")
+    axes[1].set_ylabel(f"Điểm {subject_label}")
+    axes[1].legend(fontsize=10, loc="lower right")
+    sns.despine(ax=axes[1])
+
+    plt.suptitle(f"So sánh điểm {subject_label}: {group_a} vs {group_b}",
+                 fontsize=14, fontweight="bold", y=1.02)
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=120, bbox_inches="tight")
+    plt.close(fig)
 
 
 def compare_two_groups(
@@ -20,6 +97,12 @@ def compare_two_groups(
     group_col: str = "tinh",
     alpha: float = 0.05,
     output_dir: str = OUTPUT_DIR,
+    n_resamples: int = 0,
+    seed: int = 42,
+    n_workers: int = 1,
+    executor=None,
+    index: GroupIndex = None,
+    queue: RenderQueue = None,
 ) -> dict:
     """
     So sánh điểm hai nhóm (tỉnh) bằng:
@@ -27,29 +110,53 @@ def compare_two_groups(
       - Welch's / Student's t-test (two-sided)
       - Cohen's d (effect size)
       - Mann-Whitney U test (phi tham số)
+      - Kolmogorov–Smirnov hai mẫu (so sánh toàn bộ phân phối)
+      - Bootstrap CI cho chênh lệch mean / median / Cohen's d và p-value
+        hoán vị (src.resampling, lặp trên histogram) — chỉ khi n_resamples > 0
     Vẽ histogram + box plot so sánh và lưu PNG.
 
+    Hai kiểm định hạng được tính trực tiếp từ histogram điểm của hai nhóm
+    (src.ranktests), cho kết quả giống scipy mà không cần sắp xếp mẫu gộp.
+
     Args:
-        df:            DataFrame đã load từ Parquet.
+        df:            DataFrame đã load từ Parquet, GroupStats (src.aggregate)
+                       theo group_col, hoặc ScoreCube (src.cube).
         subject_col:   Tên cột điểm (vd: 'toan').
         subject_label: Tên hiển thị (vd: 'Toán').
         group_a:       Giá trị nhóm A trong group_col (vd: 'Quảng Nam').
         group_b:       Giá trị nhóm B trong group_col (vd: 'Đà Nẵng').
-        group_col:     Cột phân nhóm (mặc định 'tinh').
+        group_col:     Cột phân nhóm (mặc định 'tinh'; bỏ qua nếu df là GroupStats).
         alpha:         Mức ý nghĩa (mặc định 0.05).
         output_dir:    Thư mục lưu ảnh.
+        n_resamples:   Số lần lặp bootstrap / hoán vị (mặc định 0 = bỏ qua).
+        seed:          Seed cho bootstrap / hoán vị.
+        n_workers:     Số process cho bootstrap / hoán vị (1 = tuần tự, None = số CPU).
+        executor:      ProcessPoolExecutor dùng chung khi so sánh nhiều cặp
+                       (bỏ qua n_workers, không mở pool mới cho mỗi cặp).
+        index:         GroupIndex của df — chỉ đọc dòng của hai nhóm, không
+                       quét cả df (dùng khi so sánh nhiều cặp trên cùng df).
+        queue:         RenderQueue (src.plotting, tuỳ chọn): đưa biểu đồ vào
+                       hàng đợi thay vì vẽ ngay.
 
     Returns:
         dict chứa các giá trị thống kê chính.
     """
     os.makedirs(output_dir, exist_ok=True)
+    if isinstance(df, GroupStats):
+        gs = df
+    elif index is not None and not isinstance(df, ScoreCube):
+        gs = GroupStats.from_index(df, index, group_col, [group_a, group_b], [subject_col])
+    else:
+        gs = group_stats(df, group_col)
 
-    scores_a = df[df[group_col] == group_a][subject_col].dropna().values
-    scores_b = df[df[group_col] == group_b][subject_col].dropna().values
-
-    n_a, n_b     = len(scores_a), len(scores_b)
-    mean_a, mean_b = scores_a.mean(), scores_b.mean()
-    std_a,  std_b  = scores_a.std(ddof=1), scores_b.std(ddof=1)
+    # Chỉ giữ histogram của hai nhóm; mọi kiểm định dưới đây tính từ đó
+    pair           = GroupStats([group_a, group_b], [subject_col],
+                                np.stack([gs.group_counts(group_a, subject_col),
+                                          gs.group_counts(group_b, subject_col)])[:, None, :],
+                                gs.group_col)
+    n_a, n_b       = (int(v) for v in pair.n[:, 0])
+    mean_a, mean_b = pair.mean()[:, 0]
+    std_a,  std_b  = pair.std()[:, 0]
 
     print("=" * 60)
     print(f"  So sánh điểm {subject_label}: {group_a} vs {group_b}")
@@ -60,15 +167,17 @@ def compare_two_groups(
     print(f"  {group_b:<22} {n_b:>8,} {mean_b:>9.4f} {std_b:>9.4f}")
     print(f"  {'Chênh lệch ĐTB':<22} {'':>8} {abs(mean_a - mean_b):>9.4f}")
 
-    # Levene's test
-    lev_stat, lev_p = scipy_stats.levene(scores_a, scores_b)
+    # Levene's test (Brown–Forsythe, như mặc định scipy) từ độ lệch so với median
+    z_mean, z_ss    = (a[:, 0] for a in _deviation_stats(pair))
+    lev_stat, lev_p = (float(v) for v in _brown_forsythe(n_a, n_b, z_mean[0], z_mean[1], z_ss[0], z_ss[1]))
     equal_var        = lev_p > alpha
     print(f"\n── Levene's test (phương sai đồng nhất)")
     print(f"   Statistic = {lev_stat:.4f},  p-value = {lev_p:.4e}")
     print(f"   → {'Phương sai BẰNG NHAU (p > 0.05)' if equal_var else 'Phương sai KHÁC NHAU (p ≤ 0.05)'}")
 
     # Welch's / Student's t-test
-    t_stat, t_p = scipy_stats.ttest_ind(scores_a, scores_b, equal_var=equal_var)
+    t_stat, t_p = scipy_stats.ttest_ind_from_stats(mean_a, std_a, n_a, mean_b, std_b, n_b,
+                                                   equal_var=equal_var)
     test_name   = "Student" if equal_var else "Welch"
     print(f"\n── {test_name}'s t-test (H₀: μ₁ = μ₂, hai phía)")
     print(f"   t-statistic = {t_stat:.4f},  p-value = {t_p:.4e}")
@@ -92,66 +201,43 @@ def compare_two_groups(
     print(f"\n── Effect size: Cohen's d = {cohens_d:.4f}  →  {magnitude}")
 
     # Mann-Whitney U
-    u_stat, u_p = scipy_stats.mannwhitneyu(scores_a, scores_b, alternative="two-sided")
+    counts_a, counts_b = pair.counts[0, 0], pair.counts[1, 0]
+    u_stat, u_p = mannwhitneyu_counts(counts_a, counts_b, alternative="two-sided")
     print(f"\n── Mann-Whitney U test (phi tham số)")
     print(f"   U = {u_stat:.0f},  p-value = {u_p:.4e}")
     print(f"   → {'BÁC BỎ H₀' if u_p < alpha else 'KHÔNG đủ bằng chứng bác bỏ H₀'} (α = {alpha})")
 
-    # ── Biểu đồ so sánh ──────────────────────────────────────────────────────
-    bins    = np.arange(0, 10.5, 0.5)
-    color_a = "#3498db"
-    color_b = "#e74c3c"
-
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    # Kolmogorov–Smirnov
+    ks_stat, ks_p = ks_2samp_counts(counts_a, counts_b)
+    print(f"\n── Kolmogorov–Smirnov test (hai mẫu)")
+    print(f"   D = {ks_stat:.4f},  p-value = {ks_p:.4e}")
+    print(f"   → {'Phân phối KHÁC NHAU' if ks_p < alpha else 'KHÔNG đủ bằng chứng phân phối khác nhau'} (α = {alpha})")
 
-    # Histogram
-    axes[0].hist(scores_a, bins=bins, alpha=0.6, color=color_a, density=True,
-                 label=f"{group_a} (n={n_a:,}, μ={mean_a:.3f})")
-    axes[0].hist(scores_b, bins=bins, alpha=0.6, color=color_b, density=True,
-                 label=f"{group_b} (n={n_b:,}, μ={mean_b:.3f})")
-    axes[0].axvline(mean_a, color=color_a, linestyle="--", linewidth=1.8)
-    axes[0].axvline(mean_b, color=color_b, linestyle="--", linewidth=1.8)
-    axes[0].set_title(f"Phân bố điểm {subject_label} (normalized)",
-                      fontsize=13, fontweight="bold")
-    axes[0].set_xlabel(f"Điểm {subject_label}")
-    axes[0].set_ylabel("Mật độ")
-    axes[0].legend(fontsize=11)
-    sns.despine(ax=axes[0])
+    # Bootstrap & hoán vị
+    resampled = {}
+    if n_resamples:
+        res = resample_two_groups(counts_a, counts_b, n_resamples, 1 - alpha, seed, n_workers, executor)
+        ci, perm_p = res["ci"], res["perm_p"]
+        print(f"\n── Bootstrap CI {1 - alpha:.0%} & kiểm định hoán vị ({n_resamples:,} lần lặp)")
+        for stat, label in [("mean_diff", "Chênh lệch mean"), ("median_diff", "Chênh lệch median"),
+                            ("cohens_d", "Cohen's d")]:
+            print(f"   {label:<18} = {ci.at[stat, 'estimate']:>8.4f}"
+                  f"  CI [{ci.at[stat, 'ci_low']:.4f}, {ci.at[stat, 'ci_high']:.4f}]"
+                  f"  p_perm = {perm_p[stat]:.4e}")
+            resampled[f"{stat}_ci"]     = (ci.at[stat, "ci_low"], ci.at[stat, "ci_high"])
+            resampled[f"{stat}_perm_p"] = perm_p[stat]
 
-    # Box plot
-    data_box   = [scores_a, scores_b]
-    labels_box = [group_a, group_b]
-    bp = axes[1].boxplot(
-        data_box, labels=labels_box, patch_artist=True,
-        medianprops=dict(color="black", linewidth=2), widths=0.5,
+    # ── Biểu đồ so sánh ──────────────────────────────────────────────────────
+    safe_a = group_a.replace(" ", "_").replace(".", "")
+    safe_b = group_b.replace(" ", "_").replace(".", "")
+    job    = ChartJob(
+        os.path.join(output_dir, f"hypothesis_{subject_col}_{safe_a}_{safe_b}.png"),
+        _plot_two_groups,
+        dict(counts_a=counts_a, counts_b=counts_b, group_a=group_a, group_b=group_b,
+             mean_a=mean_a, mean_b=mean_b, subject_label=subject_label,
+             test_name=test_name, t_p=t_p, alpha=alpha),
     )
-    for patch, color in zip(bp["boxes"], [color_a, color_b]):
-        patch.set_facecolor(color)
-        patch.set_alpha(0.6)
-    for i, (sc, color) in enumerate(zip(data_box, [color_a, color_b]), start=1):
-        axes[1].scatter(i, sc.mean(), marker="D", color=color, s=60, zorder=5,
-                        label=f"Mean {labels_box[i-1]}: {sc.mean():.3f}")
-
-    sig_label = "***" if t_p < 0.001 else "**" if t_p < 0.01 else "*" if t_p < alpha else "ns"
-    sig_text  = f"{test_name}'s t-test\np = {t_p:.2e}\n{sig_label}"
-    axes[1].text(0.97, 0.97, sig_text, transform=axes[1].transAxes,
-                 ha="right", va="top", fontsize=11,
-                 bbox=dict(facecolor="white", edgecolor="gray", alpha=0.85))
-    axes[1].set_title(f"Box plot điểm {subject_label}", fontsize=13, fontweight="bold")
-    axes[1].set_ylabel(f"Điểm {subject_label}")
-    axes[1].legend(fontsize=10, loc="lower right")
-    sns.despine(ax=axes[1])
-
-    plt.suptitle(f"So sánh điểm {subject_label}: {group_a} vs {group_b}",
-                 fontsize=14, fontweight="bold", y=1.02)
-    plt.tight_layout()
-
-    safe_a    = group_a.replace(" ", "_").replace(".", "")
-    safe_b    = group_b.replace(" ", "_").replace(".", "")
-    save_path = os.path.join(output_dir, f"hypothesis_{subject_col}_{safe_a}_{safe_b}.png")
-    plt.savefig(save_path, dpi=120, bbox_inches="tight")
-    plt.close(fig)
-    print(f"\nSaved: {os.path.basename(save_path)}")
+    _submit(job, queue)
 
     return {
         "group_a": group_a, "group_b": group_b,
@@ -162,5 +248,187 @@ def compare_two_groups(
         "t_stat": t_stat, "t_p": t_p,
         "cohens_d": cohens_d,
         "u_stat": u_stat, "u_p": u_p,
+        "ks_stat": ks_stat, "ks_p": ks_p,
+        **resampled,
         "reject_h0": reject,
     }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# So sánh mọi cặp nhóm (không quét lại dữ liệu thô)
+# ──────────────────────────────────────────────────────────────────────────────
+def _deviation_stats(gs: GroupStats):
+    """
+    Thống kê cho Levene/Brown–Forsythe từ histogram: với z = |x - median|
+    của từng nhóm, trả về (mean z, Σ(z - mean z)²) dạng [nhóm, môn].
+    """
+    n   = gs.n
+    dev = np.abs(SCORE_VALUES[None, None, :] - np.nan_to_num(gs.median())[..., None])
+    s1  = (gs.counts * dev).sum(axis=-1)
+    s2  = (gs.counts * dev * dev).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_mean = s1 / n
+    return z_mean, s2 - n * np.nan_to_num(z_mean) ** 2
+
+
+def _brown_forsythe(na, nb, z_mean_a, z_mean_b, z_ss_a, z_ss_b):
+    """
+    Levene (Brown–Forsythe) cho k = 2 nhóm từ thống kê của `_deviation_stats`;
+    nhận số hoặc mảng cùng shape. Trả về (statistic, p-value).
+    """
+    N        = na + nb
+    z_all    = (na * z_mean_a + nb * z_mean_b) / N
+    between  = na * (z_mean_a - z_all) ** 2 + nb * (z_mean_b - z_all) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lev_stat = (N - 2) * between / (z_ss_a + z_ss_b)
+    return lev_stat, scipy_stats.f.sf(lev_stat, 1, N - 2)
+
+
+def compare_all_pairs(
+    df,
+    group_col: str = "tinh",
+    subjects: list = None,
+    alpha: float = 0.05,
+    plot: bool = False,
+    output_dir: str = OUTPUT_DIR,
+    index: GroupIndex = None,
+    queue: RenderQueue = None,
+):
+    """
+    So sánh mọi cặp nhóm (vd: 63 tỉnh cũ hoặc các tỉnh mới) trên mọi môn,
+    tính vector hoá từ n/mean/var/median của từng nhóm:
+      - Welch's t-test (two-sided)
+      - Levene's test, biến thể Brown–Forsythe (tâm = median, như mặc định scipy)
+      - Cohen's d (pooled std, như compare_two_groups)
+      - p-value hiệu chỉnh FDR (Benjamini–Hochberg) trong từng môn
+
+    Args:
+        df:         DataFrame đã load từ Parquet, GroupStats theo group_col, hoặc ScoreCube.
+        group_col:  Cột phân nhóm (bỏ qua nếu df là GroupStats).
+        subjects:   Danh sách môn (mặc định: mọi môn có dữ liệu).
+        alpha:      Mức ý nghĩa cho cột reject_h0 (theo p-value FDR).
+        plot:       Vẽ heatmap Cohen's d (ô không có ý nghĩa để trống) cho từng môn.
+        output_dir: Thư mục lưu ảnh khi plot=True.
+        index:      GroupIndex của df (tuỳ chọn, dùng lại mã nhóm).
+        queue:      RenderQueue (src.plotting, tuỳ chọn) cho các heatmap khi plot=True.
+
+    Returns:
+        DataFrame dạng tidy, mỗi dòng một (môn, cặp nhóm A < B) với cột
+        subject, group_a, group_b, n_a, n_b, mean_a, mean_b, std_a, std_b,
+        t_stat, t_df, t_p, t_p_fdr, levene_stat, levene_p, levene_p_fdr,
+        cohens_d, reject_h0.
+    """
+    gs        = df if isinstance(df, GroupStats) else group_stats(df, group_col, index=index)
+    group_col = gs.group_col
+    subjects  = subjects or [s for s in gs.subjects if gs.n[:, gs.subjects.index(s)].sum() > 0]
+    j         = [gs.subjects.index(s) for s in subjects]
+
+    # Thống kê từng nhóm: [môn, nhóm]
+    n            = gs.n[:, j].T.astype("float64")
+    mean, var    = gs.mean()[:, j].T, gs.var()[:, j].T
+    z_mean, z_ss = (a[:, j].T for a in _deviation_stats(gs))
+
+    # Mọi cặp A < B trong các nhóm có ≥ 2 thí sinh (theo từng môn)
+    ia, ib = np.triu_indices(len(gs.groups), k=1)
+    na, nb = n[:, ia], n[:, ib]
+    valid  = (na >= 2) & (nb >= 2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Welch's t-test
+        se2_a, se2_b = var[:, ia] / na, var[:, ib] / nb
+        t_stat = (mean[:, ia] - mean[:, ib]) / np.sqrt(se2_a + se2_b)
+        t_df   = (se2_a + se2_b) ** 2 / (se2_a ** 2 / (na - 1) + se2_b ** 2 / (nb - 1))
+        t_p    = 2 * scipy_stats.t.sf(np.abs(t_stat), t_df)
+
+        # Levene (Brown–Forsythe), k = 2 nhóm
+        N               = na + nb
+        lev_stat, lev_p = _brown_forsythe(na, nb, z_mean[:, ia], z_mean[:, ib], z_ss[:, ia], z_ss[:, ib])
+
+        # Cohen's d
+        pooled   = np.sqrt(((na - 1) * var[:, ia] + (nb - 1) * var[:, ib]) / (N - 2))
+        cohens_d = (mean[:, ia] - mean[:, ib]) / pooled
+
+    # FDR theo từng môn, chỉ trên các cặp hợp lệ
+    t_fdr, lev_fdr = np.full(t_p.shape, np.nan), np.full(lev_p.shape, np.nan)
+    for s in range(len(subjects)):
+        ok = valid[s] & ~np.isnan(t_p[s])
+        if ok.any():
+            t_fdr[s, ok] = scipy_stats.false_discovery_control(t_p[s, ok])
+        ok = valid[s] & ~np.isnan(lev_p[s])
+        if ok.any():
+            lev_fdr[s, ok] = scipy_stats.false_discovery_control(lev_p[s, ok])
+
+    s_idx, p_idx = np.nonzero(valid)
+    groups = np.array(gs.groups, dtype=object)
+    result = pd.DataFrame({
+        "subject":      np.array(subjects, dtype=object)[s_idx],
+        "group_a":      groups[ia[p_idx]],
+        "group_b":      groups[ib[p_idx]],
+        "n_a":          na[s_idx, p_idx].astype(np.int64),
+        "n_b":          nb[s_idx, p_idx].astype(np.int64),
+        "mean_a":       mean[:, ia][s_idx, p_idx],
+        "mean_b":       mean[:, ib][s_idx, p_idx],
+        "std_a":        np.sqrt(var[:, ia][s_idx, p_idx]),
+        "std_b":        np.sqrt(var[:, ib][s_idx, p_idx]),
+        "t_stat":       t_stat[s_idx, p_idx],
+        "t_df":         t_df[s_idx, p_idx],
+        "t_p":          t_p[s_idx, p_idx],
+        "t_p_fdr":      t_fdr[s_idx, p_idx],
+        "levene_stat":  lev_stat[s_idx, p_idx],
+        "levene_p":     lev_p[s_idx, p_idx],
+        "levene_p_fdr": lev_fdr[s_idx, p_idx],
+        "cohens_d":     cohens_d[s_idx, p_idx],
+    })
+    result["reject_h0"] = result["t_p_fdr"] < alpha
+
+    if plot:
+        os.makedirs(output_dir, exist_ok=True)
+        for subject in subjects:
+            job = ChartJob(
+                os.path.join(output_dir, f"pairwise_{subject}_{group_col}.png"),
+                _plot_pair_matrix,
+                dict(d=pair_matrix(result, subject, "cohens_d"),
+                     sig=pair_matrix(result, subject, "t_p_fdr") < alpha,
+                     subject=subject, group_col=group_col, alpha=alpha),
+            )
+            _submit(job, queue)
+    return result
+
+
+def pair_matrix(result, subject: str, value: str = "cohens_d"):
+    """
+    Chuyển kết quả `compare_all_pairs` của một môn thành ma trận vuông
+    nhóm × nhóm (đối xứng; Cohen's d / t đổi dấu ở nửa dưới).
+
+    Args:
+        result:  DataFrame từ `compare_all_pairs`.
+        subject: Cột điểm.
+        value:   Cột giá trị (vd: 'cohens_d', 't_p_fdr', 'levene_p').
+    """
+    sub    = result[result["subject"] == subject]
+    groups = list(dict.fromkeys(list(sub["group_a"]) + list(sub["group_b"])))
+    pos    = {g: i for i, g in enumerate(groups)}
+    mat    = np.full((len(groups), len(groups)), np.nan)
+    a, b   = sub["group_a"].map(pos).to_numpy(), sub["group_b"].map(pos).to_numpy()
+    sign   = -1.0 if value in ("cohens_d", "t_stat") else 1.0
+    mat[a, b] = sub[value].to_numpy()
+    mat[b, a] = sign * sub[value].to_numpy()
+    return pd.DataFrame(mat, index=groups, columns=groups)
+
+
+def _plot_pair_matrix(d: pd.DataFrame, sig: pd.DataFrame, subject: str, group_col: str,
+                      alpha: float, save_path: str) -> None:
+    """Heatmap Cohen's d giữa mọi cặp nhóm, chỉ tô các cặp có ý nghĩa (FDR)."""
+    size = max(8, 0.18 * len(d))
+
+    fig, ax = plt.subplots(figsize=(size, size * 0.85))
+    lim  = np.nanmax(np.abs(d.values)) if d.notna().any().any() else 1.0
+    sns.heatmap(d.where(sig), cmap="RdBu_r", center=0, vmin=-lim, vmax=lim, ax=ax,
+                cbar_kws={"label": "Cohen's d (hàng − cột)"},
+                xticklabels=True, yticklabels=True)
+    ax.tick_params(labelsize=6)
+    ax.set_title(f"Cohen's d giữa các cặp {group_col} – {subject} (FDR < {alpha})",
+                 fontsize=13, fontweight="bold")
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=120, bbox_inches="tight")
+    plt.close(fig)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from src.admission import AdmissionSimulator
+from src.blocks import block_totals
+from src.config import PROVINCE_CODES
+
+
+def test_cutoff_batch_matches_sorted_totals():
+    rng = np.random.default_rng(0)
+    n   = 2000
+    df  = pd.DataFrame({
+        "sobaodanh": [f"{PROVINCE_CODES[i % 2]}{i:06d}" for i in range(n)],
+        **{c: np.round(rng.uniform(0, 10, n) * 4) / 4 for c in ["toan", "li", "hoa"]},
+    })
+    sim    = AdmissionSimulator.from_frame(df, ["A00"])
+    totals = np.sort(block_totals(df, ["A00"])["A00"].to_numpy("float64"))[::-1]
+    quotas = np.arange(1, n + 50, 37)
+
+    res = sim.cutoff_batch("A00", quotas)
+    expected = totals[np.minimum(quotas, n) - 1]
+    np.testing.assert_allclose(res.cutoff, expected)
+    np.testing.assert_array_equal(res.admitted, [(totals >= c - 1e-6).sum() for c in expected])
+    np.testing.assert_array_equal(res.above, [(totals > c + 1e-6).sum() for c in expected])
+    np.testing.assert_array_equal(sim.count_batch("A00", res.cutoff), res.admitted)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregate import GroupStats, group_index, group_stats, group_stats_many
+from src.config import PROVINCE_NAMES
+from src.encoding import encode_scores
+
+SUBJECTS = ["toan", "li", "hoa"]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    n   = 3000
+    df  = pd.DataFrame({"tinh": pd.Categorical([PROVINCE_NAMES[i % 7] for i in range(n)], categories=PROVINCE_NAMES)})
+    for col in SUBJECTS:
+        values = np.round(np.clip(rng.gamma(4, 1.5, n), 0, 10) * 20) / 20
+        values[rng.random(n) < 0.25] = np.nan
+        df[col] = values
+    return df
+
+
+def test_table_matches_groupby(frame):
+    gs      = GroupStats.from_frame(frame, "tinh", batch_rows=700)
+    got     = gs.table(SUBJECTS, ("n", "mean", "std", "skew", "kurt"))
+    grouped = frame.groupby("tinh", observed=True)
+    for s in SUBJECTS:
+        np.testing.assert_array_equal(got[f"n_{s}"], grouped[s].count())
+        np.testing.assert_allclose(got[f"mean_{s}"], grouped[s].mean(), rtol=1e-9)
+        np.testing.assert_allclose(got[f"std_{s}"], grouped[s].std(), rtol=1e-9)
+        np.testing.assert_allclose(got[f"skew_{s}"], grouped[s].skew(), rtol=1e-7)
+        np.testing.assert_allclose(got[f"kurt_{s}"], grouped[s].apply(pd.Series.kurt), rtol=1e-7)
+    assert list(got["tinh"]) == list(grouped.groups)
+
+
+def test_describe_and_quantiles_match_pandas(frame):
+    gs       = group_stats(frame)
+    expected = frame[SUBJECTS].describe().T
+    got      = gs.describe()
+    pd.testing.assert_frame_equal(got.loc[SUBJECTS, expected.columns], expected, rtol=1e-9)
+    np.testing.assert_allclose(gs.quantile(0.9)[0], frame[SUBJECTS].quantile(0.9), rtol=1e-9)
+
+
+def test_complete_keeps_only_candidates_with_every_subject(frame):
+    gs       = group_stats(frame, "tinh", SUBJECTS, complete=True)
+    complete = frame.dropna(subset=SUBJECTS)
+    np.testing.assert_array_equal(gs.n[:, 0], complete.groupby("tinh", observed=False).size())
+    assert (gs.n == gs.n[:, :1]).all()
+
+
+def test_group_stats_many_and_cache_share_one_scan(frame):
+    df       = frame.copy()
+    requests = [("tinh", None, False), ("tinh", SUBJECTS[:2], True), (None, None, False)]
+    many     = group_stats_many(df, requests, batch_rows=500)
+    for gs, (group_col, subjects, complete) in zip(many, requests):
+        assert gs is group_stats(df, group_col, subjects, complete)
+        direct = GroupStats.from_frame(df, group_col, subjects if complete else None, complete)
+        np.testing.assert_array_equal(gs.counts, direct.counts)
+
+
+def test_compact_input_gives_same_histograms(frame):
+    np.testing.assert_array_equal(
+        GroupStats.from_frame(encode_scores(frame), "tinh").counts,
+        GroupStats.from_frame(frame, "tinh").counts,
+    )
+
+
+def test_sample_is_the_sorted_group_scores(frame):
+    gs = group_stats(frame, "tinh")
+    g  = PROVINCE_NAMES[3]
+    np.testing.assert_allclose(gs.sample(g, "toan"), np.sort(frame.loc[frame["tinh"] == g, "toan"].dropna()), atol=1e-6)
+
+
+def test_group_index_rows_match_boolean_masks(frame):
+    df = frame.assign(tinh_moi=frame["tinh"].astype("string").where(np.arange(len(frame)) % 11 > 0))
+    gi = group_index(df, ["tinh", "tinh_moi"])
+    assert gi is group_index(df, ["tinh", "tinh_moi"])
+
+    for col in gi.columns:
+        for g in gi.groups(col):
+            np.testing.assert_array_equal(gi.rows(col, g), np.flatnonzero((df[col] == g).fillna(False)))
+        assert gi.sizes(col).sum() == df[col].notna().sum()
+    pd.testing.assert_frame_equal(gi.take(df, "tinh", PROVINCE_NAMES[2], ["toan"]),
+                                  df.loc[df["tinh"] == PROVINCE_NAMES[2], ["toan"]])
+    with pytest.raises(ValueError):
+        gi.take(df.iloc[1:], "tinh", PROVINCE_NAMES[2])
+
+
+def test_from_index_matches_full_scan(frame):
+    gi     = group_index(frame, ["tinh"])
+    groups = [PROVINCE_NAMES[5], PROVINCE_NAMES[1]]
+    part   = GroupStats.from_index(frame, gi, "tinh", groups, SUBJECTS)
+    full   = GroupStats.from_frame(frame, "tinh", SUBJECTS)
+    for g in groups:
+        for s in SUBJECTS:
+            np.testing.assert_array_equal(part.group_counts(g, s), full.group_counts(g, s))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.blocks import BlockCube, block_totals
+from src.config import PROVINCE_CODES
+from src.encoding import encode_scores
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    n   = 1500
+    df  = pd.DataFrame({"sobaodanh": [f"{PROVINCE_CODES[i % 4]}{i:06d}" for i in range(n)]})
+    for col in ["toan", "li", "hoa", "van", "ngoai_ngu"]:
+        values = np.round(rng.uniform(0, 10, n) * 20) / 20
+        values[rng.random(n) < 0.2] = np.nan
+        df[col] = values
+    df["ma_mon_ngoai_ngu"] = rng.choice(["N1", "N3", None], n)
+    return df
+
+
+def test_block_totals_match_pandas(frame):
+    totals   = block_totals(frame, ["A00", "A01", "D01"], batch_rows=400)
+    english  = frame["ngoai_ngu"].where(frame["ma_mon_ngoai_ngu"] == "N1")
+    expected = pd.DataFrame({
+        "A00": frame["toan"] + frame["li"] + frame["hoa"],
+        "A01": frame["toan"] + frame["li"] + english,
+        "D01": frame["toan"] + frame["van"] + english,
+    })
+    pd.testing.assert_frame_equal(totals, expected.astype("float32"), atol=1e-4)
+
+
+def test_weighted_block_and_compact_input(frame):
+    spec   = {"A00x2": {"toan": 2, "li": 1, "hoa": 1}}
+    totals = block_totals(encode_scores(frame), spec)["A00x2"]
+    np.testing.assert_allclose(totals, 2 * frame["toan"] + frame["li"] + frame["hoa"], atol=1e-4)
+
+    cube = BlockCube.from_frame(frame, spec, batch_rows=400)
+    assert cube.counts.shape[-1] == 4 * 200 + 1
+    assert cube.block_counts("A00x2").sum() == totals.notna().sum()
+
+
+def test_top_thresholds_match_sorted_totals(frame):
+    cube   = BlockCube.from_frame(frame, ["A00"])
+    totals = np.sort(block_totals(frame, ["A00"])["A00"].dropna().to_numpy())[::-1]
+    top    = cube.top_thresholds(50).loc["A00"]
+    assert top["threshold"] == pytest.approx(totals[49], abs=1e-4)
+    assert top["n_at_or_above"] == (totals >= totals[49] - 1e-4).sum()
+
+
+def test_unknown_block_is_rejected():
+    with pytest.raises(ValueError):
+        block_totals(pd.DataFrame({"toan": [1.0]}), ["ZZZ"])
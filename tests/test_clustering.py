@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from src import clustering
+from src.aggregate import GroupStats
+from src.clustering import (
+    ClusterSpec, cluster_provinces, fit_kmeans, fit_weighted_kmeans, kmeans_sweep, kmeans_sweeps,
+    province_clusters, score_vectors, silhouette, silhouette_weighted,
+)
+from src.config import PROVINCE_NAMES
+
+SUBJECTS = ["toan", "li", "hoa"]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng     = np.random.default_rng(0)
+    n       = 2400
+    centers = np.array([[8.5, 8.0, 8.25], [5.0, 4.5, 5.5], [2.0, 2.5, 1.5]])
+    values  = centers[np.arange(n) % 3] + rng.normal(0, 0.6, (n, 3))
+    values  = np.round(np.clip(values, 0, 10) * 4) / 4
+    values[rng.random((n, 3)) < 0.05] = np.nan
+    return pd.DataFrame(values, columns=SUBJECTS)
+
+
+def test_score_vectors_count_complete_rows(frame):
+    vectors  = score_vectors(frame, SUBJECTS, batch_rows=500)
+    complete = frame.dropna()
+    expected = complete.value_counts().sort_index()
+    assert vectors.n_candidates == len(complete)
+    assert (np.diff(vectors.keys) > 0).all()
+    np.testing.assert_allclose(vectors.values, np.array(expected.index.tolist()))
+    np.testing.assert_array_equal(vectors.weights, expected.to_numpy())
+
+
+def test_weighted_kmeans_matches_kmeans_on_raw_rows(frame):
+    clusters = fit_weighted_kmeans(score_vectors(frame, SUBJECTS), k=3, method="kmeans")
+    complete = frame.dropna().to_numpy()
+    scaler   = StandardScaler().fit(complete)
+    np.testing.assert_allclose(clusters.scaler.mean_, scaler.mean_, rtol=1e-9)
+    np.testing.assert_allclose(clusters.scaler.scale_, scaler.scale_, rtol=1e-9)
+
+    raw = KMeans(n_clusters=3, random_state=0, n_init=10).fit(scaler.transform(complete))
+    assert clusters.inertia == pytest.approx(raw.inertia_, rel=1e-6)
+    np.testing.assert_allclose(
+        clusters.centers, np.sort(scaler.inverse_transform(raw.cluster_centers_), axis=0)[::-1], atol=1e-6,
+    )
+
+
+def test_predict_and_profile_agree_with_raw_rows(frame):
+    clusters = fit_weighted_kmeans(score_vectors(frame, SUBJECTS), k=3, method="kmeans")
+    labels   = clusters.predict(frame)
+    assert ((labels == -1) == frame.isna().any(axis=1).to_numpy()).all()
+
+    profile = clusters.profile()
+    grouped = frame[labels >= 0].groupby(labels[labels >= 0])
+    np.testing.assert_array_equal(profile["n"], clusters.sizes())
+    np.testing.assert_array_equal(profile["n"], grouped.size())
+    for s in SUBJECTS:
+        np.testing.assert_allclose(profile[f"mean_{s}"], grouped[s].mean(), rtol=1e-9)
+        np.testing.assert_allclose(profile[f"std_{s}"], grouped[s].std(), rtol=1e-7)
+    assert (np.diff(profile["mean_all"]) < 0).all()
+
+
+def test_too_few_vectors_is_rejected():
+    df = pd.DataFrame({"toan": [5.0, 5.0], "li": [6.0, 6.0], "hoa": [7.0, 7.0]})
+    with pytest.raises(ValueError):
+        fit_weighted_kmeans(score_vectors(df, SUBJECTS), k=2)
+
+
+def _features(seed, n=300):
+    rng = np.random.default_rng(seed)
+    return StandardScaler().fit_transform(rng.normal(0, 1, (n, 2)) + 4 * (np.arange(n) % 3)[:, None])
+
+
+def test_kmeans_sweep_is_memoized_in_memory_and_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(clustering, "_SWEEP_MEMO", {})
+    fits = []
+    real = clustering._fit_k
+    monkeypatch.setattr(clustering, "_fit_k", lambda task: fits.append(task[2]) or real(task))
+
+    X     = _features(0)
+    first = kmeans_sweep(X, range(2, 5), n_workers=1, cache_dir=str(tmp_path))
+    assert fits == [2, 3, 4] and len(list(tmp_path.glob("*.pkl"))) == 1
+    assert kmeans_sweep(X, range(2, 5), n_workers=1, cache_dir=str(tmp_path)) is first
+
+    clustering._SWEEP_MEMO.clear()
+    again = kmeans_sweep(X, range(2, 5), n_workers=1, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(again.inertias, first.inertias)
+    assert fits == [2, 3, 4]
+
+    kmeans_sweep(X, range(2, 5), random_state=1, n_workers=1, cache_dir=str(tmp_path))
+    assert fits == [2, 3, 4] * 2
+    assert fit_kmeans(X, 3, first) is first.model(3)
+
+
+def test_parallel_sweeps_match_sequential(monkeypatch):
+    Xs = [_features(1), _features(2, 200)]
+    monkeypatch.setattr(clustering, "_SWEEP_MEMO", {})
+    seq = kmeans_sweeps(Xs, range(2, 5), n_workers=1, cache_dir=None)
+    monkeypatch.setattr(clustering, "_SWEEP_MEMO", {})
+    par = kmeans_sweeps(Xs, range(2, 5), n_workers=2, cache_dir=None)
+    for a, b in zip(seq, par):
+        assert a.k_values == b.k_values
+        np.testing.assert_allclose(a.inertias, b.inertias, rtol=1e-12)
+        np.testing.assert_allclose(a.silhouettes, b.silhouettes, rtol=1e-12)
+        assert a.best_k == b.best_k == 3
+
+
+def test_weighted_silhouette_matches_sklearn_on_expanded_rows():
+    rng     = np.random.default_rng(3)
+    X       = _features(3, 120)
+    labels  = KMeans(n_clusters=3, random_state=0, n_init=3).fit_predict(X)
+    weights = rng.integers(1, 5, len(X))
+    rows    = np.repeat(np.arange(len(X)), weights)
+    ref     = silhouette_score(X[rows], labels[rows])
+    assert silhouette_weighted(X, labels, weights) == pytest.approx(ref, rel=1e-10)
+    assert silhouette_weighted(X, labels, weights, block_elements=500) == pytest.approx(ref, rel=1e-10)
+    assert silhouette_weighted(X, labels) == pytest.approx(silhouette_score(X, labels), rel=1e-10)
+
+    labels[0], weights[0] = 3, 1
+    rows = np.repeat(np.arange(len(X)), weights)
+    assert silhouette_weighted(X, labels, weights) == pytest.approx(silhouette_score(X[rows], labels[rows]), rel=1e-10)
+
+
+def test_sampled_silhouette_interval_covers_exact_score():
+    X      = _features(4, 3000)
+    labels = KMeans(n_clusters=3, random_state=0, n_init=3).fit_predict(X)
+    exact  = silhouette(X, labels)
+    assert exact.ci_low == exact.score == exact.ci_high and exact.n_points == len(X)
+
+    est = silhouette(X, labels, method="sample", n_samples=600, random_state=1)
+    assert est.ci_low < exact.score < est.ci_high
+    assert est.ci_high - est.ci_low < 0.05
+    assert est.n_points == pytest.approx(600, abs=3)
+
+
+def test_silhouette_auto_switches_to_sampling(monkeypatch):
+    monkeypatch.setattr(clustering, "_EXACT_SILHOUETTE_MAX", 100)
+    X      = _features(5, 300)
+    labels = KMeans(n_clusters=3, random_state=0, n_init=3).fit_predict(X)
+    assert silhouette(X, labels).ci_low < silhouette(X, labels).ci_high
+    with pytest.raises(ValueError):
+        silhouette(X, labels, method="fast")
+
+
+def _province_frame():
+    rng  = np.random.default_rng(6)
+    n    = 6000
+    tinh = np.arange(n) % 24
+    df   = pd.DataFrame({"tinh": pd.Categorical([PROVINCE_NAMES[i] for i in tinh], categories=PROVINCE_NAMES)})
+    for col in SUBJECTS:
+        values = np.round(np.clip(rng.normal(4 + tinh / 6, 1 + (tinh % 4) / 3), 0, 10) * 4) / 4
+        values[rng.random(n) < 0.2] = np.nan
+        df[col] = values
+    return df
+
+
+def test_cluster_provinces_matches_single_runs(monkeypatch):
+    df    = _province_frame()
+    specs = [ClusterSpec("toan", "Toán"), ClusterSpec(SUBJECTS, "Tự Nhiên", 3)]
+    monkeypatch.setattr(clustering, "_SWEEP_MEMO", {})
+    many  = cluster_provinces(df, specs, n_workers=1, cache_dir=None)
+
+    monkeypatch.setattr(clustering, "_SWEEP_MEMO", {})
+    for res, spec in zip(many, specs):
+        gs  = GroupStats.from_frame(df, "tinh", spec.columns, complete=spec.multi)
+        one = province_clusters(gs, spec, n_workers=1, cache_dir=None)
+        pd.testing.assert_frame_equal(res.stats, one.stats)
+        np.testing.assert_array_equal(res.sweep.inertias, one.sweep.inertias)
+        assert res.n_candidates == one.n_candidates
+
+    complete = df.dropna(subset=SUBJECTS)
+    grouped  = complete.groupby("tinh", observed=True)
+    multi    = many[1].stats.set_index("tinh")
+    assert many[1].n_candidates == len(complete)
+    np.testing.assert_allclose(multi["mean_hoa"], grouped["hoa"].mean(), rtol=1e-9)
+    np.testing.assert_allclose(multi["std_all"], grouped[SUBJECTS].std().mean(axis=1), rtol=1e-9)
+    assert sorted(multi["cluster_rank"].unique()) == [0, 1, 2]
+    assert many[0].stats.groupby("cluster_rank")["mean_toan"].mean().is_monotonic_decreasing
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregate import GroupStats, group_stats
+from src.config import PROVINCE_CODES, PROVINCE_NAMES, PROVINCE_NEW_PROVINCE, SCORE_COLS
+from src.cube import ScoreCube
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    n   = 4000
+    df  = pd.DataFrame({"sobaodanh": [f"{PROVINCE_CODES[i % 5]}{i:06d}" for i in range(n)]})
+    for col in ["toan", "van", "li", "hoa", "ngoai_ngu"]:
+        values = np.round(np.clip(rng.normal(6, 2, n), 0, 10) * 20) / 20
+        values[rng.random(n) < 0.3] = np.nan
+        df[col] = values
+    df["li"] = np.where(df["toan"].notna(), np.round(df["toan"].fillna(0) * 0.5 * 20) / 20, df["li"])
+    df["ma_mon_ngoai_ngu"] = rng.choice(["N1", "N3", None], n)
+    df["tinh"]     = [PROVINCE_NAMES[i % 5] for i in range(n)]
+    df["tinh_moi"] = df["tinh"].map(PROVINCE_NEW_PROVINCE)
+    return df
+
+
+def test_save_load_roundtrip(frame, tmp_path):
+    cube = ScoreCube.from_frame(frame, batch_rows=1000)
+    cube.save(tmp_path / "c.npz")
+    back = ScoreCube.load(tmp_path / "c.npz")
+    for name in ["counts", "lang_counts", "subject_counts", "pairs"]:
+        np.testing.assert_array_equal(getattr(back, name), getattr(cube, name))
+
+
+def test_corr_matches_pandas(frame):
+    cols = ["toan", "van", "li", "hoa", "ngoai_ngu"]
+    got  = ScoreCube.from_frame(frame, batch_rows=1000).corr(cols)
+    pd.testing.assert_frame_equal(got, frame[cols].corr(), atol=1e-9)
+
+
+def test_num_subjects_and_candidates(frame):
+    cube     = ScoreCube.from_frame(frame)
+    expected = frame[[c for c in SCORE_COLS if c in frame]].notna().sum(axis=1).value_counts().sort_index()
+    np.testing.assert_array_equal(cube.num_subjects_counts().index, expected.index)
+    np.testing.assert_array_equal(cube.num_subjects_counts().to_numpy(), expected.to_numpy())
+    assert cube.candidate_counts("ma_tinh").sum() == len(frame)
+
+
+@pytest.mark.parametrize("group_col", [None, "tinh", "tinh_moi"])
+def test_group_stats_from_cube_matches_frame(frame, group_col):
+    cube = ScoreCube.from_frame(frame)
+    a    = GroupStats.from_cube(cube, group_col, ["toan", "van"]).table(["toan", "van"], ("n", "mean", "std"))
+    b    = group_stats(frame, group_col).table(["toan", "van"], ("n", "mean", "std"))
+    key  = group_col or "group"
+    pd.testing.assert_frame_equal(
+        a.sort_values(key).reset_index(drop=True), b.sort_values(key).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_group_stats_accepts_cube(frame):
+    cube = ScoreCube.from_frame(frame)
+    assert group_stats(cube) is group_stats(cube)
+    with pytest.raises(ValueError):
+        group_stats(cube, "tinh", ["toan", "li"], complete=True)
+
+
+def test_group_stats_on_cube_by_language(frame):
+    cube = ScoreCube.from_frame(frame)
+    gs   = group_stats(cube, "ma_mon_ngoai_ngu", ["ngoai_ngu"])
+    assert gs is group_stats(cube, "ma_mon_ngoai_ngu", ["ngoai_ngu"])
+
+    expected = frame.dropna(subset=["ngoai_ngu", "ma_mon_ngoai_ngu"]).groupby("ma_mon_ngoai_ngu")["ngoai_ngu"]
+    table    = gs.table(["ngoai_ngu"], ("n", "mean")).set_index("ma_mon_ngoai_ngu")
+    np.testing.assert_array_equal(table["n_ngoai_ngu"], expected.size().reindex(table.index))
+    np.testing.assert_allclose(table["mean_ngoai_ngu"], expected.mean().reindex(table.index))
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config import N_SCORE_LEVELS, SCORE_SCALE
+from src.cube import ScoreCube
+from src.encoding import (
+    SCORE_NA, decode_frame, encode_frame, encode_scores, read_compact_parquet,
+    score_levels, write_compact_parquet,
+)
+
+
+def test_score_levels_float_and_compact_agree():
+    s = pd.Series([0.0, 0.05, 6.25, 10.0, np.nan], name="toan")
+    expected = np.array([0, 1, 125, N_SCORE_LEVELS - 1, -1])
+    np.testing.assert_array_equal(score_levels(s), expected)
+    np.testing.assert_array_equal(score_levels(encode_scores(s.to_frame())["toan"]), expected)
+
+
+@pytest.mark.parametrize("value", [10.5, 10.05, -0.05])
+def test_score_levels_rejects_out_of_range(value):
+    with pytest.raises(ValueError):
+        score_levels(pd.Series([5.0, value], name="toan"))
+
+
+def test_score_levels_rejects_out_of_range_codes():
+    codes = pd.Series(np.array([10 * SCORE_SCALE + 1, SCORE_NA], np.uint8), name="toan")
+    with pytest.raises(ValueError):
+        score_levels(codes)
+
+
+def test_cube_does_not_spill_into_next_subject():
+    df = pd.DataFrame({"sobaodanh": ["01000001", "01000002"], "toan": [10.5, 5.0], "van": [7.0, 8.0]})
+    with pytest.raises(ValueError):
+        ScoreCube.from_frame(df)
+
+
+def _etl_frame():
+    rng = np.random.default_rng(0)
+    n   = 500
+    return pd.DataFrame({
+        "sobaodanh":        pd.array([f"{i:08d}" for i in range(1000001, 1000001 + n)], dtype="string"),
+        "toan":             np.where(rng.random(n) < 0.1, np.nan, np.round(rng.uniform(0, 10, n) * 20) / 20).astype("float32"),
+        "ngoai_ngu":        np.where(rng.random(n) < 0.3, np.nan, np.round(rng.uniform(0, 10, n) * 4) / 4).astype("float32"),
+        "ma_mon_ngoai_ngu": pd.array(rng.choice(["N1", "N3", None], n), dtype="string"),
+    })
+
+
+def test_compact_parquet_roundtrip(tmp_path):
+    df = _etl_frame()
+    write_compact_parquet(df, tmp_path / "c.parquet")
+
+    compact = read_compact_parquet(tmp_path / "c.parquet")
+    assert compact["toan"].dtype == np.uint8 and compact["sobaodanh"].dtype == np.uint32
+    assert compact.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum() / 3
+
+    pd.testing.assert_frame_equal(read_compact_parquet(tmp_path / "c.parquet", decode=True), df)
+    pd.testing.assert_frame_equal(decode_frame(encode_frame(df)), df)
+
+
+def test_encode_scores_rejects_values_off_the_grid():
+    with pytest.raises(ValueError):
+        encode_scores(pd.DataFrame({"toan": [5.0, 6.01]}))
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src import etl
+
+
+def _workbook(path, first_sbd):
+    df = pd.DataFrame({
+        "SOBAODANH": [first_sbd + i for i in range(4)],
+        "Toán":      [5.0, 6.25, np.nan, 10.0],
+        "Văn":       [7.0, np.nan, 8.5, 4.75],
+    })
+    df.to_excel(path, sheet_name="Sheet1", index=False)
+
+
+def test_incremental_matches_full_for_identical_workbooks(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _workbook(raw / "a.xlsx", 1000001)
+    shutil.copy(raw / "a.xlsx", raw / "b.xlsx")
+
+    etl.export_to_parquet(str(raw), str(tmp_path / "full.parquet"))
+    etl.export_to_parquet(str(raw), str(tmp_path / "inc.parquet"), incremental=True)
+
+    full = pq.read_table(tmp_path / "full.parquet")
+    inc  = pq.read_table(tmp_path / "inc.parquet")
+    assert inc.equals(full)
+    assert sorted(set(inc.column("origin_file").to_pylist())) == ["a.xlsx", "b.xlsx"]
+
+
+def test_touched_workbook_is_hashed_once(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _workbook(raw / "a.xlsx", 1000001)
+    out = str(tmp_path / "inc.parquet")
+    etl.export_to_parquet(str(raw), out, incremental=True)
+
+    st = os.stat(raw / "a.xlsx")
+    os.utime(raw / "a.xlsx", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    calls = []
+    real  = etl._file_sha256
+    monkeypatch.setattr(etl, "_file_sha256", lambda p: calls.append(p) or real(p))
+
+    etl.export_to_parquet(str(raw), out, incremental=True)
+    assert len(calls) == 1
+    manifest = json.loads((tmp_path / "inc.parquet.manifest.json").read_text(encoding="utf-8"))
+    assert manifest["files"]["a.xlsx"]["mtime_ns"] == st.st_mtime_ns + 10**9
+
+    etl.export_to_parquet(str(raw), out, incremental=True)
+    assert len(calls) == 1
+
+
+def test_streaming_merge_buffer_does_not_grow_with_workbooks(tmp_path, monkeypatch):
+    monkeypatch.setattr(etl, "_MERGE_FAN_IN", 4)
+    real = etl._merge_into
+
+    def _tracked(spill, runs, writer, row_group_rows):
+        # Bộ đệm trộn ≤ số run mở cùng lúc × số dòng mỗi row group của run
+        rg_rows = max(spill.metadata.row_group(g).num_rows for run in runs for g in run)
+        buffered.append(len(runs) * rg_rows)
+        return real(spill, runs, writer, row_group_rows)
+
+    monkeypatch.setattr(etl, "_merge_into", _tracked)
+
+    peaks = []
+    for n_files in (2, 6, 20):
+        raw = tmp_path / f"raw{n_files}"
+        raw.mkdir()
+        for i in range(n_files):
+            _workbook(raw / f"w{i:02d}.xlsx", 1000001 + 37 * (n_files - i))
+
+        buffered = []
+        etl.export_to_parquet(str(raw), str(tmp_path / "stream.parquet"), streaming=True, chunk_rows=8)
+        etl.export_to_parquet(str(raw), str(tmp_path / "full.parquet"))
+        assert pq.read_table(tmp_path / "stream.parquet").equals(pq.read_table(tmp_path / "full.parquet"))
+        peaks.append(max(buffered))
+
+    # 2 file → 2 run; từ 6 file trở lên bị chặn ở fan-in 4 × row group 2 dòng
+    assert peaks == [4, 8, 8]
+
+
+def test_workbook_without_tables_is_not_reread(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _workbook(raw / "a.xlsx", 1000001)
+    _workbook(raw / "b.xlsx", 2000001)
+    out = str(tmp_path / "inc.parquet")
+
+    reads = []
+    real  = etl._read_workbook
+    monkeypatch.setattr(etl, "_read_workbook",
+                        lambda p: reads.append(os.path.basename(p)) or ([] if p.endswith("b.xlsx") else real(p)))
+
+    etl.export_to_parquet(str(raw), out, incremental=True)
+    manifest = json.loads((tmp_path / "inc.parquet.manifest.json").read_text(encoding="utf-8"))
+    assert manifest["files"]["b.xlsx"]["fragment"] is None
+    assert pq.read_table(out).num_rows == 4
+
+    etl.export_to_parquet(str(raw), out, incremental=True)
+    assert reads == ["a.xlsx", "b.xlsx"]
+
+
+def test_parallel_ingestion_matches_sequential(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for i in range(3):
+        _workbook(raw / f"w{i}.xlsx", 1000001 + 2 * (2 - i))
+
+    etl.export_to_parquet(str(raw), str(tmp_path / "seq.parquet"), n_workers=1)
+    etl.export_to_parquet(str(raw), str(tmp_path / "par.parquet"), n_workers=2)
+
+    assert (tmp_path / "seq.parquet").read_bytes() == (tmp_path / "par.parquet").read_bytes()
+    sbd = pq.read_table(tmp_path / "seq.parquet").column("sobaodanh").to_pylist()
+    assert sbd == sorted(sbd) and len(sbd) == 12
+
+
+def test_province_columns_are_derived_in_the_export(tmp_path):
+    from src.config import PROVINCE_NEW_PROVINCE
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _workbook(raw / "a.xlsx", 2000001)      # mã 02
+    _workbook(raw / "b.xlsx", 99000001)     # mã 99: không có trong bảng mã
+    etl.export_to_parquet(str(raw), str(tmp_path / "out.parquet"))
+
+    table = pq.read_table(tmp_path / "out.parquet")
+    for col in etl.PROVINCE_COLS:
+        assert table.schema.field(col).type == etl._PROVINCE_TYPE
+    df = table.to_pandas()
+    known = df[df["sobaodanh"].str.startswith("02")]
+    assert (known["ma_tinh"] == "02").all() and (known["tinh"] == "TP. Hồ Chí Minh").all()
+    assert (known["tinh_moi"] == PROVINCE_NEW_PROVINCE["TP. Hồ Chí Minh"]).all()
+    assert df.loc[df["sobaodanh"].str.startswith("99"), etl.PROVINCE_COLS].isna().all().all()
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src import etl, loader
+from src.config import PROVINCE_CODES
+from src.loader import cache_path, load_cached, load_dataset
+
+
+@pytest.fixture()
+def parquet_file(tmp_path):
+    rng = np.random.default_rng(0)
+    n   = 600
+    df  = pd.DataFrame({
+        "SOBAODANH": [int(PROVINCE_CODES[i % 6]) * 1_000_000 + i for i in range(n)],
+        "Toán":      np.round(rng.uniform(0, 10, n) * 4) / 4,
+        "Văn":       np.where(rng.random(n) < 0.2, np.nan, np.round(rng.uniform(0, 10, n) * 4) / 4),
+    })
+    df["origin_file"], df["origin_sheet"] = "a.xlsx", "Sheet1"
+    path = tmp_path / "data.parquet"
+    pq.write_table(etl._to_arrow(etl._normalize_sheet(df)).sort_by("sobaodanh"), path)
+    return path
+
+
+def test_partitioned_dataset_filters_by_province(parquet_file, tmp_path):
+    part = tmp_path / "part"
+    etl.write_partitioned_dataset(str(parquet_file), str(part))
+    assert len(list(part.glob("ma_tinh=*"))) == 6
+
+    full = pd.read_parquet(parquet_file)
+    for provinces, col in [(["Hà Nội", "Đà Nẵng"], "tinh"), (["02"], "ma_tinh")]:
+        got      = load_dataset(str(part), ["sobaodanh", "toan", "tinh"], provinces, col)
+        expected = full[full[col].isin(provinces)][["sobaodanh", "toan", "tinh"]]
+        pd.testing.assert_frame_equal(
+            got.sort_values("sobaodanh").reset_index(drop=True), expected.reset_index(drop=True),
+        )
+        assert list(got["tinh"].cat.categories) == list(full["tinh"].cat.categories)
+
+
+def test_unknown_province_is_rejected(parquet_file):
+    with pytest.raises(ValueError):
+        load_dataset(str(parquet_file), provinces=["Không có"])
+
+
+def test_load_cached_matches_parquet_and_rebuilds_on_change(parquet_file, monkeypatch):
+    builds = []
+    real   = loader._build_cache
+    monkeypatch.setattr(loader, "_build_cache", lambda *a: builds.append(a[1]) or real(*a))
+
+    cols = ["sobaodanh", "toan", "tinh"]
+    for _ in range(2):
+        pd.testing.assert_frame_equal(load_cached(parquet_file, cols), pd.read_parquet(parquet_file, columns=cols))
+    pd.testing.assert_frame_equal(load_cached(parquet_file), pd.read_parquet(parquet_file))
+    assert builds == [cols, None]
+    assert cache_path(parquet_file, cols) != cache_path(parquet_file)
+
+    st = os.stat(parquet_file)
+    os.utime(parquet_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    load_cached(parquet_file, cols)
+    assert builds == [cols, None, cols]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.blocks import block_totals
+from src.config import PROVINCE_CODES
+from src.percentile import PercentileTable
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    n   = 3000
+    df  = pd.DataFrame({
+        "sobaodanh": [f"{PROVINCE_CODES[i % 3]}{i:06d}" for i in range(n)],
+        **{c: np.round(rng.uniform(0, 10, n) * 4) / 4 for c in ["toan", "li", "hoa", "van"]},
+    })
+    df.loc[rng.random(n) < 0.2, "li"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("subject", ["toan", "A00"])
+@pytest.mark.parametrize("kind", ["weak", "strict", "mean"])
+def test_percentile_matches_scipy(frame, subject, kind):
+    table  = PercentileTable.from_frame(frame, ["A00"])
+    values = frame[subject] if subject in frame else block_totals(frame, ["A00"])[subject]
+    values = values.dropna().to_numpy("float64")
+    scores = np.linspace(-1, 31, 129)
+    expected = [stats.percentileofscore(values, x, kind=kind) for x in scores]
+    np.testing.assert_allclose(table.percentile(subject, scores, kind=kind), expected, atol=1e-9)
+
+
+def test_score_at_percentile_inverts_block_ranks(frame):
+    table  = PercentileTable.from_frame(frame, ["A00"])
+    values = np.sort(block_totals(frame, ["A00"])["A00"].dropna().to_numpy("float64"))
+    ps     = np.linspace(0.5, 100, 50)
+    expected = values[np.maximum(np.ceil(ps / 100 * len(values) - 1e-9).astype(int) - 1, 0)]
+    np.testing.assert_allclose(table.score_at_percentile("A00", ps), expected)
+
+
+def test_block_has_no_language_scope(frame):
+    table = PercentileTable.from_frame(frame, ["A00"])
+    assert np.isnan(table.percentile("A00", 20.0, ("lang", "N1")))
@@ -0,0 +1,144 @@
+import os
+import warnings
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import plotting
+from src.clustering import ClusterSpec, cluster_provinces
+from src.cube import summarize_counts
+from src.plotting import ChartJob, RenderQueue, chart_key
+
+
+def _histogram_job():
+    return ChartJob("/tmp/toan.png", plotting.plot_score_histogram_counts,
+                    dict(counts=np.arange(201), title="Toán"))
+
+
+def test_chart_key_is_stable():
+    assert chart_key(_histogram_job()) == chart_key(_histogram_job())
+
+
+def test_chart_key_follows_module_constants(monkeypatch):
+    before = chart_key(_histogram_job())
+    monkeypatch.setattr(plotting, "HIST_BINS", np.arange(0, 11, 1.0))
+    assert chart_key(_histogram_job()) != before
+
+
+def test_chart_key_follows_constants_of_callees(monkeypatch):
+    job    = ChartJob("/tmp/scatter.png", plotting._plot_cluster_scatter, dict(res=None))
+    before = chart_key(job)
+    monkeypatch.setattr(plotting, "CLUSTER_COLORS", ["#000000"] + list(plotting.CLUSTER_COLORS[1:]))
+    assert chart_key(job) != before
+
+
+def test_chart_key_changes_with_data():
+    job = _histogram_job()
+    assert chart_key(job._replace(kwargs=dict(job.kwargs, title="Văn"))) != chart_key(job)
+
+
+def _province_frame():
+    from src.config import PROVINCE_NAMES
+    rng = np.random.default_rng(0)
+    n   = 3000
+    df  = pd.DataFrame({"tinh": [PROVINCE_NAMES[i % 12] for i in range(n)]})
+    for col in ["toan", "li", "hoa"]:
+        df[col] = np.round(np.clip(rng.normal(6, 2, n), 0, 10) * 4) / 4
+    return df
+
+
+def test_kmeans_entry_points_are_quiet_and_keep_warning_filters(tmp_path, capsys):
+    df      = _province_frame()
+    filters = list(warnings.filters)
+
+    plotting.kmeans_subject_2d(df, "toan", "Toán", k=3, output_dir=str(tmp_path),
+                               n_workers=1, cache_dir=None, verbose=False)
+    plotting.kmeans_multi_subject_2d(df, ["toan", "li", "hoa"], "Tự Nhiên", k=3, output_dir=str(tmp_path),
+                                     n_workers=1, cache_dir=None, verbose=False)
+
+    assert capsys.readouterr().out == ""
+    assert warnings.filters == filters
+    assert len(list(tmp_path.glob("*.png"))) == 4
+
+
+def _queue_histograms(df, output_dir):
+    queue = RenderQueue()
+    plotting.plot_all_subject_histograms(df, str(output_dir), queue=queue)
+    return queue
+
+
+def test_render_queue_in_a_pool_writes_the_same_files(tmp_path):
+    df  = _province_frame()
+    seq   = _queue_histograms(df, tmp_path / "seq").run(n_workers=1, verbose=False)
+    queue = _queue_histograms(df, tmp_path / "par")
+    assert len(queue) == 3
+    par = queue.run(n_workers=2, verbose=False)
+
+    assert len(queue) == 0
+    assert list(par["file"]) == list(seq["file"]) == ["toan.png", "li.png", "hoa.png"]
+    assert not par["cached"].any() and os.getpid() not in set(par["pid"])
+    for file in seq["file"]:
+        assert (tmp_path / "par" / file).read_bytes() == (tmp_path / "seq" / file).read_bytes()
+
+
+def test_unchanged_charts_are_not_rendered_again(tmp_path, monkeypatch):
+    df = _province_frame()
+    _queue_histograms(df, tmp_path).run(n_workers=1, verbose=False)
+
+    calls = []
+    real  = plotting._render_job
+    monkeypatch.setattr(plotting, "_render_job", lambda job: calls.append(job.filename) or real(job))
+    assert _queue_histograms(df, tmp_path).run(n_workers=1, verbose=False)["cached"].all()
+
+    (tmp_path / "li.png").unlink()
+    manifest = _queue_histograms(df.assign(toan=df["toan"] / 2), tmp_path).run(n_workers=1, verbose=False)
+    assert list(manifest["cached"]) == [False, False, True]
+    assert calls == ["toan.png", "li.png"]
+    assert _queue_histograms(df, tmp_path).run(n_workers=1, verbose=False, force=True)["cached"].sum() == 0
+
+
+def test_histogram_from_counts_matches_raw_scores(tmp_path):
+    rng    = np.random.default_rng(1)
+    scores = pd.Series(np.round(np.clip(rng.normal(6, 2, 5000), 0, 10) * 4) / 4)
+    counts = plotting._score_counts(scores)
+    np.testing.assert_array_equal(plotting._bin_counts(counts), np.histogram(scores, plotting.HIST_BINS)[0])
+
+    summary = summarize_counts(counts)
+    assert summary["n"] == len(scores)
+    assert summary["mean"] == pytest.approx(scores.mean(), rel=1e-12)
+    assert summary["std"] == pytest.approx(scores.std(), rel=1e-9)
+    assert summary["median"] == scores.median()
+    assert (summary["count_10"], summary["count_0"]) == ((scores == 10).sum(), (scores == 0).sum())
+
+    plotting.plot_score_histogram(scores, "Toán", str(tmp_path / "raw.png"))
+    plotting.plot_score_histogram_counts(counts, "Toán", str(tmp_path / "counts.png"))
+    assert (tmp_path / "raw.png").read_bytes() == (tmp_path / "counts.png").read_bytes()
+
+
+def test_reused_templates_do_not_leak_between_charts(tmp_path, monkeypatch):
+    df  = _province_frame()
+    res = cluster_provinces(df, [ClusterSpec("toan", "Toán", 3), ClusterSpec(["toan", "li"], "Toán-Lí", 3)],
+                            n_workers=1, cache_dir=None)
+    hist = [plotting._score_counts(df[col]) for col in ["toan", "li"]]
+
+    def render(prefix):
+        for i in (0, 1, 0):
+            plotting.plot_score_histogram_counts(hist[i], "Phân bố", str(tmp_path / f"{prefix}_h{i}.png"))
+            plotting._plot_cluster_scatter(res[i], str(tmp_path / f"{prefix}_s{i}.png"))
+
+    monkeypatch.setattr(plotting, "_TEMPLATES", {})
+    render("reused")
+    templates = dict(plotting._TEMPLATES)
+    for i in (0, 1):
+        monkeypatch.setattr(plotting, "_TEMPLATES", {})
+        plotting.plot_score_histogram_counts(hist[i], "Phân bố", str(tmp_path / f"fresh_h{i}.png"))
+        plotting._plot_cluster_scatter(res[i], str(tmp_path / f"fresh_s{i}.png"))
+        for kind in ("h", "s"):
+            assert (tmp_path / f"reused_{kind}{i}.png").read_bytes() == (tmp_path / f"fresh_{kind}{i}.png").read_bytes()
+
+    monkeypatch.setattr(plotting, "_TEMPLATES", templates)
+    before = plotting._template("histogram", plotting._build_histogram_template)
+    with plt.rc_context({"font.size": plt.rcParams["font.size"] + 2}):
+        assert plotting._template("histogram", plotting._build_histogram_template) is not before
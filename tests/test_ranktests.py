@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from src.config import N_SCORE_LEVELS, SCORE_SCALE
+from src.ranktests import ks_2samp_counts, mannwhitneyu_counts
+
+
+def _scores(rng, n, loc, scale):
+    return np.round(np.clip(rng.normal(loc, scale, n), 0, 10) * 4) / 4
+
+
+def _counts(scores):
+    return np.bincount(np.round(scores * SCORE_SCALE).astype(np.int64), minlength=N_SCORE_LEVELS)
+
+
+@pytest.mark.parametrize("alternative", ["two-sided", "less", "greater"])
+@pytest.mark.parametrize("sizes", [(400, 650), (6, 9)])
+def test_mannwhitneyu_matches_scipy(alternative, sizes):
+    rng  = np.random.default_rng(sum(sizes))
+    a, b = _scores(rng, sizes[0], 6.0, 1.5), _scores(rng, sizes[1], 5.7, 2.0)
+    got  = mannwhitneyu_counts(_counts(a), _counts(b), alternative=alternative)
+    ref  = stats.mannwhitneyu(a, b, alternative=alternative)
+    assert got.statistic == pytest.approx(ref.statistic, rel=1e-12)
+    assert got.pvalue == pytest.approx(ref.pvalue, rel=1e-9)
+
+
+def test_mannwhitneyu_small_sample_without_ties_uses_exact_distribution():
+    a, b = np.array([0.25, 1.5, 7.0]), np.array([2.0, 3.25, 4.5, 8.75, 9.5])
+    got  = mannwhitneyu_counts(_counts(a), _counts(b))
+    ref  = stats.mannwhitneyu(a, b)
+    assert got == pytest.approx((ref.statistic, ref.pvalue), rel=1e-12)
+
+
+@pytest.mark.parametrize("alternative", ["two-sided", "less", "greater"])
+@pytest.mark.parametrize("sizes", [(300, 500), (12_000, 15_000)])
+def test_ks_2samp_matches_scipy(alternative, sizes):
+    rng  = np.random.default_rng(sizes[0])
+    a, b = _scores(rng, sizes[0], 6.0, 1.5), _scores(rng, sizes[1], 5.9, 1.6)
+    got  = ks_2samp_counts(_counts(a), _counts(b), alternative=alternative)
+    ref  = stats.ks_2samp(a, b, alternative=alternative)
+    assert got.statistic == pytest.approx(ref.statistic, rel=1e-12)
+    assert got.pvalue == pytest.approx(ref.pvalue, rel=1e-7)
+
+
+def test_batched_counts_match_pairwise_calls():
+    rng = np.random.default_rng(1)
+    ca  = np.stack([_counts(_scores(rng, 300, 6 - i / 4, 1.5)) for i in range(4)])
+    cb  = np.stack([_counts(_scores(rng, 500, 6, 1.5 + i / 4)) for i in range(4)])
+    for test in (mannwhitneyu_counts, ks_2samp_counts):
+        batch = test(ca, cb)
+        for i in range(4):
+            assert (batch.statistic[i], batch.pvalue[i]) == pytest.approx(tuple(test(ca[i], cb[i])), rel=1e-12)
+
+
+def test_empty_group_is_rejected():
+    with pytest.raises(ValueError):
+        mannwhitneyu_counts(np.zeros(N_SCORE_LEVELS, np.int64), _counts(np.array([5.0])))
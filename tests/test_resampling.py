@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+
+from src.config import N_SCORE_LEVELS, SCORE_SCALE
+from src.resampling import RESAMPLE_STATS, diff_stats, permutation_test, resample_two_groups
+
+
+def _counts(scores):
+    return np.bincount(np.round(scores * SCORE_SCALE).astype(np.int64), minlength=N_SCORE_LEVELS)
+
+
+@pytest.mark.parametrize("alternative", ["two-sided", "less", "greater"])
+def test_permutation_test_matches_scipy(alternative):
+    # Nhóm nhỏ, lệch → phân phối hoán vị bất đối xứng; scipy liệt kê đủ
+    # C(15, 5) cách chia nên p tham chiếu là chính xác
+    a = np.array([0, 0.25, 0.5, 9.5, 9.75])
+    b = np.array([0, 0, 0.25, 0.25, 0.5, 0.5, 0.75, 1, 1.25, 1.5])
+
+    ours = permutation_test(_counts(a), _counts(b), n_resamples=40_000,
+                            alternative=alternative, seed=0, n_workers=1)
+    for i, name in enumerate(RESAMPLE_STATS):
+        ref = stats.permutation_test(
+            (a, b), lambda x, y, i=i: diff_stats(_counts(x), _counts(y))[i],
+            permutation_type="independent", alternative=alternative,
+            n_resamples=np.inf, vectorized=False,
+        ).pvalue
+        assert ours[name] == pytest.approx(ref, abs=0.015), name
+
+
+def test_shared_executor_matches_sequential():
+    rng    = np.random.default_rng(3)
+    ca, cb = (_counts(np.round(rng.uniform(0, 10, n) * 4) / 4) for n in (300, 500))
+
+    seq = resample_two_groups(ca, cb, n_resamples=2_500, seed=7, n_workers=1)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        shared = resample_two_groups(ca, cb, n_resamples=2_500, seed=7, executor=pool)
+    assert seq["ci"].equals(shared["ci"])
+    assert seq["perm_p"].equals(shared["perm_p"])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+
+from src.encoding import encode_scores
+from src.shared import attach_frame, map_shared, share_frame
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    n   = 1000
+    df  = pd.DataFrame({
+        "toan": np.where(rng.random(n) < 0.1, np.nan, np.round(rng.uniform(0, 10, n) * 4) / 4).astype("float32"),
+        "van":  np.round(rng.uniform(0, 10, n) * 4) / 4,
+        "tinh": pd.Categorical(rng.choice(["Hà Nội", "Huế", "Cần Thơ"], n)),
+        "ma_mon_ngoai_ngu": pd.array(rng.choice(["N1", "N3", None], n), dtype="string"),
+    })
+    return encode_scores(df, ["van"])
+
+
+def _mean_by_province(df, col):
+    return df.groupby("tinh", observed=True)[col].mean()
+
+
+def test_attach_frame_rebuilds_columns_without_copy():
+    df = _frame()
+    with share_frame(df) as shared:
+        back = attach_frame(shared.handle)
+        assert back.attrs["score_scale"] == df.attrs["score_scale"]
+        pd.testing.assert_series_equal(back["toan"], df["toan"])
+        pd.testing.assert_series_equal(back["van"], df["van"])
+        pd.testing.assert_series_equal(back["tinh"], df["tinh"])
+        pd.testing.assert_series_equal(back["ma_mon_ngoai_ngu"].astype("string"), df["ma_mon_ngoai_ngu"])
+        assert not back["toan"].to_numpy().flags.writeable
+        name = shared.handle.name
+
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_map_shared_matches_in_process_results():
+    df = _frame()
+    with share_frame(df, ["toan", "tinh"]) as shared:
+        (res,) = map_shared(_mean_by_province, shared, ["toan"], n_workers=2)
+    pd.testing.assert_series_equal(res, _mean_by_province(df, "toan"))
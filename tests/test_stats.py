@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import src.stats
+from src.aggregate import GroupStats
+from src.stats import compare_all_pairs, compare_two_groups
+
+
+def _frame(rng, n_a, n_b, sd_b):
+    a = np.round(np.clip(rng.normal(6, 1.5, n_a), 0, 10) * 4) / 4
+    b = np.round(np.clip(rng.normal(5.5, sd_b, n_b), 0, 10) * 4) / 4
+    return pd.DataFrame({"tinh": ["A"] * n_a + ["B"] * n_b, "toan": np.concatenate([a, b])}), a, b
+
+
+@pytest.mark.parametrize("sd_b", [1.5, 3.0])
+def test_compare_two_groups_matches_scipy(tmp_path, sd_b, monkeypatch):
+    monkeypatch.setattr(GroupStats, "sample", lambda *a: pytest.fail("không dựng lại mẫu điểm"))
+    df, a, b = _frame(np.random.default_rng(1), 900, 700, sd_b)
+
+    res = compare_two_groups(df, "toan", "Toán", "A", "B", output_dir=str(tmp_path), n_resamples=0)
+
+    lev = stats.levene(a, b)
+    t   = stats.ttest_ind(a, b, equal_var=lev.pvalue > 0.05)
+    assert res["equal_var"] == (sd_b == 1.5)
+    assert res["levene_p"] == pytest.approx(lev.pvalue, rel=1e-9)
+    assert res["t_stat"] == pytest.approx(t.statistic, rel=1e-9)
+    assert res["t_p"] == pytest.approx(t.pvalue, rel=1e-9)
+
+
+def test_compare_two_groups_resampling_is_opt_in(tmp_path, monkeypatch):
+    df, _, _ = _frame(np.random.default_rng(2), 300, 300, 1.5)
+    monkeypatch.setattr(src.stats, "resample_two_groups", lambda *a, **k: pytest.fail("không resample mặc định"))
+    res = compare_two_groups(df, "toan", "Toán", "A", "B", output_dir=str(tmp_path))
+    assert "mean_diff_perm_p" not in res
+
+
+def test_compare_all_pairs_matches_scipy():
+    rng = np.random.default_rng(4)
+    sds = {"A": 1.0, "B": 2.0, "C": 1.2, "D": 3.0}
+    parts = []
+    for g, sd in sds.items():
+        x = np.round(np.clip(rng.normal(5 + sd / 4, sd, 400), 0, 10) * 4) / 4
+        parts.append(pd.DataFrame({"tinh": g, "toan": x, "van": np.round(rng.uniform(0, 10, 400) * 4) / 4}))
+    df = pd.concat(parts, ignore_index=True)
+
+    res = compare_all_pairs(df, "tinh", ["toan", "van"])
+    assert len(res) == 2 * 6
+    for subject, sub in res.groupby("subject"):
+        t_p = []
+        for row in sub.itertuples():
+            a = df.loc[df["tinh"] == row.group_a, subject]
+            b = df.loc[df["tinh"] == row.group_b, subject]
+            t, lev = stats.ttest_ind(a, b, equal_var=False), stats.levene(a, b)
+            assert row.t_stat == pytest.approx(t.statistic, rel=1e-9)
+            assert row.t_p == pytest.approx(t.pvalue, rel=1e-7)
+            assert row.levene_stat == pytest.approx(lev.statistic, rel=1e-9)
+            assert row.levene_p == pytest.approx(lev.pvalue, rel=1e-7)
+            t_p.append(t.pvalue)
+        np.testing.assert_allclose(sub["t_p_fdr"], stats.false_discovery_control(t_p), rtol=1e-7)
+        np.testing.assert_array_equal(sub["reject_h0"], sub["t_p_fdr"] < 0.05)